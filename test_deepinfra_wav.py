@@ -2,10 +2,11 @@
 """Test script to analyze DeepInfra WAV file format"""
 import aiohttp
 import asyncio
+import os
 import struct
 
 async def test_deepinfra_wav():
-    api_key = "dBj3LhpsEy6lYb0LHK10jk2iSJwaBeLZ"
+    api_key = os.environ["DEEPINFRA_API_KEY"]
     api_url = "https://api.deepinfra.com/v1/openai/audio/speech"
 
     headers = {
@@ -1,47 +1,186 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from livekit import api
+"""
+Token service for the web client (aiohttp).
+
+Every caller gets their own LiveKit identity and room, so worker-mode jobs
+spread across rooms and the agent's memory (partitioned by room and
+participant) follows the user from call to call. The caller is recognised by
+a long-lived cookie; without one a new id is issued.
+
+Signed tokens are cached per caller and handed out again while they have at
+least TOKEN_REUSE_MIN_S of validity left, so reconnects and page reloads cost
+no signing.
+
+When TOKEN_SERVER_BEARER is set, /token requires `Authorization: Bearer <it>`
+(the reverse proxy adds it; see Caddyfile / nginx.conf.template).
+
+The client is normally served from the same origin as /token and needs no
+CORS. Pages on other origins must be listed in ALLOWED_ORIGINS
+(comma-separated, e.g. https://app.example.com); no other origin gets CORS
+headers, so browsers won't let it read a token with the caller's cookie.
+"""
+import hmac
+import logging
 import os
+import secrets
 import time
-from datetime import datetime
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional, Tuple
 
-app = Flask(__name__)
-CORS(app)
+from aiohttp import web
+from livekit import api
 
 LIVEKIT_API_KEY = os.getenv('LIVEKIT_API_KEY')
 LIVEKIT_API_SECRET = os.getenv('LIVEKIT_API_SECRET')
 LIVEKIT_URL = os.getenv('LIVEKIT_URL', 'wss://szabolcslevai.com:7880')
 LIVEKIT_PUBLIC_URL = os.getenv('LIVEKIT_PUBLIC_URL', 'wss://szabolcslevai.com:7882')
 
-@app.route('/token')
-def get_token():
+TOKEN_SERVER_BEARER = os.getenv('TOKEN_SERVER_BEARER', '')
+ROOM_PREFIX = os.getenv('ROOM_PREFIX', 'call')
+TOKEN_TTL_S = int(os.getenv('TOKEN_TTL_S', '3600'))
+TOKEN_REUSE_MIN_S = int(os.getenv('TOKEN_REUSE_MIN_S', '900'))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+PORT = int(os.getenv('PORT', '8080'))
+ALLOWED_ORIGINS = frozenset(
+    o.strip().rstrip('/') for o in os.getenv('ALLOWED_ORIGINS', '').split(',') if o.strip()
+)
+
+COOKIE_NAME = 'va_uid'
+COOKIE_MAX_AGE = 365 * 24 * 3600
+
+logger = logging.getLogger("token")
+
+
+class TokenCache:
+    """LRU of signed tokens by identity; entries expire TOKEN_REUSE_MIN_S before the token does."""
+
+    def __init__(self, max_entries: int, reuse_min_s: float):
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.max_entries = max_entries
+        self.reuse_min_s = reuse_min_s
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, identity: str) -> Optional[str]:
+        entry = self._entries.get(identity)
+        if entry is not None and entry[1] - time.time() >= self.reuse_min_s:
+            self._entries.move_to_end(identity)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def put(self, identity: str, token: str, expires_at: float) -> None:
+        self._entries[identity] = (token, expires_at)
+        self._entries.move_to_end(identity)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _new_uid() -> str:
+    return secrets.token_urlsafe(12)
+
+
+def _valid_uid(uid: Optional[str]) -> bool:
+    return bool(uid) and len(uid) <= 64 and all(c.isalnum() or c in '-_' for c in uid)
+
+
+def _authorized(request: web.Request) -> bool:
+    if not TOKEN_SERVER_BEARER:
+        return True
+    header = request.headers.get('Authorization', '')
+    scheme, _, value = header.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(value.strip(), TOKEN_SERVER_BEARER)
+
+
+def _https(request: web.Request) -> bool:
+    # TLS usually ends at the reverse proxy (Caddy sets X-Forwarded-Proto; see nginx.conf.template)
+    proto = request.headers.get('X-Forwarded-Proto', '').split(',')[0].strip().lower()
+    return request.secure or proto == 'https'
+
+
+def _sign(identity: str, room: str) -> Tuple[str, float]:
+    token = (
+        api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
+        .with_identity(identity)
+        .with_ttl(timedelta(seconds=TOKEN_TTL_S))
+        .with_grants(api.VideoGrants(
+            room_join=True,
+            room=room,
+            can_publish=True,
+            can_subscribe=True
+        ))
+        .to_jwt()
+    )
+    return token, time.time() + TOKEN_TTL_S
+
+
+async def get_token(request: web.Request) -> web.Response:
+    if not _authorized(request):
+        return web.json_response({"error": "unauthorized"}, status=401)
     if not LIVEKIT_API_KEY or not LIVEKIT_API_SECRET:
-        return jsonify({"error": "API key or secret not configured"}), 500
-    room_name = os.environ.get('ROOM_NAME', 'default')
-    
-    try:
-        token = (
-            api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
-            .with_identity("web_client")
-            .with_grants(api.VideoGrants(
-                room_join=True,
-                room=room_name,
-                can_publish=True,
-                can_subscribe=True
-            ))
-            .to_jwt()
+        return web.json_response({"error": "API key or secret not configured"}, status=500)
+
+    uid = request.cookies.get(COOKIE_NAME)
+    new_caller = not _valid_uid(uid)
+    if new_caller:
+        uid = _new_uid()
+    identity = f"web-{uid}"
+    room = f"{ROOM_PREFIX}-{uid}"
+
+    cache: TokenCache = request.app['tokens']
+    token = cache.get(identity)
+    if token is None:
+        try:
+            token, expires_at = _sign(identity, room)
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+        cache.put(identity, token, expires_at)
+
+    resp = web.json_response({
+        "token": token,
+        "url": LIVEKIT_PUBLIC_URL,
+        "identity": identity,
+        "room": room,
+    })
+    if new_caller:
+        # a Secure cookie is dropped over plain HTTP, and every call would get a new identity
+        resp.set_cookie(
+            COOKIE_NAME, uid, max_age=COOKIE_MAX_AGE, httponly=True, secure=_https(request), samesite='Lax'
         )
-        
-        return jsonify({
-            "token": token,
-            "url": LIVEKIT_PUBLIC_URL
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({"status": "ok"})
+    return resp
+
+
+async def health(request: web.Request) -> web.Response:
+    cache: TokenCache = request.app['tokens']
+    return web.json_response({"status": "ok", "cache_hits": cache.hits, "cache_misses": cache.misses})
+
+
+@web.middleware
+async def cors(request: web.Request, handler):
+    if request.method == 'OPTIONS':
+        resp = web.Response()
+    else:
+        resp = await handler(request)
+    resp.headers['Vary'] = 'Origin'
+    origin = request.headers.get('Origin')
+    if origin and origin in ALLOWED_ORIGINS:
+        resp.headers['Access-Control-Allow-Origin'] = origin
+        resp.headers['Access-Control-Allow-Credentials'] = 'true'
+        resp.headers['Access-Control-Allow-Headers'] = 'Authorization, Content-Type'
+    return resp
+
+
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[cors])
+    app['tokens'] = TokenCache(TOKEN_CACHE_SIZE, TOKEN_REUSE_MIN_S)
+    app.router.add_route('*', '/token', get_token)
+    app.router.add_get('/health', health)
+    return app
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    if not TOKEN_SERVER_BEARER:
+        logger.warning("TOKEN_SERVER_BEARER is not set: /token is open to anyone who can reach it")
+    web.run_app(create_app(), host='0.0.0.0', port=PORT, access_log=None)
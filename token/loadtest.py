@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Local load test for the token service.
+
+    python app.py &                                       # the service under test
+    python loadtest.py --url http://127.0.0.1:8080/token --requests 5000 --concurrency 50
+
+Each simulated caller keeps its own cookie jar, so with --callers smaller than
+--requests callers come back and exercise the token cache. Run it against the
+old and new service (same flags) to compare requests/s and p99.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import aiohttp
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8080/token")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--callers", type=int, default=200, help="distinct callers (cookie jars)")
+    ap.add_argument("--bearer", default=os.getenv("TOKEN_SERVER_BEARER", ""))
+    args = ap.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.bearer}"} if args.bearer else {}
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    sessions = [
+        aiohttp.ClientSession(connector=connector, connector_owner=False, cookie_jar=aiohttp.CookieJar(unsafe=True))
+        for _ in range(args.callers)
+    ]
+    latencies, errors, identities = [], 0, set()
+    counter = iter(range(args.requests))
+
+    async def _worker():
+        nonlocal errors
+        for i in counter:
+            session = sessions[i % args.callers]
+            started = time.perf_counter()
+            try:
+                async with session.get(args.url, headers=headers) as resp:
+                    body = await resp.json(content_type=None)
+                    if resp.status != 200:
+                        errors += 1
+                        continue
+                    identities.add(body.get("identity"))
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    for session in sessions:
+        await session.close()
+    await connector.close()
+
+    print(f"requests:    {args.requests} ({errors} errors), concurrency {args.concurrency}, {args.callers} callers")
+    print(f"throughput:  {len(latencies) / elapsed:.0f} req/s")
+    if latencies:
+        print(f"latency ms:  p50 {pct(latencies, 0.5):.1f}  p95 {pct(latencies, 0.95):.1f}  p99 {pct(latencies, 0.99):.1f}")
+    print(f"identities:  {len(identities - {None})} distinct")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
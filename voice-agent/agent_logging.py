@@ -0,0 +1,164 @@
+"""
+Logging for the agent: records are handed to a background thread through a
+queue, so the event loop never blocks on log I/O, and every record carries the
+session and turn it belongs to.
+
+- Correlation: bind_session() at the start of a job/room attaches a
+  Correlation to the current context; tasks the session spawns inherit it, and
+  next_turn() (called by TurnTracer on each end of speech) bumps the turn on
+  the shared object. A log record factory stamps `session_id` / `turn_id` on
+  every record, whichever handler ends up writing it.
+- Sampling: LOG_SAMPLING="deepinfra_tts=0.1,tts_cache=0.5" keeps that share of
+  each distinct DEBUG/INFO message of a logger (the first one always passes).
+  Warnings and errors are never sampled.
+- Output: the main process installs a QueueHandler -> QueueListener -> stderr
+  pipeline (LOG_FORMAT=text|json). Job processes only set up levels, sampling
+  and correlation: livekit already forwards their records to the main
+  process off the event loop, where they are written by the same pipeline.
+
+Messages are %-formatted lazily: below-level records cost a level check, and
+the formatting of records that pass happens on the writer thread.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from config import AgentConfig
+
+# our module loggers (getLogger(__name__) in each flat module)
+AGENT_LOGGERS = (
+    "app", "agent_logging", "deepinfra_tts", "tts_cache", "metrics",
+    "resilience", "memory_sql", "context_builder", "load_monitor", "audio_clips",
+    "speculation",
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Correlation:
+    session_id: str
+    turn: int = 0
+
+
+_correlation: contextvars.ContextVar[Optional[Correlation]] = contextvars.ContextVar(
+    "voice_agent_correlation", default=None
+)
+
+
+def bind_session(session_id: str) -> Correlation:
+    """Tag every record logged from this context (and tasks created from it) with `session_id`."""
+    corr = Correlation(session_id)
+    _correlation.set(corr)
+    return corr
+
+
+def next_turn() -> None:
+    corr = _correlation.get()
+    if corr is not None:
+        corr.turn += 1
+
+
+_base_factory = logging.getLogRecordFactory()
+
+
+def _record_factory(*args, **kwargs) -> logging.LogRecord:
+    record = _base_factory(*args, **kwargs)
+    corr = _correlation.get()
+    record.session_id = corr.session_id if corr is not None else "-"
+    record.turn_id = corr.turn if corr is not None else 0
+    return record
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every round(1/rate) occurrences of each DEBUG/INFO message template."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.every == 0:
+            return False
+        key = record.msg if isinstance(record.msg, str) else repr(record.msg)
+        n = self._seen.get(key, 0)
+        self._seen[key] = n + 1
+        return n % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "session": getattr(record, "session_id", "-"),
+            "turn": getattr(record, "turn_id", 0),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False)
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s [%(session_id)s/%(turn_id)s] %(message)s"
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stdlib QueueHandler formats the message before enqueueing (so records
+    # can be pickled); ours stays in-process, so formatting is left to the
+    # listener thread. Log arguments must not be mutated after the call.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_configured = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(cfg: AgentConfig, *, install_handler: bool) -> None:
+    """Configure levels, sampling and correlation; optionally the queued stderr writer."""
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+    logging.setLogRecordFactory(_record_factory)
+
+    level = logging.getLevelName(cfg.log_level.upper())
+    for name in AGENT_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+    for name, rate in parse_sampling(cfg.log_sampling).items():
+        logging.getLogger(name).addFilter(SamplingFilter(rate))
+
+    if not install_handler:
+        return
+    stream = logging.StreamHandler(sys.stderr)
+    if cfg.log_format == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter(TEXT_FORMAT))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    # third-party loggers (httpx, aiohttp.access, livekit) inherit the root level
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -1,33 +1,46 @@
 import os
 import asyncio
 import aiohttp
+import atexit
+import functools
 import inspect
-from typing import AsyncIterable
+import logging
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Default LIVEKIT_URL if not provided
 os.environ["LIVEKIT_URL"] = os.environ.get("LIVEKIT_URL", "ws://127.0.0.1:7880")
 
-print("FORCED LIVEKIT_URL =", os.environ["LIVEKIT_URL"])
-print("LIVEKIT_API_KEY set?", bool(os.environ.get("LIVEKIT_API_KEY")))
-print("LIVEKIT_API_SECRET set?", bool(os.environ.get("LIVEKIT_API_SECRET")))
-print("AGENT_MODE value:", os.environ.get('AGENT_MODE'))
+# must come before anything imports prometheus_client (sets up multiprocess mode)
+import metrics
+from metrics import TurnTracer
 
-from livekit import agents, rtc, api
+from livekit import rtc, api
 from livekit.agents import (
     Agent, AgentSession, ChatContext,
-    JobContext, AutoSubscribe,
+    ChatMessage, JobContext, JobProcess, AutoSubscribe,
     RoomInputOptions, ModelSettings,
-    ConversationItemAddedEvent,
+    ConversationItemAddedEvent, llm, utils,
 )
-from livekit.plugins import deepgram, silero, groq
+from livekit.agents.tts import FallbackAdapter
+from livekit.plugins import deepgram, silero, groq, openai
 # from livekit.plugins.turn_detector.english import EnglishModel  # Disabled for now
-from deepinfra_tts import DeepInfraTTS
+from deepinfra_tts import DeepInfraTTS, close_shared_http_session
 
+import agent_logging
+from audio_clips import Clip, ClipLibrary, lead_with_clip
+from config import AgentConfig
+from load_monitor import LoadMonitor, LoopLagProbe
 from memory_sql import SQLiteMemory
+from speculation import Speculator
+from context_builder import BuiltContext, ContextBuilder, llm_summarizer
+from tts_cache import TTSCache
 
 load_dotenv()
 
+logger = logging.getLogger("app")
+
 def _http_kwarg_for(klass, http):
     # Some plugin constructors use http_session, others use session, some neither
     try:
@@ -40,12 +53,118 @@ def _http_kwarg_for(klass, http):
         pass
     return {}
 
-def truncate(s: str, marker="<truncated>"):
-    if len(s) <= 100:
-        return s
-    return f"{s[:50]}{marker}{s[-50:]}"
+def _context_builder(cfg: AgentConfig, db: SQLiteMemory, llm=None) -> ContextBuilder:
+    summarizer = None
+    if llm is not None and cfg.context_summarizer == "llm":
+        summarizer = llm_summarizer(llm, cfg.context_summary_tokens)
+    return ContextBuilder(
+        db,
+        token_budget=cfg.context_token_budget,
+        summary_tokens=cfg.context_summary_tokens,
+        turn_tokens=cfg.context_turn_tokens,
+        summarizer=summarizer,
+    )
+
+def _chat_ctx_from(built: BuiltContext, *, greeted: bool = False) -> ChatContext:
+    chat_ctx = ChatContext()
+    if built.summary:
+        chat_ctx.add_message(role="system", content=f"Summary of earlier conversations with this user:\n{built.summary}")
+    for m in built.messages:
+        chat_ctx.add_message(role=m["role"], content=m["content"])
+    if greeted:
+        # the greeting clip itself is added to the chat by session.say()
+        chat_ctx.add_message(role="assistant", content="New session begins here.")
+    else:
+        chat_ctx.add_message(role="assistant", content="New session begins here. Greet the user after they speak.")
+    return chat_ctx
+
+def _clip_library(cfg: AgentConfig) -> Optional[ClipLibrary]:
+    """Greeting/ack/filler clips for this process's voice, or None if none are configured."""
+    phrases = cfg.clip_phrases()
+    if not any(phrases.values()):
+        return None
+    return ClipLibrary(
+        phrases, voice=cfg.tts_voice, model=cfg.tts_model, speed=cfg.tts_speed, directory=cfg.clips_dir or None,
+    )
+
+def _speculation_kwargs(cfg: AgentConfig, tts: Optional[DeepInfraTTS]) -> dict:
+    """Operator arguments for speculative replies (SPECULATIVE=1), {} when off."""
+    if not cfg.speculative:
+        return {}
+    return dict(
+        speculate_after=cfg.speculative_stable_ms / 1000,
+        # the session's own TTS: same cache and pool, closed with the session
+        prefetch=tts.prefetch if cfg.speculative_tts and tts is not None else None,
+        first_clause_chars=cfg.tts_first_clause_chars,
+    )
+
+def _history_key(items) -> Optional[str]:
+    # the conversation a reply continues, identified by its last user/assistant message
+    for item in reversed(items):
+        if getattr(item, "type", None) == "message" and item.role in ("user", "assistant"):
+            return item.id
+    return None
+
+def _greet(session: AgentSession, greeting: Optional[Clip]):
+    # played from memory as soon as the session starts; interruptible like any reply
+    if greeting is not None:
+        session.say(greeting.text, audio=greeting.stream(), allow_interruptions=True)
+
+def _with_fallback(cfg: AgentConfig, primary: DeepInfraTTS):
+    """
+    The TTS the session speaks with: DeepInfra alone, or DeepInfra backed by a
+    fallback provider. While DeepInfra's circuit breaker is open its requests
+    fail fast and the adapter serves the turn from the fallback.
+    """
+    if cfg.tts_fallback != "openai":
+        return primary
+    fallback = openai.TTS(model=cfg.tts_fallback_model, voice=cfg.tts_fallback_voice)
+    logger.info("[TTS] Fallback enabled: openai %s/%s", cfg.tts_fallback_model, cfg.tts_fallback_voice)
+    return FallbackAdapter([primary, fallback], max_retry_per_tts=1, sample_rate=primary.sample_rate)
+
+def _recall_for(cfg: AgentConfig, db: SQLiteMemory, built: BuiltContext, *, participant: str, room: str):
+    # relevant older turns (FTS5) are added to each turn next to the recent ones;
+    # only rows older than what is already in the prompt are searched
+    if cfg.recall_top_k <= 0 or not db.fts_enabled:
+        return None
+    return functools.partial(
+        db.asearch_relevant,
+        k=cfg.recall_top_k,
+        participant=participant,
+        room=room,
+        before_id=built.messages[0]["id"] if built.messages else None,
+        budget_ms=cfg.recall_budget_ms,
+    )
+
+def _persist_turns(session: AgentSession, db: SQLiteMemory, *, room: str, participant: str, session_id: str):
+    """Write each user/assistant exchange to SQLite, tagged with who/where/which session."""
+    remember = functools.partial(db.add_message, room=room, participant=participant, session_id=session_id)
+    turn_buf = []
+    @session.on("conversation_item_added")
+    def on_item(ev: ConversationItemAddedEvent):
+        role = ev.item.role
+        if role == "user":
+            turn_buf.append(ev.item.text_content)
+        elif role == "assistant":
+            user_text = " ".join(turn_buf).strip()
+            if user_text:
+                remember("user", user_text)
+            turn_buf.clear()
+            remember("assistant", ev.item.text_content)
+
+async def _close_memory(db: SQLiteMemory, builder: ContextBuilder, *, participant: str, room: str):
+    # commit this session's turns, fold what no longer fits the prompt into
+    # the rolling summary (so the next session starts from it), then flush
+    # again; the DB itself is process-wide and stays open
+    await db.aflush()
+    try:
+        await builder.refresh_summary(participant=participant, room=room)
+    except Exception:
+        logger.exception("[memory] Summary refresh failed")
+    await db.aflush()
 
-DEEPINFRA_API_KEY = os.environ.get("DEEPINFRA_API_KEY")
+# one cache per process; the disk tier under /persist is shared by all workers
+TTS_CACHE = TTSCache.from_env()
 
 BASE_INSTRUCTIONS = """
 You are a warm, witty voice companion. Speak in short, natural sentences.
@@ -53,174 +172,473 @@ Avoid lists, headings, emojis, or formal tone. Keep it conversational and brief.
 """
 
 class Operator(Agent):
+    def __init__(
+        self,
+        *,
+        recall: Optional[Callable[[str], Awaitable[List[Dict[str, Any]]]]] = None,
+        clips: Optional[ClipLibrary] = None,
+        filler_after: Optional[float] = None,
+        speculate_after: Optional[float] = None,
+        prefetch: Optional[Callable[[str], Awaitable[bool]]] = None,
+        first_clause_chars: int = 0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        # recall(user_text) -> older turns relevant to what the user just said
+        self._recall = recall
+        # replies open with an ack (filler_after=0) or with a filler once the
+        # first audio is filler_after seconds late; None = never
+        self._clips = clips
+        self._filler_after = filler_after
+        # start the LLM on stable interim transcripts (see speculation.py); None = off
+        self._speculator: Optional[Speculator] = None
+        if speculate_after is not None:
+            self._speculator = Speculator(
+                self._speculative_llm,
+                stable_s=speculate_after,
+                prefetch=prefetch,
+                first_clause_chars=first_clause_chars,
+            )
+
+    async def on_enter(self) -> None:
+        if self._speculator is not None:
+            self.session.on("user_input_transcribed", self._on_transcript)
+
+    async def on_exit(self) -> None:
+        if self._speculator is not None:
+            self.session.off("user_input_transcribed", self._on_transcript)
+            await self._speculator.aclose()
+
+    def _on_transcript(self, ev) -> None:
+        self._speculator.on_transcript(ev.transcript, is_final=ev.is_final, history=_history_key(self.chat_ctx.items))
+
+    async def _speculative_llm(self, text: str):
+        # the request the committed turn would make: history, recall, then the user's words
+        chat_ctx = self.chat_ctx.copy()
+        first = chat_ctx.items[0] if chat_ctx.items else None
+        if self.instructions and not (getattr(first, "role", None) == "system" and first.text_content == self.instructions):
+            chat_ctx.items.insert(0, ChatMessage(role="system", content=[self.instructions]))
+        user_at = len(chat_ctx.items)
+        message = ChatMessage(role="user", content=[text])
+        await self.on_user_turn_completed(chat_ctx, message)
+        chat_ctx.items.insert(user_at, message)
+        async for chunk in Agent.default.llm_node(self, chat_ctx, self.tools, ModelSettings()):
+            yield chunk
+
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
+        if self._recall is None:
+            return
+        text = new_message.text_content
+        if not text:
+            return
+        hits = await self._recall(text)
+        if hits:
+            lines = "\n".join(
+                f"- {'User' if h['role'] == 'user' else 'You'}: {h['content']}" for h in hits
+            )
+            turn_ctx.add_message(
+                role="assistant",
+                content=f"Relevant things from earlier conversations with this user:\n{lines}",
+            )
+
+    async def llm_node(
+        self,
+        chat_ctx: ChatContext,
+        tools: List[llm.FunctionTool],
+        model_settings: ModelSettings,
+    ) -> AsyncIterable[llm.ChatChunk]:
+        stream = None
+        if self._speculator is not None:
+            items = chat_ctx.items
+            user_at = max((i for i, item in enumerate(items) if getattr(item, "role", None) == "user"), default=None)
+            if user_at is not None:
+                stream = self._speculator.take(items[user_at].text_content or "", _history_key(items[:user_at]))
+        if stream is None:
+            stream = Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        async for chunk in stream:
+            yield chunk
+
     async def tts_node(
         self,
         text: AsyncIterable[str],
         model_settings: ModelSettings,
     ) -> AsyncIterable[rtc.AudioFrame]:
-        async for frame in Agent.default.tts_node(self, text, model_settings):
+        audio = Agent.default.tts_node(self, text, model_settings)
+        if self._clips is not None and self._filler_after is not None:
+            audio = lead_with_clip(audio, self._clips, filler_after=self._filler_after)
+        async for frame in audio:
             yield frame
 
-# ---------------- DIRECT MODE ----------------
-async def run_direct():
-    url = os.environ["LIVEKIT_URL"]
-    api_key = os.environ["LIVEKIT_API_KEY"]
-    api_secret = os.environ["LIVEKIT_API_SECRET"]
-
-    token = (
-        api.AccessToken(api_key, api_secret)
-        .with_identity("server_agent")
-        .with_grants(api.VideoGrants(room_join=True, room="default"))
-        .to_jwt()
+async def _build_operator(
+    cfg: AgentConfig,
+    db: SQLiteMemory,
+    llm,
+    *,
+    participant: str,
+    room: str,
+    clips: Optional[ClipLibrary],
+    tts: Optional[DeepInfraTTS] = None,
+) -> Tuple[ContextBuilder, Operator, Optional[Clip]]:
+    """The agent for one conversation: this participant's memory, recall, clips and speculation."""
+    builder = _context_builder(cfg, db, llm)
+    built = await builder.build(participant=participant, room=room)
+    greeting = clips.pick("greeting") if clips is not None else None
+    operator = Operator(
+        chat_ctx=_chat_ctx_from(built, greeted=greeting is not None),
+        instructions=BASE_INSTRUCTIONS,
+        recall=_recall_for(cfg, db, built, participant=participant, room=room),
+        clips=clips,
+        filler_after=cfg.clips_filler_after,
+        **_speculation_kwargs(cfg, tts),
     )
+    return builder, operator, greeting
 
-    room = rtc.Room()
-    await room.connect(url, token)
-
-    db = SQLiteMemory(db_path="/opt/Livekit/conversations.db")
-
-    # Shared HTTP session for HTTP-based plugins in DIRECT mode
-    http = aiohttp.ClientSession()
-
-    try:
-        # Build chat context from memory
-        old = db.get_context_messages(50)
-        chat_ctx = ChatContext()
-        for m in old:
-            role = m["role"]; content = m["content"]
-            chat_ctx.add_message(role=role, content=truncate(content) if role != "user" else content)
-        chat_ctx.add_message(role="assistant", content="New session begins here. Greet the user after they speak.")
-
-        operator = Operator(chat_ctx=chat_ctx, instructions=BASE_INSTRUCTIONS)
-
-        # Build kwargs that match each class' expected param name (or none)
-        dg_kwargs  = _http_kwarg_for(deepgram.STT, http)
-        llm_kwargs = _http_kwarg_for(groq.LLM, http)
-
-        stt = deepgram.STT(
-            model=os.getenv("DEEPGRAM_MODEL", "nova-3"),
-            api_key=os.environ.get("DEEPGRAM_API_KEY"),
-            **dg_kwargs,
-        )
-
-        tts = DeepInfraTTS(
-            api_key=DEEPINFRA_API_KEY,
-            voice=os.getenv("TTS_VOICE", "af_sky"),
-        )
-
-        llm = groq.LLM(
-         model=os.getenv("LLM_MODEL", "openai/gpt-oss-120b"),
-         temperature=float(os.getenv("LLM_TEMPERATURE", "1.0")),
-         **llm_kwargs,  # will be {} if LLM doesn't support http/session
+# ---------------- DIRECT MODE ----------------
+AGENT_IDENTITY = "server_agent"
+
+class DirectSupervisor:
+    """
+    Serves many rooms from one process without the job system: one
+    AgentSession per room, all sharing a VAD model, the HTTP pools and the DB
+    writer. Rooms come from DIRECT_ROOMS (always served, rejoined after each
+    conversation) and, with DIRECT_DISCOVER=1, from polling LiveKit for rooms
+    that have participants. Each room's session and cleanup run in their own
+    task, so a failing room never takes the others down.
+    """
+
+    def __init__(self, cfg: AgentConfig):
+        self.cfg = cfg
+        self.vad = silero.VAD.load()
+        self.db = SQLiteMemory(**cfg.memory_kwargs())
+        # shared by the HTTP-based plugins (STT/LLM); DeepInfra uses its own process-wide pool
+        self.http = aiohttp.ClientSession()
+        self.clips = _clip_library(cfg)
+        self.rooms: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    async def run(self):
+        if self.clips is not None:
+            async with DeepInfraTTS(**self.cfg.tts_kwargs()) as tts:
+                await self.clips.render(tts, timeout=10)
+        for name in self.cfg.direct_rooms:
+            self._spawn(name, static=True)
+        try:
+            if self.cfg.direct_discover:
+                await self._discover()
+            else:
+                await asyncio.Event().wait()
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        self._stopping = True
+        tasks = list(self.rooms.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.http.close()
+        await close_shared_http_session()
+        await self.db.aclose()
+        logger.info("[TTSCache] %s", TTS_CACHE.describe())
+        await TTS_CACHE.aclose()
+        logger.info("[DIRECT MODE] Supervisor stopped, HTTP and DB closed")
+
+    def _spawn(self, name: str, *, static: bool = False):
+        if name in self.rooms or self._stopping:
+            return
+        if len(self.rooms) >= self.cfg.direct_max_rooms:
+            logger.warning("[DIRECT MODE] At %d rooms, not joining %s", len(self.rooms), name)
+            return
+        self.rooms[name] = asyncio.create_task(self._room_loop(name, static), name=f"room-{name}")
+
+    async def _room_loop(self, name: str, static: bool):
+        try:
+            while True:
+                try:
+                    await self._serve_room(name)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("[DIRECT MODE] Room %s failed", name)
+                    await asyncio.sleep(5)
+                if not static:
+                    return
+        finally:
+            self.rooms.pop(name, None)
+
+    async def _discover(self):
+        lkapi = api.LiveKitAPI(
+            self.cfg.livekit_url.replace("ws://", "http://", 1).replace("wss://", "https://", 1),
+            self.cfg.livekit_api_key,
+            self.cfg.livekit_api_secret,
         )
-
-        session = AgentSession(
-            llm=llm,
-            stt=stt,
-            tts=tts,
-            # turn_detection=EnglishModel(),  # Disabled: requires WORKER mode
-            vad=silero.VAD.load(),
+        try:
+            while True:
+                try:
+                    res = await lkapi.room.list_rooms(api.ListRoomsRequest())
+                    for room in res.rooms:
+                        if room.num_participants > 0:
+                            self._spawn(room.name)
+                except Exception as e:
+                    logger.warning("[DIRECT MODE] Room discovery failed: %s", e)
+                await asyncio.sleep(self.cfg.direct_poll_s)
+        finally:
+            await lkapi.aclose()
+
+    async def _serve_room(self, name: str):
+        """One conversation in one room: join, wait for a user, talk until they leave, clean up."""
+        cfg, db = self.cfg, self.db
+        corr = agent_logging.bind_session(f"direct-{name}-{utils.shortuuid()}")
+        token = (
+            api.AccessToken(cfg.livekit_api_key, cfg.livekit_api_secret)
+            .with_identity(AGENT_IDENTITY)
+            .with_grants(api.VideoGrants(room_join=True, room=name))
+            .to_jwt()
         )
 
-        print("[DIRECT MODE] Starting agent session...")
-        await session.start(
-            room=room,
-            agent=operator,
-            room_input_options=RoomInputOptions(video_enabled=False, close_on_disconnect=False),  # Changed to False
-        )
-        print("[DIRECT MODE] Agent session started successfully, entering main loop...")
+        tracer = TurnTracer(model=cfg.llm_model, voice=cfg.tts_voice)
+        tts = DeepInfraTTS(cache=TTS_CACHE, tracer=tracer, **cfg.tts_kwargs())
+        tts.prewarm()
 
-        # Keep process alive - catch any exceptions to prevent crashes
+        room = rtc.Room()
+        session: Optional[AgentSession] = None
+        builder: Optional[ContextBuilder] = None
+        participant: Optional[rtc.RemoteParticipant] = None
         try:
-            await asyncio.Event().wait()
-        except Exception as e:
-            print(f"[DIRECT MODE] Main loop exception: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
-
-    except Exception as e:
-        print(f"[DIRECT MODE] Setup exception: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+            await room.connect(cfg.livekit_url, token)
+            participant = await _wait_for_participant(room)
+            if participant is None:
+                return  # room closed before anyone joined
+            logger.info("[DIRECT MODE] %s joined room %s", participant.identity, name)
+
+            llm = groq.LLM(
+                model=cfg.llm_model,
+                temperature=cfg.llm_temperature,
+                base_url=cfg.llm_base_url,
+                **_http_kwarg_for(groq.LLM, self.http),  # will be {} if LLM doesn't support http/session
+            )
+            builder, operator, greeting = await _build_operator(
+                cfg, db, llm, participant=participant.identity, room=name, clips=self.clips, tts=tts,
+            )
+
+            session = AgentSession(
+                llm=llm,
+                stt=deepgram.STT(
+                    model=cfg.deepgram_model,
+                    api_key=cfg.deepgram_api_key,
+                    base_url=cfg.deepgram_base_url,
+                    **_http_kwarg_for(deepgram.STT, self.http),
+                ),
+                tts=_with_fallback(cfg, tts),
+                # turn_detection=EnglishModel(),  # Disabled: requires WORKER mode
+                vad=self.vad,
+            )
+            tracer.attach(session)
+            _persist_turns(session, db, room=name, participant=participant.identity, session_id=corr.session_id)
+
+            ended = asyncio.Event()
+            session.on("close", lambda _ev: ended.set())
+            room.on("disconnected", lambda *_: ended.set())
+
+            await session.start(
+                room=room,
+                agent=operator,
+                room_input_options=RoomInputOptions(
+                    video_enabled=False,
+                    close_on_disconnect=True,
+                    participant_identity=participant.identity,
+                ),
+            )
+            _greet(session, greeting)
+            logger.info("[DIRECT MODE] Session started in room %s (%d rooms active)", name, len(self.rooms))
+            await ended.wait()
+        finally:
+            # isolated per room: nothing here may raise into the supervisor
+            if session is not None:
+                try:
+                    await session.aclose()
+                except Exception:
+                    logger.exception("[DIRECT MODE] Closing session in %s failed", name)
+            if builder is not None and participant is not None:
+                await _close_memory(db, builder, participant=participant.identity, room=name)
+            await tts.aclose()
+            await room.disconnect()
+            logger.info("[DIRECT MODE] Left room %s", name)
+
+async def _wait_for_participant(room: rtc.Room) -> Optional[rtc.RemoteParticipant]:
+    """First remote participant other than an agent, or None if the room disconnects first."""
+    for p in room.remote_participants.values():
+        if p.identity != AGENT_IDENTITY:
+            return p
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    def _on_participant(p: rtc.RemoteParticipant):
+        if p.identity != AGENT_IDENTITY and not fut.done():
+            fut.set_result(p)
+    def _on_disconnected(*_):
+        if not fut.done():
+            fut.set_result(None)
+    room.on("participant_connected", _on_participant)
+    room.on("disconnected", _on_disconnected)
+    try:
+        return await fut
     finally:
-        await http.close()
-        print("[DIRECT MODE] Session ended, HTTP closed")
+        room.off("participant_connected", _on_participant)
+        room.off("disconnected", _on_disconnected)
+
+async def run_direct():
+    await DirectSupervisor(AgentConfig.from_env()).run()
 
 # ---------------- WORKER MODE ----------------
-async def entrypoint(ctx: JobContext):
-    # env-driven config
-    DG_MODEL  = os.getenv("DEEPGRAM_MODEL", "nova-3")
-    TTS_MODEL = os.getenv("TTS_MODEL", "hexgrad/Kokoro-82M")
-    TTS_BASE  = os.getenv("TTS_BASE_URL", "https://api.deepinfra.com/v1/openai")
-    TTS_VOICE = os.getenv("TTS_VOICE", "af_heart")
-    TTS_SPEED = float(os.getenv("TTS_SPEED", "1.0"))
-    LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-oss-120b")
-    LLM_TEMP  = float(os.getenv("LLM_TEMPERATURE", "1.0"))
-
-    # WORKER mode: ctx.room is provided automatically by LiveKit
-    # No need to connect manually
-
-    # build chat context from memory
-    db = SQLiteMemory(db_path="/opt/Livekit/conversations.db")
-    old = db.get_context_messages(50)
-    chat_ctx = ChatContext()
-    for m in old:
-        role, content = m["role"], m["content"]
-        chat_ctx.add_message(role=role, content=truncate(content) if role != "user" else content)
-    chat_ctx.add_message(role="assistant", content="New session begins here. Greet the user after they speak.")
+def prewarm(proc: JobProcess):
+    """
+    Runs once per worker process, before it is handed a job: everything that
+    does not depend on the room is loaded here instead of on the job's clock.
+    """
+    started = time.perf_counter()
+    cfg = AgentConfig.from_env()
+    # livekit forwards job-process records to the main process, which writes them
+    agent_logging.setup_logging(cfg, install_handler=False)
+    proc.userdata["config"] = cfg
+    proc.userdata["vad"] = silero.VAD.load()
+    db = SQLiteMemory(**cfg.memory_kwargs())
+    atexit.register(db.close)  # drain queued turns when the process exits
+    proc.userdata["db"] = db
+    clips = _clip_library(cfg)
+    if clips is not None:
+        # mostly loaded from CLIPS_DIR; only the first process of a new voice synthesizes
+        clips.render_blocking(functools.partial(DeepInfraTTS, **cfg.tts_kwargs()), timeout=10)
+    proc.userdata["clips"] = clips
+    logger.info("[WORKER] Process prewarmed in %.0fms (config, VAD, DB, clips)", (time.perf_counter() - started) * 1000)
+
+async def _mark_metrics_dead():
+    metrics.mark_process_dead()
 
-    operator = Operator(chat_ctx=chat_ctx, instructions=BASE_INSTRUCTIONS)
+async def entrypoint(ctx: JobContext):
+    accepted = time.perf_counter()
+    timings = {}
+    def mark(stage: str):
+        timings[stage] = round((time.perf_counter() - accepted) * 1000)
+
+    cfg: AgentConfig = ctx.proc.userdata["config"]
+    db: SQLiteMemory = ctx.proc.userdata["db"]
+    agent_logging.bind_session(ctx.job.id)
+    lag_probe = LoopLagProbe(role="job")
+    lag_probe.start()
+    ctx.add_shutdown_callback(lag_probe.aclose)
+    # the process exits after its job; its livemax/liveall samples must go with it
+    ctx.add_shutdown_callback(_mark_metrics_dead)
+
+    # HTTP connections are bound to the job's event loop, so they can't be
+    # opened in prewarm(); start them first thing, overlapping connect and
+    # waiting for the participant
+    tracer = TurnTracer(model=cfg.llm_model, voice=cfg.tts_voice)
+    tts = DeepInfraTTS(cache=TTS_CACHE, tracer=tracer, **cfg.tts_kwargs())
+    tts.prewarm()
+
+    # WORKER mode: ctx.room is provided by LiveKit; connect first so we know
+    # who we are talking to before loading their history
+    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+    mark("connected")
+    participant = await ctx.wait_for_participant()
+    mark("participant_joined")
+    room_name = ctx.room.name
+    session_id = ctx.job.id
+
+    # build chat context from this participant's memory only
+    llm = groq.LLM(model=cfg.llm_model, temperature=cfg.llm_temperature, base_url=cfg.llm_base_url)
+    builder, operator, greeting = await _build_operator(
+        cfg, db, llm, participant=participant.identity, room=room_name, clips=ctx.proc.userdata.get("clips"),
+        tts=tts,
+    )
 
     # worker mode: plugins don't need explicit http_session
     session = AgentSession(
-        llm=groq.LLM(model=LLM_MODEL, temperature=LLM_TEMP),
-        stt=deepgram.STT(model=DG_MODEL, api_key=os.environ.get("DEEPGRAM_API_KEY")),
-        tts=DeepInfraTTS(
-            api_key=DEEPINFRA_API_KEY,
-            voice=TTS_VOICE,
-        ),
+        llm=llm,
+        stt=deepgram.STT(model=cfg.deepgram_model, api_key=cfg.deepgram_api_key, base_url=cfg.deepgram_base_url),
+        tts=_with_fallback(cfg, tts),
         # turn_detection=EnglishModel(),  # Disabled: requires model download
-        vad=silero.VAD.load(),
+        vad=ctx.proc.userdata["vad"],  # loaded once per process in prewarm()
     )
+    tracer.attach(session)
 
-    # persist turns to SQLite
-    turn_buf = []
-    @session.on("conversation_item_added")
-    def on_item(ev: ConversationItemAddedEvent):
-        role = ev.item.role
-        if role == "user":
-            turn_buf.append(ev.item.text_content)
-        elif role == "assistant":
-            user_text = " ".join(turn_buf).strip()
-            if user_text:
-                db.add_message("user", user_text)
-            turn_buf.clear()
-            db.add_message("assistant", ev.item.text_content)
+    _persist_turns(session, db, room=room_name, participant=participant.identity, session_id=session_id)
+
+    async def _report_cache():
+        logger.info("[TTSCache] %s", TTS_CACHE.describe())
+        await TTS_CACHE.aclose()
+    ctx.add_shutdown_callback(_report_cache)
+
+    # a closure, not functools.partial: add_shutdown_callback inspects callback.__code__
+    async def _on_shutdown():
+        await _close_memory(db, builder, participant=participant.identity, room=room_name)
+    ctx.add_shutdown_callback(_on_shutdown)
+
+    @session.on("agent_state_changed")
+    def on_agent_state(ev):
+        if ev.new_state == "speaking" and "first_speech" not in timings:
+            mark("first_speech")
+            # everything except the time spent waiting on the human
+            overhead = timings["first_speech"] - (timings["participant_joined"] - timings["connected"])
+            logger.info("[WORKER] Job %s startup latency (ms): %s, agent overhead ~%dms", session_id, timings, overhead)
 
     await session.start(
         room=ctx.room,
         agent=operator,
-        room_input_options=RoomInputOptions(video_enabled=False, close_on_disconnect=True),
+        room_input_options=RoomInputOptions(
+            video_enabled=False,
+            close_on_disconnect=True,
+            participant_identity=participant.identity,
+        ),
     )
-
-    await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+    mark("session_started")
+    _greet(session, greeting)
+    logger.info("[WORKER] Job %s ready (ms since accept): %s", session_id, timings)
 
 # ---------------- MAIN ----------------
 async def main():
-    print("LIVEKIT_URL =", os.environ.get("LIVEKIT_URL"))
-    print("LIVEKIT_API_KEY set?", bool(os.environ.get("LIVEKIT_API_KEY")))
-    print("LIVEKIT_API_SECRET set?", bool(os.environ.get("LIVEKIT_API_SECRET")))
+    cfg = AgentConfig.from_env()
+    direct = os.environ.get("AGENT_MODE", "worker") == "direct"
+    # the queued writer lives in the main process; job processes forward to it
+    agent_logging.setup_logging(cfg, install_handler=True)
+    logger.info(
+        "LIVEKIT_URL=%s, LIVEKIT_API_KEY set? %s, LIVEKIT_API_SECRET set? %s",
+        cfg.livekit_url, bool(cfg.livekit_api_key), bool(cfg.livekit_api_secret),
+    )
+
+    if cfg.metrics_port:
+        # served from the main process; job processes report through the multiprocess dir
+        metrics.start_metrics_server(cfg.metrics_port, cfg.metrics_addr)
 
-    if os.environ.get("AGENT_MODE", "worker") == "direct":
-        print("Starting in DIRECT mode (no job system).")
+    if direct:
+        logger.info("Starting in DIRECT mode (no job system).")
         await run_direct()
         return
 
-    print("Starting in WORKER mode (waiting for jobs).")
+    logger.info("Starting in WORKER mode (waiting for jobs).")
     from livekit.agents import Worker, WorkerOptions
-    opts = WorkerOptions(entrypoint_fnc=entrypoint, initialize_process_timeout=30)
+    # admission control: CPU, event-loop lag and sessions vs measured capacity
+    monitor = LoadMonitor(
+        threshold=cfg.load_threshold,
+        max_sessions=cfg.max_sessions,
+        session_cpu_cost=cfg.session_cpu_cost,
+        lag_budget_s=cfg.loop_lag_budget_ms / 1000,
+    )
+    opts = WorkerOptions(
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        # keep prewarmed processes (VAD/DB/config loaded) waiting for jobs
+        num_idle_processes=cfg.num_idle_processes,
+        initialize_process_timeout=30,
+        load_fnc=monitor.load_fnc,
+        load_threshold=cfg.load_threshold,
+    )
     worker = Worker(opts)
-    await worker.run()
+    monitor.start(worker)
+    try:
+        await worker.run()
+    finally:
+        await monitor.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
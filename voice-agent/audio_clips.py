@@ -0,0 +1,248 @@
+"""
+Pre-rendered clips that cover the first second of a reply.
+
+A greeting, short acknowledgements ("Mm-hm.") and fillers ("Hmm, let me
+think.") are synthesized once per voice when the process starts and kept as
+ready-to-publish 20ms PCM frames, so playing one costs no request and no
+decoding. They are used to:
+
+- greet the user as soon as the session starts, instead of waiting for them
+  to speak and paying LLM + TTS latency on the first reply;
+- fill the gap at the start of a turn (opt-in; off by default): with
+  CLIPS_FILLER_AFTER_MS=0 an acknowledgement plays immediately on every turn; with a positive value a
+  filler plays only when the reply's first audio has not arrived by then (the
+  LLM's first token is late, or TTS is slow). The real answer keeps being
+  generated behind the clip and follows it without a gap.
+
+Rendered clips are written to CLIPS_DIR keyed by model/voice/speed/text, so
+worker processes after the first load them from disk instead of
+synthesizing them again.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import random
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from livekit import rtc
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 20
+
+CLIP_KINDS = ("greeting", "ack", "filler")
+
+
+@dataclass
+class Clip:
+    kind: str
+    text: str
+    frames: List[rtc.AudioFrame]
+
+    @property
+    def duration(self) -> float:
+        return sum(f.duration for f in self.frames)
+
+    async def stream(self) -> AsyncIterator[rtc.AudioFrame]:
+        """The frames as an async iterable, e.g. for AgentSession.say(audio=...)."""
+        for frame in self.frames:
+            yield frame
+
+
+def _frames_from_pcm(pcm: bytes, sample_rate: int, num_channels: int) -> List[rtc.AudioFrame]:
+    samples = sample_rate * FRAME_MS // 1000
+    step = samples * num_channels * 2
+    frames = []
+    for offset in range(0, len(pcm) - len(pcm) % (num_channels * 2), step):
+        chunk = pcm[offset:offset + step]
+        frames.append(rtc.AudioFrame(chunk, sample_rate, num_channels, len(chunk) // (num_channels * 2)))
+    return frames
+
+
+class ClipLibrary:
+    def __init__(
+        self,
+        phrases: Dict[str, Sequence[str]],
+        *,
+        voice: str,
+        model: str,
+        speed: float,
+        directory: Optional[str] = "/persist/clips",
+    ):
+        self.phrases = {kind: [p for p in phrases.get(kind, ()) if p.strip()] for kind in CLIP_KINDS}
+        self.voice = voice
+        self.model = model
+        self.speed = speed
+        self.directory = directory
+        self._clips: Dict[str, List[Clip]] = {kind: [] for kind in CLIP_KINDS}
+        self._last: Dict[str, Optional[Clip]] = {}
+
+    def has(self, kind: str) -> bool:
+        return bool(self._clips.get(kind))
+
+    def pick(self, kind: str) -> Optional[Clip]:
+        """A random clip of `kind`, never the same one twice in a row when there is a choice."""
+        clips = self._clips.get(kind)
+        if not clips:
+            return None
+        choices = [c for c in clips if c is not self._last.get(kind)] or clips
+        clip = random.choice(choices)
+        self._last[kind] = clip
+        metrics.count_clip_played(kind)
+        return clip
+
+    def describe(self) -> str:
+        return ", ".join(
+            f"{kind}={len(clips)} ({sum(c.duration for c in clips):.1f}s)" for kind, clips in self._clips.items()
+        )
+
+    # ---- rendering ----
+    def _path(self, text: str, sample_rate: int) -> Optional[str]:
+        if not self.directory:
+            return None
+        key = f"{self.model}|{self.voice}|{self.speed}|{sample_rate}|{text}"
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".pcm")
+
+    def _load(self, path: Optional[str]) -> Optional[bytes]:
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read() or None
+        except OSError:
+            return None
+
+    def _store(self, path: Optional[str], pcm: bytes) -> None:
+        if path is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(pcm)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("[clips] Could not store clip in %s: %s", self.directory, e)
+
+    async def _render_one(self, tts, kind: str, text: str) -> Optional[Clip]:
+        path = self._path(text, tts.sample_rate)
+        pcm = self._load(path)
+        if pcm is None:
+            chunks = []
+            async with tts.synthesize(text) as stream:
+                async for ev in stream:
+                    chunks.append(bytes(ev.frame.data))
+            pcm = b"".join(chunks)
+            if not pcm:
+                return None
+            self._store(path, pcm)
+        return Clip(kind, text, _frames_from_pcm(pcm, tts.sample_rate, tts.num_channels))
+
+    async def render(self, tts, *, timeout: float = 15.0) -> "ClipLibrary":
+        """
+        Fill the library with `tts` (normally a DeepInfraTTS for this voice).
+        Clips that fail or time out are skipped; the agent just runs without them.
+        """
+        jobs = [(kind, text) for kind in CLIP_KINDS for text in self.phrases[kind]]
+        if not jobs:
+            return self
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._render_one(tts, kind, text), timeout) for kind, text in jobs),
+            return_exceptions=True,
+        )
+        failed = 0
+        for (kind, text), result in zip(jobs, results):
+            if isinstance(result, Clip):
+                self._clips[kind].append(result)
+            else:
+                failed += 1
+                if isinstance(result, BaseException):
+                    logger.warning("[clips] Rendering %s %r failed: %r", kind, text, result)
+        logger.info(
+            "[clips] %s ready in %.0fms for voice %s (%d failed): %s",
+            len(jobs) - failed, (loop.time() - started) * 1000, self.voice, failed, self.describe(),
+        )
+        return self
+
+    def render_blocking(self, make_tts, *, timeout: float = 15.0) -> "ClipLibrary":
+        """
+        render() from synchronous code (worker prewarm). Runs on a private
+        event loop in a helper thread; the TTS (`make_tts()`) and its HTTP
+        pool are created and closed on that loop. Frames are plain data and
+        can be used from any loop afterwards.
+        """
+        async def _run():
+            from deepinfra_tts import close_shared_http_session
+
+            try:
+                async with make_tts() as tts:
+                    await self.render(tts, timeout=timeout)
+            finally:
+                await close_shared_http_session()
+
+        with concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="clips") as pool:
+            pool.submit(asyncio.run, _run()).result()
+        return self
+
+
+async def lead_with_clip(
+    audio: AsyncIterator[rtc.AudioFrame],
+    clips: ClipLibrary,
+    *,
+    filler_after: float,
+) -> AsyncIterator[rtc.AudioFrame]:
+    """
+    Frames of `audio` (a reply being synthesized), led by a clip: an
+    acknowledgement right away when filler_after <= 0, otherwise a filler if
+    `audio` has not produced its first frame within filler_after seconds.
+    `audio` is consumed in the background meanwhile, so nothing waits for the clip.
+    """
+    done = object()
+    frames: asyncio.Queue = asyncio.Queue()
+
+    async def _pump():
+        try:
+            async for frame in audio:
+                frames.put_nowait(frame)
+        except Exception as e:
+            frames.put_nowait(e)
+        finally:
+            frames.put_nowait(done)
+
+    pump = asyncio.create_task(_pump())
+    try:
+        clip = None
+        if filler_after <= 0:
+            clip = clips.pick("ack")
+            item = None
+        else:
+            try:
+                item = await asyncio.wait_for(frames.get(), filler_after)
+            except asyncio.TimeoutError:
+                item = None
+                clip = clips.pick("filler")
+        if clip is not None:
+            for frame in clip.frames:
+                yield frame
+        if item is None:
+            item = await frames.get()
+        while item is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            item = await frames.get()
+    finally:
+        if not pump.done():
+            pump.cancel()
+            try:
+                await pump
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Compare agent-side CPU cost of the two DeepInfra output formats:
+
+- mp3: LiveKit's AudioStreamDecoder (what the emitter does for audio/mpeg)
+- wav: WavStreamParser + AudioByteStream (what the emitter does for audio/pcm)
+
+Reports CPU milliseconds per second of audio. Audio comes from --mp3/--wav
+files, or is fetched from DeepInfra when DEEPINFRA_API_KEY is set.
+
+    python bench/bench_audio_decode.py --repeat 20
+    python bench/bench_audio_decode.py --mp3 hello.mp3 --wav hello.wav
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from livekit.agents import utils  # noqa: E402
+from livekit.agents.utils import codecs  # noqa: E402
+
+from wav_stream import WavStreamParser  # noqa: E402
+
+SAMPLE_RATE = 24000
+NETWORK_CHUNK = 4096  # roughly what iter_any() hands us per read
+
+TEXT = (
+    "Sure, I can help with that. The quickest way is to start with the basics, "
+    "then build up from there. Let me know if you want me to go into more detail."
+)
+
+
+async def fetch(fmt: str, text: str) -> bytes:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            "https://api.deepinfra.com/v1/openai/audio/speech",
+            json={
+                "model": os.getenv("TTS_MODEL", "hexgrad/Kokoro-82M"),
+                "input": text,
+                "voice": os.getenv("TTS_VOICE", "af_heart"),
+                "response_format": fmt,
+            },
+            headers={"Authorization": f"Bearer {os.environ['DEEPINFRA_API_KEY']}"},
+        ) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+
+def chunks(data: bytes):
+    for i in range(0, len(data), NETWORK_CHUNK):
+        yield data[i : i + NETWORK_CHUNK]
+
+
+async def run_mp3(data: bytes) -> float:
+    """Returns seconds of audio decoded."""
+    decoder = codecs.AudioStreamDecoder(sample_rate=SAMPLE_RATE, num_channels=1)
+    for chunk in chunks(data):
+        decoder.push(chunk)
+    decoder.end_input()
+    samples = 0
+    async for frame in decoder:
+        samples += frame.samples_per_channel
+    await decoder.aclose()
+    return samples / SAMPLE_RATE
+
+
+async def run_wav(data: bytes) -> float:
+    parser = WavStreamParser()
+    bstream = utils.audio.AudioByteStream(sample_rate=SAMPLE_RATE, num_channels=1)
+    samples = 0
+    for chunk in chunks(data):
+        for part in parser.feed(chunk):
+            for frame in bstream.push(part):
+                samples += frame.samples_per_channel
+    for frame in bstream.flush():
+        samples += frame.samples_per_channel
+    return samples / SAMPLE_RATE
+
+
+async def measure(name, fn, data: bytes, repeat: int) -> dict:
+    await fn(data)  # warm up (codec init, imports)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    audio_s = 0.0
+    for _ in range(repeat):
+        audio_s += await fn(data)
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    return {
+        "format": name,
+        "bytes": len(data),
+        "audio_s": round(audio_s / repeat, 3),
+        "cpu_ms_per_audio_s": round(cpu * 1000 / audio_s, 3),
+        "wall_ms_per_audio_s": round(wall * 1000 / audio_s, 3),
+    }
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mp3", help="MP3 file (default: fetch from DeepInfra)")
+    ap.add_argument("--wav", help="WAV file (default: fetch from DeepInfra)")
+    ap.add_argument("--text", default=TEXT)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    inputs = {}
+    for fmt in ("mp3", "wav"):
+        path = getattr(args, fmt)
+        if path:
+            with open(path, "rb") as f:
+                inputs[fmt] = f.read()
+        elif os.environ.get("DEEPINFRA_API_KEY"):
+            inputs[fmt] = await fetch(fmt, args.text)
+        else:
+            sys.exit(f"need --{fmt} or DEEPINFRA_API_KEY")
+
+    results = [
+        await measure("mp3", run_mp3, inputs["mp3"], args.repeat),
+        await measure("wav", run_wav, inputs["wav"], args.repeat),
+    ]
+    for r in results:
+        print(
+            f"{r['format']}: {r['bytes']:>8} bytes, {r['audio_s']:.2f}s audio, "
+            f"{r['cpu_ms_per_audio_s']:.2f} CPU ms / audio s, {r['wall_ms_per_audio_s']:.2f} wall ms / audio s"
+        )
+    mp3_cpu, wav_cpu = results[0]["cpu_ms_per_audio_s"], results[1]["cpu_ms_per_audio_s"]
+    if wav_cpu > 0:
+        print(f"wav uses {mp3_cpu / wav_cpu:.1f}x less CPU per second of audio")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
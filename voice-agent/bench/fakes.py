@@ -0,0 +1,339 @@
+"""
+Local stand-ins for the agent's HTTP providers, for benchmarks and soak tests.
+
+- TTS  (DeepInfra, OpenAI-compatible):  POST /v1/openai/audio/speech
+- LLM  (Groq, OpenAI-compatible):       POST /openai/v1/chat/completions (SSE streaming)
+- STT  (Deepgram pre-recorded):         POST /v1/listen
+- STT  (Deepgram live, websocket):      GET  /v1/listen
+  Speech is told from silence by amplitude, in audio time: SpeechStarted on
+  the first loud chunk, interim Results every stt_interim_interval_ms of
+  speech, and a final Result (speech_final) stt_latency_ms after
+  `endpointing` ms of silence. Finalize / CloseStream flush a pending turn.
+
+Latency, chunking and payload sizes are configurable so results reflect the
+agent's own overhead rather than the providers'.
+"""
+import array
+import asyncio
+import json
+import math
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+from aiohttp import WSMsgType, web
+
+SAMPLE_RATE = 24000
+
+
+@dataclass
+class FakeConfig:
+    # TTS
+    tts_ttfb_ms: float = 120.0
+    tts_chunk_bytes: int = 4800  # 100ms of 24kHz 16-bit mono
+    tts_chunk_interval_ms: float = 5.0
+    tts_audio_ms_per_char: float = 60.0  # ~ speaking rate
+    tts_mp3_sample: Optional[bytes] = None  # served for response_format=mp3
+    # LLM
+    llm_ttft_ms: float = 250.0
+    llm_token_interval_ms: float = 15.0
+    llm_reply: str = (
+        "Sure, happy to help with that. The short answer is yes, and the longer answer "
+        "depends a bit on what you want to do next. Tell me more and we can dig in."
+    )
+    # STT
+    stt_latency_ms: float = 150.0
+    stt_transcript: str = "hello there, can you help me plan my weekend?"
+    stt_interim_interval_ms: float = 300.0
+    stt_endpointing_ms: float = 300.0  # when the client doesn't send `endpointing`
+    stt_speech_amplitude: int = 500  # peak above which a chunk counts as speech
+
+
+@dataclass
+class FakeStats:
+    tts_requests: int = 0
+    tts_bytes: int = 0
+    llm_requests: int = 0
+    stt_requests: int = 0
+    stt_streams: int = 0
+    stt_finals: int = 0
+    open_requests: int = 0
+    aborted_requests: int = 0
+    peak_open_requests: int = 0
+
+
+def wav_header(num_samples: Optional[int]) -> bytes:
+    """16-bit mono PCM header; unknown length is written as 0xFFFFFFFF like a streaming encoder."""
+    data_size = 0xFFFFFFFF if num_samples is None else num_samples * 2
+    riff_size = 0xFFFFFFFF if num_samples is None else 36 + data_size
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+def tone(num_samples: int, freq: float = 220.0, sample_rate: int = SAMPLE_RATE) -> bytes:
+    samples = array.array(
+        "h", (int(3000 * math.sin(2 * math.pi * freq * i / sample_rate)) for i in range(num_samples))
+    )
+    return samples.tobytes()
+
+
+def utterance(speech_s: float, silence_s: float, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """16-bit mono PCM that the live STT fake hears as one turn: tone, then silence."""
+    return tone(int(speech_s * sample_rate), sample_rate=sample_rate) + bytes(int(silence_s * sample_rate) * 2)
+
+
+class _LiveTurn:
+    """What the live STT fake has heard of the current utterance."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.last_voice = start
+        self.interims = 0
+
+
+class FakeProviders:
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self.stats = FakeStats()
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+        # one second of tone, sliced for every response
+        self._pcm = tone(SAMPLE_RATE)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def tts_base_url(self) -> str:
+        return f"{self.base_url}/v1/openai"
+
+    @property
+    def llm_base_url(self) -> str:
+        return f"{self.base_url}/openai/v1"
+
+    @property
+    def stt_base_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    async def start(self) -> "FakeProviders":
+        app = web.Application()
+        app.router.add_post("/v1/openai/audio/speech", self._tts)
+        app.router.add_post("/openai/v1/chat/completions", self._llm)
+        app.router.add_post("/v1/listen", self._stt)
+        app.router.add_get("/v1/listen", self._stt_live)
+        app.router.add_route("HEAD", "/", self._head)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def aclose(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    # ---------------- handlers ----------------
+    def _enter(self):
+        self.stats.open_requests += 1
+        self.stats.peak_open_requests = max(self.stats.peak_open_requests, self.stats.open_requests)
+
+    async def _head(self, request: web.Request) -> web.Response:
+        return web.Response()
+
+    def _audio_body(self, text: str, fmt: str) -> bytes:
+        if fmt == "mp3":
+            if self.config.tts_mp3_sample is None:
+                raise web.HTTPBadRequest(text="fake TTS has no mp3 sample (pass tts_mp3_sample)")
+            return self.config.tts_mp3_sample
+        samples = int(len(text) * self.config.tts_audio_ms_per_char * SAMPLE_RATE / 1000)
+        pcm = (self._pcm * (samples // SAMPLE_RATE + 1))[: samples * 2]
+        return wav_header(None) + pcm
+
+    async def _tts(self, request: web.Request) -> web.StreamResponse:
+        cfg = self.config
+        payload = await request.json()
+        body = self._audio_body(payload.get("input", ""), payload.get("response_format", "mp3"))
+        self.stats.tts_requests += 1
+        self._enter()
+        try:
+            await asyncio.sleep(cfg.tts_ttfb_ms / 1000)
+            resp = web.StreamResponse(
+                headers={"Content-Type": "audio/wav" if body[:4] == b"RIFF" else "audio/mpeg"}
+            )
+            await resp.prepare(request)
+            for i in range(0, len(body), cfg.tts_chunk_bytes):
+                chunk = body[i : i + cfg.tts_chunk_bytes]
+                await resp.write(chunk)
+                self.stats.tts_bytes += len(chunk)
+                if cfg.tts_chunk_interval_ms:
+                    await asyncio.sleep(cfg.tts_chunk_interval_ms / 1000)
+            await resp.write_eof()
+            return resp
+        except (asyncio.CancelledError, ConnectionResetError):
+            self.stats.aborted_requests += 1
+            raise
+        finally:
+            self.stats.open_requests -= 1
+
+    async def _llm(self, request: web.Request) -> web.StreamResponse:
+        cfg = self.config
+        payload = await request.json()
+        self.stats.llm_requests += 1
+        self._enter()
+        try:
+            await asyncio.sleep(cfg.llm_ttft_ms / 1000)
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            created = int(time.time())
+            words = cfg.llm_reply.split(" ")
+            for i, word in enumerate(words):
+                delta = {"content": (word if i == 0 else " " + word)}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": payload.get("model", "fake"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(cfg.llm_token_interval_ms / 1000)
+            done = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": payload.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+            }
+            await resp.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+            await resp.write_eof()
+            return resp
+        except (asyncio.CancelledError, ConnectionResetError):
+            self.stats.aborted_requests += 1
+            raise
+        finally:
+            self.stats.open_requests -= 1
+
+    async def _stt(self, request: web.Request) -> web.Response:
+        cfg = self.config
+        audio = await request.read()
+        self.stats.stt_requests += 1
+        self._enter()
+        try:
+            await asyncio.sleep(cfg.stt_latency_ms / 1000)
+            duration = max(0.0, (len(audio) - 44) / (SAMPLE_RATE * 2))
+            return web.json_response({
+                "metadata": {"request_id": "fake", "duration": duration, "channels": 1},
+                "results": {"channels": [{"alternatives": [{
+                    "transcript": cfg.stt_transcript,
+                    "confidence": 0.99,
+                    "words": [],
+                }]}]},
+            })
+        finally:
+            self.stats.open_requests -= 1
+
+    def _results(self, turn: _LiveTurn, end: float, words: List[str], *, final: bool, request_id: str) -> str:
+        step = (end - turn.start) / max(1, len(words))
+        return json.dumps({
+            "type": "Results",
+            "channel_index": [0, 1],
+            "start": turn.start,
+            "duration": end - turn.start,
+            "is_final": final,
+            "speech_final": final,
+            "channel": {"alternatives": [{
+                "transcript": " ".join(words),
+                "confidence": 0.99,
+                "words": [
+                    {"word": w, "punctuated_word": w, "confidence": 0.99,
+                     "start": turn.start + i * step, "end": turn.start + (i + 1) * step}
+                    for i, w in enumerate(words)
+                ],
+            }]},
+            "metadata": {"request_id": request_id},
+        })
+
+    async def _stt_live(self, request: web.Request) -> web.WebSocketResponse:
+        cfg = self.config
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.stats.stt_streams += 1
+        self._enter()
+        rate = int(request.query.get("sample_rate", SAMPLE_RATE))
+        channels = int(request.query.get("channels", 1))
+        endpointing = request.query.get("endpointing", "")
+        endpoint_s = (
+            None if endpointing == "false"
+            else float(endpointing) / 1000 if endpointing.isdigit()
+            else cfg.stt_endpointing_ms / 1000
+        )
+        request_id = str(uuid.uuid4())
+        words = cfg.stt_transcript.split()
+        pending: Set[asyncio.Task] = set()
+        heard = 0.0  # seconds of audio received
+        turn: Optional[_LiveTurn] = None
+
+        async def _final(t: _LiveTurn, end: float):
+            await asyncio.sleep(cfg.stt_latency_ms / 1000)
+            self.stats.stt_finals += 1
+            await ws.send_str(self._results(t, end, words, final=True, request_id=request_id))
+
+        def _end_turn():
+            nonlocal turn
+            task = asyncio.create_task(_final(turn, turn.last_voice))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            turn = None
+
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.BINARY:
+                    samples = array.array("h", msg.data)
+                    duration = len(samples) / (rate * channels)
+                    loud = bool(samples) and max(max(samples), -min(samples)) > cfg.stt_speech_amplitude
+                    if loud:
+                        if turn is None:
+                            turn = _LiveTurn(heard)
+                            await ws.send_str(json.dumps({"type": "SpeechStarted", "channel": [0, 1], "timestamp": heard}))
+                        turn.last_voice = heard + duration
+                        if (turn.interims + 1) * cfg.stt_interim_interval_ms / 1000 <= turn.last_voice - turn.start:
+                            turn.interims += 1
+                            partial = words[: max(1, min(len(words) - 1, turn.interims))]
+                            await ws.send_str(self._results(turn, turn.last_voice, partial, final=False, request_id=request_id))
+                    elif turn is not None and endpoint_s is not None and heard + duration - turn.last_voice >= endpoint_s:
+                        _end_turn()
+                    heard += duration
+                elif msg.type == WSMsgType.TEXT:
+                    kind = json.loads(msg.data).get("type")
+                    if kind in ("Finalize", "CloseStream") and turn is not None:
+                        _end_turn()
+                    if kind == "CloseStream":
+                        await asyncio.gather(*pending, return_exceptions=True)
+                        await ws.send_str(json.dumps({
+                            "type": "Metadata", "request_id": request_id, "duration": heard, "channels": channels,
+                        }))
+                        await ws.close()
+                else:
+                    break
+            return ws
+        finally:
+            for task in pending:
+                task.cancel()
+            self.stats.open_requests -= 1
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite: runs the agent's STT, TTS, memory and context code against
+local stand-in providers (bench/fakes.py), so no API keys or network are
+needed and results are comparable between releases.
+
+    python bench/run_bench.py                          # all scenarios
+    python bench/run_bench.py --only tts --concurrency 1 8 32
+    python bench/run_bench.py --compare bench-results/v1.json
+
+Results are written as JSON (--out); --compare flags metrics that regressed by
+more than --tolerance against an earlier result file.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+# keep the benchmark hermetic: no shared disk cache, no metrics server
+os.environ.setdefault("TTS_CACHE_DIR", "")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="voice-agent-bench-metrics-")
+)
+
+from fakes import FakeConfig, FakeProviders, utterance  # noqa: E402
+
+SENTENCES = [
+    "Hi there!",
+    "Sorry, could you repeat that?",
+    "Sure, I can help with that. The quickest way is to start small and build from there.",
+    "That sounds like a great plan for the weekend, especially if the weather holds up.",
+]
+
+
+# ---------------- helpers ----------------
+def pct(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return round((values[lo] + (values[hi] - values[lo]) * (k - lo)) * 1000, 2)
+
+
+def summary_ms(values):
+    return {"p50_ms": pct(values, 0.5), "p95_ms": pct(values, 0.95), "p99_ms": pct(values, 0.99)}
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+@contextmanager
+def resources(out: dict):
+    """Record CPU seconds, wall time and RSS growth of the enclosed block into `out`."""
+    cpu0, wall0, rss0 = time.process_time(), time.perf_counter(), rss_mb()
+    yield
+    out["cpu_s"] = round(time.process_time() - cpu0, 3)
+    out["wall_s"] = round(time.perf_counter() - wall0, 3)
+    out["rss_mb"] = rss_mb()
+    out["rss_growth_mb"] = round(out["rss_mb"] - rss0, 1)
+
+
+# ---------------- scenarios ----------------
+async def synthesize_once(tts, text):
+    """Returns (seconds to first audio frame, seconds of audio)."""
+    started = time.perf_counter()
+    first = None
+    audio_s = 0.0
+    async with tts.synthesize(text) as stream:
+        async for ev in stream:
+            if first is None:
+                first = time.perf_counter() - started
+            audio_s += ev.frame.samples_per_channel / ev.frame.sample_rate
+    return first, audio_s
+
+
+async def bench_tts(fakes: FakeProviders, args) -> dict:
+    from deepinfra_tts import DeepInfraTTS, close_shared_http_session
+
+    tts = DeepInfraTTS(
+        api_key="bench",
+        base_url=fakes.tts_base_url,
+        response_format=args.tts_format,
+        pool_limit=max(args.concurrency) * 2,
+        pool_limit_per_host=max(args.concurrency) * 2,
+    )
+    await tts.warmup()
+    out = {"format": args.tts_format, "provider_ttfb_ms": fakes.config.tts_ttfb_ms}
+
+    # sequential: time-to-first-audio per utterance
+    seq = {}
+    with resources(seq):
+        ttfa, audio = [], 0.0
+        for i in range(args.requests):
+            first, audio_s = await synthesize_once(tts, SENTENCES[i % len(SENTENCES)])
+            ttfa.append(first)
+            audio += audio_s
+    seq.update(summary_ms(ttfa))
+    seq["cpu_ms_per_audio_s"] = round(seq["cpu_s"] * 1000 / audio, 2) if audio else None
+    out["sequential"] = seq
+
+    # concurrent: throughput and TTFA under load
+    out["concurrent"] = {}
+    for n in args.concurrency:
+        res = {}
+        with resources(res):
+            results = await asyncio.gather(
+                *(synthesize_once(tts, SENTENCES[i % len(SENTENCES)]) for i in range(n * args.rounds))
+            )
+        ttfa = [r[0] for r in results]
+        audio = sum(r[1] for r in results)
+        res.update(summary_ms(ttfa))
+        res["syntheses_per_s"] = round(len(results) / res["wall_s"], 2)
+        res["audio_s_per_wall_s"] = round(audio / res["wall_s"], 2)
+        res["cpu_ms_per_audio_s"] = round(res["cpu_s"] * 1000 / audio, 2) if audio else None
+        out["concurrent"][str(n)] = res
+
+    await tts.aclose()
+    await close_shared_http_session()
+    return out
+
+
+async def transcribe_once(stt, speech_s: float, silence_s: float, frame_ms: int = 20):
+    """
+    Stream one utterance in real time; returns (seconds from the end of speech
+    to the final transcript, seconds of audio sent).
+    """
+    from livekit import rtc
+    from livekit.agents import stt as agents_stt
+
+    rate = 16000
+    pcm = utterance(speech_s, silence_s, rate)
+    frame_bytes = rate * frame_ms // 1000 * 2
+    speech_end = None
+    latency = None
+    stream = stt.stream()
+
+    async def feed():
+        nonlocal speech_end
+        start = time.perf_counter()
+        for i, off in enumerate(range(0, len(pcm), frame_bytes)):
+            chunk = pcm[off:off + frame_bytes]
+            stream.push_frame(rtc.AudioFrame(chunk, rate, 1, len(chunk) // 2))
+            if speech_end is None and off + frame_bytes >= speech_s * rate * 2:
+                speech_end = time.perf_counter()
+            await asyncio.sleep(max(0.0, start + (i + 1) * frame_ms / 1000 - time.perf_counter()))
+        stream.end_input()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        async for ev in stream:
+            if ev.type == agents_stt.SpeechEventType.FINAL_TRANSCRIPT:
+                latency = time.perf_counter() - speech_end
+                break
+        await feeder
+    finally:
+        # aclose rather than draining: the plugin's keepalive outlives CloseStream by up to 5s
+        await stream.aclose()
+    return latency, len(pcm) / 2 / rate
+
+
+async def bench_stt(fakes: FakeProviders, args) -> dict:
+    import aiohttp
+    from livekit.plugins import deepgram
+
+    http = aiohttp.ClientSession()
+    stt = deepgram.STT(model="nova-3", api_key="bench", base_url=f"{fakes.stt_base_url}/listen", http_session=http)
+    speech_s, silence_s = args.stt_speech_ms / 1000, 0.3
+    out = {"provider_latency_ms": fakes.config.stt_latency_ms}
+
+    # sequential: end of speech -> final transcript, one live stream per utterance
+    seq = {}
+    with resources(seq):
+        results = [await transcribe_once(stt, speech_s, silence_s) for _ in range(args.requests)]
+    final = [r[0] for r in results if r[0] is not None]
+    seq.update(summary_ms(final))
+    seq["missed_finals"] = len(results) - len(final)
+    seq["cpu_ms_per_audio_s"] = round(seq["cpu_s"] * 1000 / sum(r[1] for r in results), 2)
+    out["sequential"] = seq
+
+    # concurrent: N live streams at once
+    out["concurrent"] = {}
+    for n in args.concurrency:
+        res = {}
+        with resources(res):
+            results = []
+            for _ in range(args.rounds):
+                results += await asyncio.gather(*(transcribe_once(stt, speech_s, silence_s) for _ in range(n)))
+        final = [r[0] for r in results if r[0] is not None]
+        res.update(summary_ms(final))
+        res["missed_finals"] = len(results) - len(final)
+        res["cpu_ms_per_audio_s"] = round(res["cpu_s"] * 1000 / sum(r[1] for r in results), 2)
+        out["concurrent"][str(n)] = res
+
+    await stt.aclose()
+    await http.close()
+    return out
+
+
+async def bench_memory(args) -> dict:
+    from memory_sql import SQLiteMemory
+
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SQLiteMemory(os.path.join(tmp, "bench.db"))
+        users = [f"user-{i}" for i in range(args.users)]
+
+        ins = {}
+        with resources(ins):
+            loop = asyncio.get_running_loop()
+            enqueue_s = 0.0
+            for i in range(args.rows):
+                t = loop.time()
+                db.add_message(
+                    "user" if i % 2 == 0 else "assistant",
+                    f"{SENTENCES[i % len(SENTENCES)]} (message {i} about topic {i % 97})",
+                    room=f"room-{i % args.users}",
+                    participant=users[i % args.users],
+                    session_id=f"s{i // 200}",
+                )
+                enqueue_s += loop.time() - t
+            await db.aflush()
+        ins["rows_per_s"] = round(args.rows / ins["wall_s"])
+        ins["enqueue_us"] = round(enqueue_s / args.rows * 1e6, 2)
+        out["insert"] = ins
+
+        loads = []
+        for i in range(args.reads):
+            t = time.perf_counter()
+            await db.aget_context_messages(50, participant=users[i % args.users], room=f"room-{i % args.users}")
+            loads.append(time.perf_counter() - t)
+        out["context_load"] = summary_ms(loads)
+
+        searches = []
+        for i in range(args.reads):
+            t = time.perf_counter()
+            await db.asearch_relevant(
+                f"remember topic {i % 97} from before?", participant=users[i % args.users], room=f"room-{i % args.users}"
+            )
+            searches.append(time.perf_counter() - t)
+        out["fts_search"] = summary_ms(searches)
+        out["db_mb"] = round(os.path.getsize(os.path.join(tmp, "bench.db")) / 1e6, 2)
+        await db.aclose()
+    return out
+
+
+async def bench_context(args) -> dict:
+    # app.py's helpers turn the builder output into the ChatContext the agent gets
+    import app
+    from config import AgentConfig
+    from memory_sql import SQLiteMemory
+
+    cfg = AgentConfig.from_env()
+    out = {"token_budget": cfg.context_token_budget}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SQLiteMemory(os.path.join(tmp, "ctx.db"))
+        for i in range(args.history):
+            db.add_message("user", f"{SENTENCES[i % len(SENTENCES)]} ({i})", participant="u", room="r")
+            db.add_message("assistant", " ".join(SENTENCES) + f" ({i})", participant="u", room="r")
+        await db.aflush()
+        builder = app._context_builder(cfg, db)
+
+        async def timed_builds():
+            times, built = [], None
+            for _ in range(args.reads):
+                t = time.perf_counter()
+                built = await builder.build(participant="u", room="r")
+                app._chat_ctx_from(built)
+                times.append(time.perf_counter() - t)
+            return times, built
+
+        times, built = await timed_builds()
+        out["before_summary"] = {**summary_ms(times), "prompt_tokens": built.stats.prompt_tokens,
+                                 "history_tokens": built.stats.history_tokens}
+
+        t = time.perf_counter()
+        await builder.refresh_summary(participant="u", room="r")
+        await db.aflush()
+        out["refresh_summary_ms"] = round((time.perf_counter() - t) * 1000, 2)
+
+        times, built = await timed_builds()
+        out["after_summary"] = {**summary_ms(times), "prompt_tokens": built.stats.prompt_tokens,
+                                "saved_tokens": built.stats.saved_tokens}
+        await db.aclose()
+    return out
+
+
+async def bench_llm(fakes: FakeProviders, args) -> dict:
+    from livekit.agents import ChatContext
+    from livekit.plugins import groq
+
+    llm = groq.LLM(model="bench", api_key="bench", base_url=fakes.llm_base_url)
+    ttft, total = [], []
+    for _ in range(args.requests):
+        ctx = ChatContext()
+        ctx.add_message(role="user", content="Plan my weekend please.")
+        t = time.perf_counter()
+        first = None
+        async with llm.chat(chat_ctx=ctx) as stream:
+            async for chunk in stream:
+                if first is None and chunk.delta and chunk.delta.content:
+                    first = time.perf_counter() - t
+        ttft.append(first)
+        total.append(time.perf_counter() - t)
+    await llm.aclose()
+    return {
+        "provider_ttft_ms": fakes.config.llm_ttft_ms,
+        "ttft": summary_ms(ttft),
+        "complete": summary_ms(total),
+    }
+
+
+# ---------------- comparison ----------------
+LOWER_IS_BETTER = (
+    "_ms", "cpu_s", "wall_s", "rss_mb", "rss_growth_mb", "_us", "db_mb", "prompt_tokens", "cpu_ms_per_audio_s",
+    "missed_finals",
+)
+HIGHER_IS_BETTER = ("_per_s", "saved_tokens", "audio_s_per_wall_s")
+
+
+def flatten(d, prefix=""):
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            yield from flatten(v, key + ".")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield key, v
+
+
+def compare(old: dict, new: dict, tolerance: float):
+    old_flat = dict(flatten(old["results"]))
+    regressions = []
+    for key, value in flatten(new["results"]):
+        before = old_flat.get(key)
+        if before in (None, 0) or "provider_" in key:
+            continue
+        change = (value - before) / abs(before)
+        if key.endswith(HIGHER_IS_BETTER):
+            change = -change
+        elif not key.endswith(LOWER_IS_BETTER):
+            continue
+        if change > tolerance:
+            regressions.append((key, before, value, change))
+    return regressions
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--only", nargs="*", choices=["stt", "tts", "memory", "context", "llm"])
+    ap.add_argument("--tts-format", choices=["wav", "mp3"], default="wav")
+    ap.add_argument("--mp3-sample", help="MP3 file the fake TTS serves for --tts-format mp3")
+    ap.add_argument("--tts-ttfb-ms", type=float, default=FakeConfig.tts_ttfb_ms)
+    ap.add_argument("--tts-chunk-bytes", type=int, default=FakeConfig.tts_chunk_bytes)
+    ap.add_argument("--llm-ttft-ms", type=float, default=FakeConfig.llm_ttft_ms)
+    ap.add_argument("--stt-latency-ms", type=float, default=FakeConfig.stt_latency_ms)
+    ap.add_argument("--stt-speech-ms", type=float, default=600, help="length of each streamed utterance")
+    ap.add_argument("--requests", type=int, default=20, help="sequential requests per scenario")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--rounds", type=int, default=2, help="concurrent batches per concurrency level")
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--reads", type=int, default=200)
+    ap.add_argument("--history", type=int, default=300, help="turns of history for the context scenario")
+    ap.add_argument("--out", default=os.path.join("bench-results", f"bench-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"))
+    ap.add_argument("--compare", help="earlier result JSON to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = ap.parse_args()
+    only = set(args.only or ["stt", "tts", "memory", "context", "llm"])
+
+    mp3 = None
+    if args.mp3_sample:
+        with open(args.mp3_sample, "rb") as f:
+            mp3 = f.read()
+    config = FakeConfig(
+        tts_ttfb_ms=args.tts_ttfb_ms,
+        tts_chunk_bytes=args.tts_chunk_bytes,
+        llm_ttft_ms=args.llm_ttft_ms,
+        stt_latency_ms=args.stt_latency_ms,
+        tts_mp3_sample=mp3,
+    )
+
+    results = {}
+    async with FakeProviders(config) as fakes:
+        if "stt" in only:
+            print("[bench] stt ...")
+            results["stt"] = await bench_stt(fakes, args)
+        if "tts" in only:
+            print("[bench] tts ...")
+            results["tts"] = await bench_tts(fakes, args)
+        if "llm" in only:
+            print("[bench] llm ...")
+            results["llm"] = await bench_llm(fakes, args)
+    if "memory" in only:
+        print("[bench] memory ...")
+        results["memory"] = await bench_memory(args)
+    if "context" in only:
+        print("[bench] context ...")
+        results["context"] = await bench_context(args)
+
+    report = {
+        "meta": {
+            "git_rev": git_rev(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"[bench] wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        regressions = compare(old, report, args.tolerance)
+        for key, before, after, change in regressions:
+            print(f"[bench] REGRESSION {key}: {before} -> {after} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"[bench] no regressions beyond {args.tolerance:.0%} vs {args.compare}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Soak test: many synthetic conversations at once, for a long time, against the
+local stand-in providers (bench/fakes.py). Reproduces slow memory growth,
+descriptor leaks and latency drift that only show up after hours of uptime.
+
+    python bench/soak.py --sessions 20 --duration 600
+    python bench/soak.py --sessions 50 --duration 14400 --out bench-results/soak.json
+
+Each synthetic call is a worker job: app.prewarm() runs once on a JobProcess,
+as in a prewarmed job process, and every call runs app.entrypoint() with a
+livekit JobContext, shut down the way livekit's job runner does it (room
+disconnect, every shutdown callback, the job's HTTP context). Only the room
+is a stand-in: its caller is a microphone that streams silence in real time
+and, for each turn, a second of tone that the live Deepgram fake transcribes,
+so the session's own VAD, STT stream and turn detection commit the user
+turn; the agent's audio goes to a sink that plays it out in real time. After
+its turns the caller hangs up, the session closes on the disconnect, and a
+new call takes its place.
+
+Every --report-every seconds it records RSS, open file descriptors and
+sockets, asyncio tasks, event-loop lag, SQLite size and turn latency (end of
+the user's utterance to the first reply audio). At the end it drains all
+sessions, closes the HTTP pools and providers, and fails (exit 1) on:
+
+- jobs that never finished, sessions closed without a close event, or
+  sessions still alive after garbage collection
+- asyncio tasks, file descriptors or sockets left over beyond the baseline
+- RSS growing faster than --max-rss-growth MB/hour after warm-up
+- turn p95 latency in the last third of the run more than --max-latency-drift
+  above the first third
+- more than --max-error-rate of turns failing
+
+A broken setup fails fast instead of running for --duration: the run stops
+if the warm-up call completes no turn, or once --abort-after-errors
+turns have failed before any completed.
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+import weakref
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+# hermetic: private DB and metrics dir, no shared disk caches, no metrics server
+_TMP = tempfile.mkdtemp(prefix="voice-agent-soak-")
+os.environ.setdefault("TTS_CACHE_DIR", "")
+os.environ.setdefault("CLIPS_DIR", "")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("TTS_AUDIO_FORMAT", "wav")
+os.environ.setdefault("DEEPINFRA_API_KEY", "soak")
+os.environ.setdefault("GROQ_API_KEY", "soak")
+os.environ.setdefault("DEEPGRAM_API_KEY", "soak")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# never the real conversation database, whatever the environment says
+os.environ["MEMORY_DB_PATH"] = os.path.join(_TMP, "conversations.db")
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(_TMP, "metrics"))
+
+from fakes import SAMPLE_RATE, FakeConfig, FakeProviders, utterance  # noqa: E402
+from run_bench import pct, rss_mb  # noqa: E402
+
+
+# ---------------- process probes ----------------
+def open_fds() -> Dict[str, int]:
+    fds = sockets = 0
+    for fd in os.listdir("/proc/self/fd"):
+        fds += 1
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                sockets += 1
+        except OSError:
+            pass
+    return {"fds": fds, "sockets": sockets}
+
+
+def sqlite_mb(db_path: str) -> float:
+    stem = os.path.splitext(db_path)[0]
+    files = set(glob.glob(db_path + "*")) | set(glob.glob(stem + ".archive.db*"))
+    return round(sum(os.path.getsize(f) for f in files if os.path.exists(f)) / 1e6, 2)
+
+
+def slope_per_hour(points: List[tuple]) -> float:
+    """Least-squares slope of (seconds, value) points, per hour."""
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mx = sum(p[0] for p in points) / n
+    my = sum(p[1] for p in points) / n
+    var = sum((p[0] - mx) ** 2 for p in points)
+    if var == 0:
+        return 0.0
+    return sum((p[0] - mx) * (p[1] - my) for p in points) / var * 3600
+
+
+# ---------------- audio input ----------------
+def _mic_class():
+    from livekit import rtc
+    from livekit.agents.voice import io
+
+    class RealtimeAudioInput(io.AudioInput):
+        """20ms frames at the pace of a live microphone: silence, or whatever was queued with speak()."""
+
+        FRAME_SAMPLES = SAMPLE_RATE // 50
+
+        def __init__(self):
+            super().__init__(label="SoakMic")
+            self._speech = b""
+            self._spoken: Optional[asyncio.Future] = None
+            self._next = 0.0
+
+        def speak(self, pcm: bytes) -> asyncio.Future:
+            """Queue an utterance; resolves to the perf_counter time its last frame went out."""
+            self._speech = pcm
+            self._spoken = asyncio.get_running_loop().create_future()
+            return self._spoken
+
+        async def __anext__(self) -> rtc.AudioFrame:
+            now = time.monotonic()
+            self._next = max(self._next, now - 0.1) + self.FRAME_SAMPLES / SAMPLE_RATE
+            await asyncio.sleep(max(0.0, self._next - now))
+            size = self.FRAME_SAMPLES * 2
+            chunk, self._speech = self._speech[:size], self._speech[size:]
+            if self._spoken is not None and not self._speech:
+                if not self._spoken.done():
+                    self._spoken.set_result(time.perf_counter())
+                self._spoken = None
+            return rtc.AudioFrame(chunk.ljust(size, b"\0"), SAMPLE_RATE, 1, self.FRAME_SAMPLES)
+
+    return RealtimeAudioInput
+
+
+# ---------------- audio sink ----------------
+def _sink_class():
+    from livekit.agents.voice import io
+
+    class RealtimeAudioSink(io.AudioOutput):
+        """Plays nothing, but takes as long as the audio would, like a room output."""
+
+        def __init__(self):
+            super().__init__(
+                label="SoakSink", capabilities=io.AudioOutputCapabilities(pause=False), sample_rate=SAMPLE_RATE
+            )
+            self._pushed = 0.0
+            self._started = 0.0
+            self._playout: Optional[asyncio.Task] = None
+            self._playing_since = 0.0
+            self.first_frame: Optional[asyncio.Future] = None
+            self.played: Optional[asyncio.Future] = None
+
+        def expect_audio(self) -> asyncio.Future:
+            """Resolves to the perf_counter time of the next audio; .played once that reply has played out."""
+            loop = asyncio.get_running_loop()
+            self.first_frame, self.played = loop.create_future(), loop.create_future()
+            return self.first_frame
+
+        async def capture_frame(self, frame) -> None:
+            await super().capture_frame(frame)
+            if self.first_frame is not None and not self.first_frame.done():
+                self.first_frame.set_result(time.perf_counter())
+            if not self._pushed:
+                self._started = time.monotonic()
+            self._pushed += frame.duration
+
+        def flush(self) -> None:
+            super().flush()
+            if self._pushed:
+                # the segment plays out from its first frame for as long as its audio lasts
+                segment, self._pushed = (self._started, self._pushed), 0.0
+                self._playing_since = self._started
+                self._playout = asyncio.create_task(self._finish(*segment, self._expected()))
+
+        def clear_buffer(self) -> None:
+            now = time.monotonic()
+            if self._playout is not None and not self._playout.done():
+                self._playout.cancel()
+                self._playout = None
+                self.on_playback_finished(playback_position=now - self._playing_since, interrupted=True)
+            if self._pushed:
+                self._pushed = 0.0
+                self.on_playback_finished(playback_position=0.0, interrupted=True)
+            self._resolve(self._expected())
+
+        def _expected(self) -> Optional[asyncio.Future]:
+            # the expected reply once it has started; audio before it (the greeting) is not it
+            if self.first_frame is not None and self.first_frame.done():
+                return self.played
+            return None
+
+        @staticmethod
+        def _resolve(played: Optional[asyncio.Future]) -> None:
+            if played is not None and not played.done():
+                played.set_result(None)
+
+        async def _finish(self, started: float, duration: float, played: Optional[asyncio.Future]) -> None:
+            await asyncio.sleep(max(0.0, started + duration - time.monotonic()))
+            self.on_playback_finished(playback_position=duration, interrupted=False)
+            self._resolve(played)
+
+    return RealtimeAudioSink
+
+
+# ---------------- the job's room ----------------
+def _room_classes():
+    from livekit import rtc
+    from livekit.agents import CloseReason, JobContext
+
+    class SoakRoom(rtc.EventEmitter):
+        """The parts of rtc.Room a job uses, with one caller whose microphone is the soak mic."""
+
+        def __init__(self, name: str, caller: str, mic, sink, on_session):
+            super().__init__()
+            self.name = name
+            self.mic = mic
+            self.sink = sink
+            self.on_session = on_session
+            self.session_closed = asyncio.get_running_loop().create_future()
+            self.local_participant = SimpleNamespace(identity="agent-soak")
+            self.remote_participants: Dict[str, SimpleNamespace] = {}
+            self._caller = SimpleNamespace(
+                identity=caller, kind=rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD, track_publications={}
+            )
+            self._connected = False
+
+        def isconnected(self) -> bool:
+            return self._connected
+
+        async def connect(self, url: str, token: str, options=None) -> None:
+            # the caller created the room, so they are in it when the agent joins
+            self._connected = True
+            self.remote_participants[self._caller.identity] = self._caller
+
+        def hang_up(self) -> None:
+            caller = self.remote_participants.pop(self._caller.identity, None)
+            if caller is not None:
+                self.emit("participant_disconnected", caller)
+
+        async def disconnect(self) -> None:
+            self._connected = False
+
+    class SoakRoomIO:
+        """Stands in for RoomIO: the session listens to the room's mic and plays into its sink."""
+
+        def __init__(self, *, room, agent_session, input_options, output_options):
+            self._room = room
+            self._session = agent_session
+            self._input_options = input_options
+            self.subscribed_fut = None
+
+        async def start(self) -> None:
+            self._session.input.audio = self._room.mic
+            self._session.output.audio = self._room.sink
+            self._room.on("participant_disconnected", self._on_participant_disconnected)
+            self._room.on_session(self._session, self._room)
+
+        def _on_participant_disconnected(self, participant) -> None:
+            # what RoomIO does with close_on_disconnect when the linked participant leaves
+            opts = self._input_options
+            if opts.close_on_disconnect and participant.identity == opts.participant_identity:
+                self._session._close_soon(reason=CloseReason.PARTICIPANT_DISCONNECTED)
+
+        async def aclose(self) -> None:
+            self._room.off("participant_disconnected", self._on_participant_disconnected)
+
+    class SoakJobContext(JobContext):
+        def _init_log_factory(self) -> None:
+            # each JobContext wraps the global log record factory: fine in a job process,
+            # which runs one job, but the soak runs thousands of jobs in one process
+            pass
+
+    return SoakRoom, SoakRoomIO, SoakJobContext
+
+
+# ---------------- the run ----------------
+@dataclass
+class SoakState:
+    started: int = 0
+    closed: int = 0
+    close_events: int = 0
+    turns: int = 0
+    errors: int = 0
+    latencies: List[tuple] = field(default_factory=list)  # (seconds since start, latency)
+    last_errors: List[str] = field(default_factory=list)
+    aborted: Optional[str] = None
+
+
+class Soak:
+    def __init__(self, args, fakes: FakeProviders):
+        import app
+        from livekit.agents import JobExecutorType, JobProcess
+        from livekit.agents.voice import room_io
+
+        self.args = args
+        self.fakes = fakes
+        self.app = app
+        # one prewarmed job process serving every call (see prepare)
+        self.proc = JobProcess(executor_type=JobExecutorType.PROCESS, user_arguments=None, http_proxy=None)
+        self.cfg = None
+        self.state = SoakState()
+        self.live_sessions: "weakref.WeakSet" = weakref.WeakSet()
+        self.mic_class = _mic_class()
+        self.sink_class = _sink_class()
+        self.room_class, room_io_class, self.ctx_class = _room_classes()
+        # AgentSession.start(room=...) builds its RoomIO from here
+        self._room_io, room_io.RoomIO = room_io.RoomIO, room_io_class
+        self.started_at = time.monotonic()
+        self.abort = asyncio.Event()
+        # one second of "speech", like a short utterance; the mic adds the silence after it
+        self.utterance = utterance(1.0, 0.0)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def _error(self, message: str) -> None:
+        st = self.state
+        st.errors += 1
+        st.last_errors = (st.last_errors + [message])[-5:]
+        if not st.turns and st.errors >= self.args.abort_after_errors and not self.abort.is_set():
+            st.aborted = f"aborted: {st.errors} errors and no completed turn, e.g. {message}"
+            print(f"[soak] {st.aborted}", flush=True)
+            self.abort.set()
+
+    async def prepare(self) -> None:
+        # livekit runs prewarm synchronously before the job's event loop takes over
+        await asyncio.to_thread(self.app.prewarm, self.proc)
+        self.cfg = self.proc.userdata["config"]
+        # one throwaway call, so what the first job opens for the life of the
+        # process (metrics files, the DB readers' connections) is part of the baseline
+        try:
+            await self.job(-1)
+        except Exception as e:
+            raise RuntimeError(f"warm-up job failed: {e!r}") from e
+        if not self.state.turns:
+            raise RuntimeError(f"warm-up job completed no turn: {self.state.last_errors[-1:]}")
+        self.state = SoakState()
+        self.started_at = time.monotonic()
+
+    async def job(self, n: int) -> None:
+        """One synthetic call: app.entrypoint on a JobContext, ended like livekit's job runner ends it."""
+        from livekit.agents.job import JobAcceptArguments, RunningJobInfo, _JobContextVar
+        from livekit.agents.utils import http_context
+        from livekit.protocol import agent, models
+
+        args, st = self.args, self.state
+        room = self.room_class(
+            f"soak-{n}", f"soak-user-{n % args.users}", self.mic_class(), self.sink_class(), on_session=self._track
+        )
+        ctx = self.ctx_class(
+            proc=self.proc,
+            info=RunningJobInfo(
+                accept_arguments=JobAcceptArguments(name="", identity="agent-soak", metadata=""),
+                job=agent.Job(id=f"soak-{n}", room=models.Room(name=room.name)),
+                url=self.fakes.base_url,
+                token="",
+                worker_id="soak",
+            ),
+            room=room,
+            on_connect=lambda: None,
+            on_shutdown=lambda reason: None,
+            inference_executor=None,
+        )
+        st.started += 1
+        token = _JobContextVar.set(ctx)
+        http_context._new_session_ctx()
+        try:
+            await self.app.entrypoint(ctx)
+            for _ in range(args.turns):
+                await asyncio.sleep(args.think_s)
+                if self.abort.is_set():
+                    break
+                try:
+                    await asyncio.wait_for(self._turn(room), args.turn_timeout)
+                    st.turns += 1
+                except asyncio.TimeoutError:
+                    self._error(f"no reply audio within {args.turn_timeout}s")
+            # the caller hangs up; the session closes on it (close_on_disconnect)
+            room.hang_up()
+            await asyncio.wait_for(asyncio.shield(room.session_closed), args.turn_timeout)
+        finally:
+            await room.disconnect()
+            try:
+                await asyncio.gather(*(cb("soak call ended") for cb in ctx._shutdown_callbacks))
+            except Exception as e:
+                self._error(f"shutdown callback failed: {e!r}")
+            await http_context._close_http_ctx()
+            _JobContextVar.reset(token)
+            st.closed += 1
+
+    def _track(self, session, room) -> None:
+        st = self.state
+
+        def on_close(_ev) -> None:
+            st.close_events += 1
+            if not room.session_closed.done():
+                room.session_closed.set_result(None)
+
+        session.on("close", on_close)
+        self.live_sessions.add(session)
+
+    async def _turn(self, room) -> None:
+        # latency: end of the user's utterance to the first audio of the reply it triggers
+        first = room.sink.expect_audio()
+        speech_end = await room.mic.speak(self.utterance)
+        first_at = await first
+        self.state.latencies.append((self.elapsed(), first_at - speech_end))
+        await room.sink.played
+
+    async def run(self) -> None:
+        """Keep --sessions calls going until --duration is up, then let them finish."""
+        deadline = time.monotonic() + self.args.duration
+        aborted = asyncio.create_task(self.abort.wait(), name="soak-abort")
+        running = set()
+        n = 0
+        try:
+            while time.monotonic() < deadline and not self.abort.is_set():
+                while len(running) < self.args.sessions and not self.abort.is_set():
+                    running.add(asyncio.create_task(self.job(n), name=f"soak-job-{n}"))
+                    n += 1
+                    # spread job starts over the first second of each wave
+                    await asyncio.sleep(1 / self.args.sessions)
+                done, _ = await asyncio.wait(
+                    running | {aborted}, timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                done.discard(aborted)
+                running -= done
+                self._reap(done)
+            # after an abort, calls stop at their next turn and end normally
+            if running:
+                done, _ = await asyncio.wait(running)
+                self._reap(done)
+        finally:
+            aborted.cancel()
+            await asyncio.gather(aborted, return_exceptions=True)
+
+    def _reap(self, tasks) -> None:
+        # a job that failed outside its turns (entrypoint, hang-up)
+        for task in tasks:
+            if task.exception() is not None:
+                self._error(repr(task.exception()))
+
+    async def aclose(self) -> None:
+        from deepinfra_tts import close_shared_http_session
+        from livekit.agents.voice import room_io
+
+        room_io.RoomIO = self._room_io
+        await close_shared_http_session()
+        await self.app.TTS_CACHE.aclose()
+        if "db" in self.proc.userdata:
+            await self.proc.userdata["db"].aclose()
+
+
+async def sample_loop(soak: Soak, probe, timeline: List[dict], every: float) -> None:
+    seen = 0
+    while True:
+        await asyncio.sleep(every)
+        st = soak.state
+        window = [lat for _, lat in st.latencies[seen:]]
+        seen = len(st.latencies)
+        lag = probe.take()
+        # measure what is still reachable: clients that are only freed by the cycle
+        # collector (e.g. each session's LLM HTTP pool) would otherwise read as growth
+        gc.collect()
+        point = {
+            "t_s": round(soak.elapsed(), 1),
+            "rss_mb": rss_mb(),
+            **open_fds(),
+            "tasks": len(asyncio.all_tasks()),
+            "loop_lag_ms": round(lag * 1000, 1),
+            "sqlite_mb": sqlite_mb(soak.cfg.db_path),
+            "active_sessions": st.started - st.closed,
+            "turns": st.turns,
+            "errors": st.errors,
+            "turn_p50_ms": pct(window, 0.5),
+            "turn_p95_ms": pct(window, 0.95),
+        }
+        timeline.append(point)
+        print(
+            f"[soak] {point['t_s']:>7.0f}s  rss {point['rss_mb']:.0f}MB  fds {point['fds']}  "
+            f"sockets {point['sockets']}  tasks {point['tasks']}  lag {point['loop_lag_ms']}ms  "
+            f"db {point['sqlite_mb']}MB  sessions {point['active_sessions']}  turns {point['turns']}  "
+            f"errors {point['errors']}  p95 {point['turn_p95_ms']}ms",
+            flush=True,
+        )
+        # the collection's own pause is not the agent's loop lag
+        await asyncio.sleep(probe.interval * 2)
+        probe.take()
+
+
+def verdict(args, soak: Soak, timeline: List[dict], baseline: dict, final: dict, leftover_tasks: List[str]) -> List[str]:
+    st = soak.state
+    failures = [st.aborted] if st.aborted else []
+    if st.started != st.closed:
+        failures.append(f"{st.started - st.closed} job(s) never finished")
+    if st.close_events != st.closed:
+        failures.append(f"{st.closed - st.close_events} AgentSession(s) closed without a close event")
+    if final["live_sessions"]:
+        failures.append(f"{final['live_sessions']} AgentSession object(s) still alive after gc")
+    if len(leftover_tasks) > args.task_slack:
+        failures.append(f"{len(leftover_tasks)} asyncio task(s) left over: {', '.join(leftover_tasks[:10])}")
+    for key in ("fds", "sockets"):
+        if final[key] > baseline[key] + args.fd_slack:
+            failures.append(f"{key}: {baseline[key]} at start, {final[key]} after shutdown")
+
+    settled = [p for p in timeline if p["t_s"] >= args.warmup]
+    rss_growth = slope_per_hour([(p["t_s"], p["rss_mb"]) for p in settled])
+    if len(settled) >= 3 and rss_growth > args.max_rss_growth:
+        failures.append(f"RSS grows {rss_growth:.1f} MB/hour after warm-up (limit {args.max_rss_growth})")
+
+    lats = [(t, lat) for t, lat in st.latencies if t >= args.warmup]
+    third = len(lats) // 3
+    if third >= 20:
+        early = pct([lat for _, lat in lats[:third]], 0.95)
+        late = pct([lat for _, lat in lats[-third:]], 0.95)
+        if late > early * (1 + args.max_latency_drift):
+            failures.append(f"turn p95 drifted from {early}ms to {late}ms")
+
+    attempted = st.turns + st.errors
+    if attempted and st.errors / attempted > args.max_error_rate:
+        failures.append(f"{st.errors}/{attempted} turns failed, e.g. {st.last_errors[-1:]}")
+    if not st.turns:
+        failures.append("no turn completed")
+    return failures
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=20, help="concurrent synthetic calls (jobs)")
+    ap.add_argument("--duration", type=float, default=600, help="seconds to keep starting sessions")
+    ap.add_argument("--turns", type=int, default=5, help="turns per call")
+    ap.add_argument("--users", type=int, default=50, help="distinct participants (memory partitions)")
+    ap.add_argument("--think-s", type=float, default=1.0, help="pause before each user turn")
+    ap.add_argument("--turn-timeout", type=float, default=30.0)
+    ap.add_argument("--report-every", type=float, default=30.0, help="seconds between samples")
+    ap.add_argument("--warmup", type=float, default=None, help="seconds excluded from drift checks (default 10%%)")
+    ap.add_argument("--tts-ttfb-ms", type=float, default=FakeConfig.tts_ttfb_ms)
+    ap.add_argument("--llm-ttft-ms", type=float, default=FakeConfig.llm_ttft_ms)
+    ap.add_argument("--max-rss-growth", type=float, default=20.0, help="MB/hour")
+    ap.add_argument("--max-latency-drift", type=float, default=0.5, help="allowed relative p95 increase")
+    ap.add_argument("--max-error-rate", type=float, default=0.01)
+    ap.add_argument(
+        "--abort-after-errors", type=int, default=10, help="give up once this many turns fail before any completes"
+    )
+    ap.add_argument("--fd-slack", type=int, default=8)
+    ap.add_argument("--task-slack", type=int, default=0)
+    ap.add_argument("--out", default=os.path.join("bench-results", f"soak-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"))
+    args = ap.parse_args()
+    if args.warmup is None:
+        args.warmup = args.duration * 0.1
+
+    import agent_logging
+    from config import AgentConfig
+    from load_monitor import LoopLagProbe
+
+    agent_logging.setup_logging(AgentConfig.from_env(), install_handler=True)
+    fakes = await FakeProviders(FakeConfig(tts_ttfb_ms=args.tts_ttfb_ms, llm_ttft_ms=args.llm_ttft_ms)).start()
+    # the agent's config reads the provider URLs from the environment
+    os.environ["TTS_BASE_URL"] = fakes.tts_base_url
+    os.environ["LLM_BASE_URL"] = fakes.llm_base_url
+    os.environ["DEEPGRAM_BASE_URL"] = f"{fakes.stt_base_url}/listen"
+    soak = Soak(args, fakes)
+    try:
+        await soak.prepare()
+    except Exception:
+        await soak.aclose()
+        await fakes.aclose()
+        raise
+    await asyncio.sleep(1.0)
+    baseline = open_fds()
+
+    probe = LoopLagProbe(role="soak")
+    probe.start()
+    timeline: List[dict] = []
+    sampler = asyncio.create_task(sample_loop(soak, probe, timeline, args.report_every))
+    print(f"[soak] {args.sessions} sessions x {args.turns} turns for {args.duration:.0f}s", flush=True)
+    try:
+        await soak.run()
+    finally:
+        sampler.cancel()
+        await asyncio.gather(sampler, return_exceptions=True)
+        await probe.aclose()
+        await soak.aclose()
+        await fakes.aclose()
+
+    # give closed connections a moment to be released, then look for leftovers;
+    # the executor's threads hold thread-local SQLite readers until they exit
+    await asyncio.sleep(1.0)
+    await asyncio.get_running_loop().shutdown_default_executor()
+    gc.collect()
+    leftover = [t.get_name() for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    final = {**open_fds(), "rss_mb": rss_mb(), "live_sessions": len(soak.live_sessions)}
+    failures = verdict(args, soak, timeline, baseline, final, leftover)
+
+    st = soak.state
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "summary": {
+            "sessions": st.started,
+            "turns": st.turns,
+            "errors": st.errors,
+            "turn_p50_ms": pct([lat for _, lat in st.latencies], 0.5),
+            "turn_p95_ms": pct([lat for _, lat in st.latencies], 0.95),
+            "rss_growth_mb_per_hour": round(
+                slope_per_hour([(p["t_s"], p["rss_mb"]) for p in timeline if p["t_s"] >= args.warmup]), 2
+            ),
+            "baseline": baseline,
+            "final": final,
+            "leftover_tasks": leftover,
+            "failures": failures,
+        },
+        "timeline": timeline,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["summary"], indent=2))
+    print(f"[soak] wrote {args.out}")
+    for failure in failures:
+        print(f"[soak] FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("[soak] no leaks or drift detected")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
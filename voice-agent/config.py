@@ -0,0 +1,209 @@
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+def _env_int(name: str, default: str) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_phrases(name: str, default: str) -> Tuple[str, ...]:
+    # "|"-separated, since phrases contain commas
+    return tuple(p.strip() for p in os.getenv(name, default).split("|") if p.strip())
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    """All env-driven settings, parsed once per process (see prewarm in app.py)."""
+
+    livekit_url: str
+    livekit_api_key: str
+    livekit_api_secret: str
+
+    deepgram_model: str
+    deepgram_api_key: str
+    deepgram_base_url: str
+
+    llm_model: str
+    llm_base_url: str
+    llm_temperature: float
+
+    deepinfra_api_key: str
+    tts_model: str
+    tts_base_url: str
+    tts_voice: str
+    tts_speed: float
+    tts_format: str
+    tts_pool_limit: int
+    tts_pool_limit_per_host: int
+    tts_keepalive_s: float
+    tts_warm_connections: int
+    tts_pipeline_depth: int
+    tts_first_clause_chars: int
+    tts_hedge_percentile: float
+    tts_hedge_min_delay_ms: float
+    tts_hedge_initial_delay_ms: float
+    tts_breaker_failures: int
+    tts_breaker_slow_ms: float
+    tts_breaker_reset_s: float
+    tts_fallback: str
+    tts_fallback_model: str
+    tts_fallback_voice: str
+
+    clips_dir: str
+    clips_greetings: Tuple[str, ...]
+    clips_acks: Tuple[str, ...]
+    clips_fillers: Tuple[str, ...]
+    clips_filler_after_ms: float
+
+    speculative: bool
+    speculative_stable_ms: float
+    speculative_tts: bool
+
+    db_path: str
+    memory_retention_days: float
+    memory_hot_max_rows: int
+    memory_compact_interval_s: float
+    memory_archive_path: str
+    context_token_budget: int
+    context_summary_tokens: int
+    context_turn_tokens: int
+    context_summarizer: str
+    recall_top_k: int
+    recall_budget_ms: float
+
+    direct_rooms: Tuple[str, ...]
+    direct_discover: bool
+    direct_poll_s: float
+    direct_max_rooms: int
+
+    num_idle_processes: int
+    metrics_port: int
+    metrics_addr: str
+    load_threshold: float
+    max_sessions: int
+    session_cpu_cost: float
+    loop_lag_budget_ms: float
+
+    log_level: str
+    log_format: str
+    log_sampling: str
+
+    @classmethod
+    def from_env(cls) -> "AgentConfig":
+        return cls(
+            livekit_url=os.environ.get("LIVEKIT_URL", "ws://127.0.0.1:7880"),
+            livekit_api_key=os.environ.get("LIVEKIT_API_KEY", ""),
+            livekit_api_secret=os.environ.get("LIVEKIT_API_SECRET", ""),
+            deepgram_model=os.getenv("DEEPGRAM_MODEL", "nova-3"),
+            deepgram_api_key=os.environ.get("DEEPGRAM_API_KEY", ""),
+            deepgram_base_url=os.getenv("DEEPGRAM_BASE_URL", "https://api.deepgram.com/v1/listen"),
+            llm_model=os.getenv("LLM_MODEL", "openai/gpt-oss-120b"),
+            llm_base_url=os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1"),
+            llm_temperature=_env_float("LLM_TEMPERATURE", "1.0"),
+            deepinfra_api_key=os.environ.get("DEEPINFRA_API_KEY", ""),
+            tts_model=os.getenv("TTS_MODEL", "hexgrad/Kokoro-82M"),
+            tts_base_url=os.getenv("TTS_BASE_URL", "https://api.deepinfra.com/v1/openai"),
+            tts_voice=os.getenv("TTS_VOICE", "af_heart"),
+            tts_speed=_env_float("TTS_SPEED", "1.0"),
+            tts_format=os.getenv("TTS_AUDIO_FORMAT", "mp3"),
+            tts_pool_limit=_env_int("TTS_POOL_LIMIT", "32"),
+            tts_pool_limit_per_host=_env_int("TTS_POOL_LIMIT_PER_HOST", "16"),
+            tts_keepalive_s=_env_float("TTS_KEEPALIVE_S", "60"),
+            tts_warm_connections=_env_int("TTS_WARM_CONNECTIONS", "2"),
+            tts_pipeline_depth=_env_int("TTS_PIPELINE_DEPTH", "3"),
+            tts_first_clause_chars=_env_int("TTS_FIRST_CLAUSE_CHARS", "8"),
+            tts_hedge_percentile=_env_float("TTS_HEDGE_PERCENTILE", "95"),
+            tts_hedge_min_delay_ms=_env_float("TTS_HEDGE_MIN_DELAY_MS", "300"),
+            tts_hedge_initial_delay_ms=_env_float("TTS_HEDGE_INITIAL_DELAY_MS", "800"),
+            tts_breaker_failures=_env_int("TTS_BREAKER_FAILURES", "5"),
+            tts_breaker_slow_ms=_env_float("TTS_BREAKER_SLOW_MS", "2000"),
+            tts_breaker_reset_s=_env_float("TTS_BREAKER_RESET_S", "30"),
+            tts_fallback=os.getenv("TTS_FALLBACK", "").lower(),
+            tts_fallback_model=os.getenv("TTS_FALLBACK_MODEL", "gpt-4o-mini-tts"),
+            tts_fallback_voice=os.getenv("TTS_FALLBACK_VOICE", "alloy"),
+            clips_dir=os.getenv("CLIPS_DIR", "/persist/clips"),
+            clips_greetings=_env_phrases("CLIPS_GREETINGS", "Hey! Good to hear from you.|Hi there, what's on your mind?"),
+            clips_acks=_env_phrases("CLIPS_ACKS", "Mm-hm.|Okay.|Right."),
+            clips_fillers=_env_phrases("CLIPS_FILLERS", "Hmm, let me think.|Good question.|One sec."),
+            clips_filler_after_ms=_env_float("CLIPS_FILLER_AFTER_MS", "-1"),
+            speculative=os.getenv("SPECULATIVE", "0").lower() in ("1", "true", "yes"),
+            speculative_stable_ms=_env_float("SPECULATIVE_STABLE_MS", "300"),
+            speculative_tts=os.getenv("SPECULATIVE_TTS", "0").lower() in ("1", "true", "yes"),
+            db_path=os.getenv("MEMORY_DB_PATH", "/opt/Livekit/conversations.db"),
+            memory_retention_days=_env_float("MEMORY_RETENTION_DAYS", "0"),
+            memory_hot_max_rows=_env_int("MEMORY_HOT_MAX_ROWS", "0"),
+            memory_compact_interval_s=_env_float("MEMORY_COMPACT_INTERVAL_S", "900"),
+            memory_archive_path=os.getenv("MEMORY_ARCHIVE_PATH", ""),
+            context_token_budget=_env_int("CONTEXT_TOKEN_BUDGET", "1500"),
+            context_summary_tokens=_env_int("CONTEXT_SUMMARY_TOKENS", "300"),
+            context_turn_tokens=_env_int("CONTEXT_TURN_TOKENS", "150"),
+            context_summarizer=os.getenv("CONTEXT_SUMMARIZER", "extractive"),
+            recall_top_k=_env_int("RECALL_TOP_K", "3"),
+            recall_budget_ms=_env_float("RECALL_BUDGET_MS", "5"),
+            direct_rooms=tuple(r.strip() for r in os.getenv("DIRECT_ROOMS", "default").split(",") if r.strip()),
+            direct_discover=os.getenv("DIRECT_DISCOVER", "0").lower() in ("1", "true", "yes"),
+            direct_poll_s=_env_float("DIRECT_POLL_S", "5"),
+            direct_max_rooms=_env_int("DIRECT_MAX_ROOMS", "20"),
+            num_idle_processes=_env_int("NUM_IDLE_PROCESSES", "2"),
+            metrics_port=_env_int("METRICS_PORT", "9464"),
+            metrics_addr=os.getenv("METRICS_ADDR", "127.0.0.1"),
+            load_threshold=_env_float("LOAD_THRESHOLD", "0.75"),
+            max_sessions=_env_int("MAX_SESSIONS", "0"),
+            session_cpu_cost=_env_float("SESSION_CPU_COST", "0.25"),
+            loop_lag_budget_ms=_env_float("LOOP_LAG_BUDGET_MS", "100"),
+            log_level=os.getenv("LOG_LEVEL", "INFO"),
+            log_format=os.getenv("LOG_FORMAT", "text").lower(),
+            log_sampling=os.getenv("LOG_SAMPLING", ""),
+        )
+
+    def clip_phrases(self) -> dict:
+        """Phrases to pre-render per clip kind (see audio_clips.py); acks and fillers only if they can play."""
+        after = self.clips_filler_after
+        return {
+            "greeting": self.clips_greetings,
+            "ack": self.clips_acks if after == 0 else (),
+            "filler": self.clips_fillers if after is not None and after > 0 else (),
+        }
+
+    @property
+    def clips_filler_after(self) -> Optional[float]:
+        """Operator's filler delay in seconds: 0 = ack on every turn, None = off."""
+        return None if self.clips_filler_after_ms < 0 else self.clips_filler_after_ms / 1000
+
+    def memory_kwargs(self) -> dict:
+        """SQLiteMemory constructor arguments."""
+        return dict(
+            db_path=self.db_path,
+            retention_days=self.memory_retention_days,
+            hot_max_rows=self.memory_hot_max_rows,
+            compact_interval_s=self.memory_compact_interval_s,
+            archive_path=self.memory_archive_path or None,
+        )
+
+    def tts_kwargs(self) -> dict:
+        """DeepInfraTTS constructor arguments (everything but the cache)."""
+        return dict(
+            api_key=self.deepinfra_api_key,
+            model=self.tts_model,
+            base_url=self.tts_base_url,
+            voice=self.tts_voice,
+            speed=self.tts_speed,
+            response_format=self.tts_format,
+            pool_limit=self.tts_pool_limit,
+            pool_limit_per_host=self.tts_pool_limit_per_host,
+            keepalive_timeout=self.tts_keepalive_s,
+            warm_connections=self.tts_warm_connections,
+            pipeline_depth=self.tts_pipeline_depth,
+            first_clause_chars=self.tts_first_clause_chars,
+            hedge_percentile=self.tts_hedge_percentile,
+            hedge_min_delay=self.tts_hedge_min_delay_ms / 1000,
+            hedge_initial_delay=self.tts_hedge_initial_delay_ms / 1000,
+            breaker_failures=self.tts_breaker_failures,
+            breaker_slow_s=self.tts_breaker_slow_ms / 1000,
+            breaker_reset_s=self.tts_breaker_reset_s,
+        )
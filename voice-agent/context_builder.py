@@ -0,0 +1,247 @@
+"""
+Token-budgeted chat context assembly.
+
+The prompt for a new session is:
+
+    [rolling summary of older turns] + [as many recent turns as fit the budget]
+
+Turns that fall out of the budget are folded into the summary once, at the end
+of a session (refresh_summary), and the summary is stored next to the messages
+with a watermark id. Later sessions only read the summary plus the turns after
+the watermark, so history is never re-processed.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from memory_sql import SQLiteMemory
+
+logger = logging.getLogger(__name__)
+
+# role/formatting overhead the chat template adds per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Summarizer = Callable[[str, List[Dict[str, str]]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token for English BPE vocabularies; good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def message_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def clip_to_tokens(text: str, max_tokens: int, marker: str = " … ") -> str:
+    """Keep the head and tail of an over-long turn (the tail usually holds the question back)."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    half = (max_chars - len(marker)) // 2
+    return f"{text[:half].rstrip()}{marker}{text[-half:].lstrip()}"
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _gist(text: str, max_words: int = 25) -> str:
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words]) + " …"
+    return first
+
+
+def extractive_summarizer(max_tokens: int) -> Summarizer:
+    """
+    Cheap, deterministic summarizer: one gist line per turn appended to the
+    previous summary; the oldest lines roll off once over `max_tokens`.
+    """
+
+    async def summarize(previous: str, turns: List[Dict[str, str]]) -> str:
+        lines = [line for line in previous.splitlines() if line.strip()]
+        for t in turns:
+            who = "User" if t["role"] == "user" else "You"
+            lines.append(f"- {who}: {_gist(t['content'])}")
+        while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    return summarize
+
+
+def llm_summarizer(llm, max_tokens: int) -> Summarizer:
+    """Summarize with the session LLM; falls back to the extractive summary on errors."""
+    from livekit.agents import ChatContext
+
+    fallback = extractive_summarizer(max_tokens)
+
+    async def summarize(previous: str, turns: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(
+            f"{'User' if t['role'] == 'user' else 'Assistant'}: {t['content']}" for t in turns
+        )
+        ctx = ChatContext()
+        ctx.add_message(
+            role="system",
+            content=(
+                "Update the running summary of a voice conversation. Keep facts about the "
+                "user, their preferences, open questions and commitments. Plain sentences, "
+                f"at most {max_tokens * 3 // 4} words."
+            ),
+        )
+        ctx.add_message(
+            role="user",
+            content=f"Current summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}",
+        )
+        try:
+            parts = []
+            async with llm.chat(chat_ctx=ctx) as stream:
+                async for chunk in stream:
+                    if chunk.delta and chunk.delta.content:
+                        parts.append(chunk.delta.content)
+            text = "".join(parts).strip()
+            if text:
+                return clip_to_tokens(text, max_tokens)
+        except Exception:
+            logger.exception("[ContextBuilder] LLM summary failed, using extractive summary")
+        return await fallback(previous, turns)
+
+    return summarize
+
+
+@dataclass
+class ContextStats:
+    prompt_tokens: int = 0
+    history_tokens: int = 0  # what the full raw history would have cost
+    recent_turns: int = 0
+    dropped_turns: int = 0  # after the watermark but over budget (folded at session end)
+    summary_tokens: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.history_tokens - self.prompt_tokens)
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.saved_tokens / self.history_tokens if self.history_tokens else 0.0
+
+
+@dataclass
+class BuiltContext:
+    summary: str = ""
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    stats: ContextStats = field(default_factory=ContextStats)
+
+
+class ContextBuilder:
+    def __init__(
+        self,
+        db: SQLiteMemory,
+        token_budget: int = 1500,
+        summary_tokens: int = 300,
+        turn_tokens: int = 150,
+        max_rows: int = 500,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.db = db
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        # per-turn cap for assistant turns (user turns are kept verbatim if they fit)
+        self.turn_tokens = turn_tokens
+        self.max_rows = max_rows
+        self.summarize = summarizer or extractive_summarizer(summary_tokens)
+
+    def _fit(self, rows: List[Dict], budget: int):
+        """Newest-first fill of `budget`; returns (kept oldest-first, overflow oldest-first)."""
+        kept, used = [], 0
+        for i in range(len(rows) - 1, -1, -1):
+            row = rows[i]
+            content = row["content"]
+            if row["role"] != "user":
+                content = clip_to_tokens(content, self.turn_tokens)
+            cost = message_tokens(content)
+            if used + cost > budget:
+                return list(reversed(kept)), rows[: i + 1]
+            kept.append({"id": row["id"], "role": row["role"], "content": content})
+            used += cost
+        return list(reversed(kept)), []
+
+    def _recent_budget(self, summary: str) -> int:
+        return self.token_budget - (message_tokens(summary) if summary else 0)
+
+    async def build(self, *, participant: Optional[str] = None, room: Optional[str] = None) -> BuiltContext:
+        summary_row = await self.db.aget_summary(participant=participant, room=room)
+        summary = summary_row["content"] if summary_row else ""
+        after_id = summary_row["upto_id"] if summary_row else 0
+
+        rows = await self.db.aget_context_messages(
+            self.max_rows, participant=participant, room=room, after_id=after_id
+        )
+        kept, overflow = self._fit(rows, self._recent_budget(summary))
+
+        stats = ContextStats(
+            recent_turns=len(kept),
+            dropped_turns=len(overflow),
+            summary_tokens=message_tokens(summary) if summary else 0,
+        )
+        stats.prompt_tokens = stats.summary_tokens + sum(message_tokens(m["content"]) for m in kept)
+        stats.history_tokens = (summary_row["folded_tokens"] if summary_row else 0) + sum(
+            message_tokens(r["content"]) for r in rows
+        )
+        logger.info(
+            "[ContextBuilder] %s: %d prompt tokens (summary %d, %d recent turns) vs "
+            "%d for full history - saved %d (%.0f%%)",
+            participant or "*", stats.prompt_tokens, stats.summary_tokens, stats.recent_turns,
+            stats.history_tokens, stats.saved_tokens, stats.saved_ratio * 100,
+        )
+        return BuiltContext(summary=summary, messages=kept, stats=stats)
+
+    async def refresh_summary(self, *, participant: Optional[str] = None, room: Optional[str] = None) -> bool:
+        """
+        Fold every turn that no longer fits the recent-turns budget into the
+        rolling summary. Call after the session's turns are committed.
+
+        Returns:
+            True if the summary changed
+        """
+        summary_row = await self.db.aget_summary(participant=participant, room=room)
+        summary = summary_row["content"] if summary_row else ""
+        after_id = summary_row["upto_id"] if summary_row else 0
+        folded_tokens = summary_row["folded_tokens"] if summary_row else 0
+
+        async def _fold(overflow: List[Dict]) -> None:
+            nonlocal summary, after_id, folded_tokens
+            summary = await self.summarize(summary, overflow)
+            after_id = overflow[-1]["id"]
+            folded_tokens += sum(message_tokens(r["content"]) for r in overflow)
+            self.db.set_summary(
+                summary, upto_id=after_id, folded_tokens=folded_tokens, participant=participant, room=room
+            )
+            logger.info("[ContextBuilder] %s: folded %d turns into summary", participant or "*", len(overflow))
+
+        rows = await self.db.aget_context_messages(
+            self.max_rows, participant=participant, room=room, after_id=after_id
+        )
+        if not rows:
+            return False
+        # a backlog longer than max_rows (e.g. the first refresh of a long
+        # history): fold what precedes the recent window first, page by page
+        changed = False
+        while True:
+            page = await self.db.aget_context_messages(
+                self.max_rows, participant=participant, room=room,
+                after_id=after_id, before_id=rows[0]["id"], oldest_first=True,
+            )
+            if not page:
+                break
+            await _fold(page)
+            changed = True
+
+        # reserve the full summary allowance so the next build() fits the same turns
+        _, overflow = self._fit(rows, self.token_budget - self.summary_tokens - MESSAGE_OVERHEAD_TOKENS)
+        if overflow:
+            await _fold(overflow)
+            changed = True
+        return changed
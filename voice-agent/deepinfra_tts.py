@@ -1,123 +1,753 @@
+import asyncio
 import aiohttp
-from typing import Optional, Any
-from livekit.agents import tts
-import uuid
+import re
+import time
+import weakref
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from livekit.agents import (
+    tts, tokenize, utils,
+    APIConnectionError, APIConnectOptions, APIStatusError, APITimeoutError,
+    DEFAULT_API_CONNECT_OPTIONS,
+)
 import logging
 
-print("=" * 80)
-print("DEEPINFRA_TTS.PY MODULE LOADED - NEW VERSION WITH FLUSH FIX")
-print("=" * 80)
+import metrics
+from metrics import TurnTracer
+from resilience import CircuitBreaker, LatencyWindow
+from tts_cache import TTSCache
+from wav_stream import WavFormatError, WavStreamParser
 
 logger = logging.getLogger(__name__)
 
+# One keep-alive pool per event loop, shared by every DeepInfraTTS instance in the
+# process (and so by every job a worker process serves). aiohttp sessions are
+# bound to the loop they were created on, hence the loop key.
+_shared_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# A clause ends at punctuation followed by whitespace ("Sure, ...", "Hi there! ...")
+_CLAUSE_END = re.compile(r"[,;:.!?](?=\s)")
+# Give up looking for a short opening clause after this much text
+_FIRST_CLAUSE_MAX_CHARS = 100
+
+
+def first_clause_end(text: str, min_chars: int) -> Optional[int]:
+    """Index just past the first clause boundary at or after `min_chars`, or None."""
+    for m in _CLAUSE_END.finditer(text):
+        if m.end() >= min_chars:
+            return m.end()
+    return None
+
+
+def shared_http_session(
+    *,
+    limit: int = 32,
+    limit_per_host: int = 16,
+    keepalive_timeout: float = 60.0,
+) -> aiohttp.ClientSession:
+    """
+    Return the process-wide pooled session for the running loop, creating it on
+    first use. Pool limits only apply to the call that creates the session.
+    """
+    loop = asyncio.get_running_loop()
+    session = _shared_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True,
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _shared_sessions[loop] = session
+        logger.info(
+            "[DeepInfraTTS] Created shared HTTP pool (limit=%d, limit_per_host=%d, keepalive=%ss)",
+            limit, limit_per_host, keepalive_timeout,
+        )
+    return session
+
+
+class CircuitOpenError(APIConnectionError):
+    """Rejected without a request while the breaker is open (counted as `rejected`)."""
+
+
+class _ProviderGuard:
+    """TTFB history and circuit breaker of one TTS endpoint, shared by every instance in the process."""
+
+    def __init__(self, name: str, *, failure_threshold: int, slow_threshold_s: float, reset_timeout_s: float):
+        self.ttfb = LatencyWindow()
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=failure_threshold,
+            slow_threshold_s=slow_threshold_s,
+            reset_timeout_s=reset_timeout_s,
+            on_state_change=metrics.set_tts_circuit_state,
+        )
+
+
+_guards: "dict[str, _ProviderGuard]" = {}
+
+
+def _provider_guard(api_url: str, **breaker_kwargs) -> _ProviderGuard:
+    # breaker settings only apply to the call that creates the guard
+    guard = _guards.get(api_url)
+    if guard is None:
+        guard = _guards[api_url] = _ProviderGuard(urlsplit(api_url).netloc, **breaker_kwargs)
+    return guard
+
+
+async def close_shared_http_session() -> None:
+    """Close the pooled session of the running loop (call once at process shutdown)."""
+    session = _shared_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
 class DeepInfraTTS(tts.TTS):
     def __init__(
         self,
         api_key: str,
         voice: str = "af_sky",
         model: str = "hexgrad/Kokoro-82M",
+        base_url: str = "https://api.deepinfra.com/v1/openai",
         sample_rate: int = 24000,
+        speed: float = 1.0,
+        response_format: str = "mp3",
+        cache: Optional[TTSCache] = None,
+        tracer: Optional[TurnTracer] = None,
+        sentence_tokenizer: Optional[tokenize.SentenceTokenizer] = None,
+        http_session: Optional[aiohttp.ClientSession] = None,
+        pool_limit: int = 32,
+        pool_limit_per_host: int = 16,
+        keepalive_timeout: float = 60.0,
+        warm_connections: int = 2,
+        pipeline_depth: int = 3,
+        first_clause_chars: int = 8,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 0.3,
+        hedge_initial_delay: float = 0.8,
+        breaker_failures: int = 5,
+        breaker_slow_s: float = 2.0,
+        breaker_reset_s: float = 30.0,
     ):
         super().__init__(
-            capabilities=tts.TTSCapabilities(streaming=False),  # Correctly set to False
+            # streaming=True: audio is pushed as the HTTP body arrives, and
+            # stream() accepts LLM text incrementally (one request per sentence)
+            capabilities=tts.TTSCapabilities(streaming=True),
             sample_rate=sample_rate,
             num_channels=1,
         )
         self._api_key = api_key
         self._voice = voice
         self._model = model
-        self._api_url = "https://api.deepinfra.com/v1/openai/audio/speech"
-        print(f"[DeepInfraTTS] Initialized with voice={voice}, model={model}, sample_rate={sample_rate}")
-        logger.info(f"[DeepInfraTTS] Initialized with voice={voice}, model={model}, sample_rate={sample_rate}")
+        self._speed = speed
+        # "wav": raw PCM is sliced straight into frames (no MP3 decode on our CPU)
+        # "mp3": smaller on the wire, decoded by LiveKit
+        if response_format not in ("mp3", "wav"):
+            raise ValueError(f"unsupported response_format: {response_format}")
+        self._response_format = response_format
+        self._mime_type = "audio/pcm" if response_format == "wav" else "audio/mpeg"
+        self._cache = cache
+        self._tracer = tracer
+        self._api_url = f"{base_url.rstrip('/')}/audio/speech"
+        self._sentence_tokenizer = sentence_tokenizer or tokenize.basic.SentenceTokenizer()
+        # An explicitly passed session belongs to the caller; otherwise we use
+        # the process-wide pool (see shared_http_session)
+        self._http_session = http_session
+        self._pool_limit = pool_limit
+        self._pool_limit_per_host = pool_limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._warm_connections = warm_connections
+        self._warmup_task: Optional[asyncio.Task] = None
+        # stream(): sentences synthesized concurrently (1 = one request at a time);
+        # the opening clause of a reply is sent on its own once it has this many chars (0 = off)
+        self._pipeline_depth = max(1, pipeline_depth)
+        self._first_clause_chars = first_clause_chars
+        # hedge after the p`hedge_percentile` TTFB of recent requests (never sooner
+        # than hedge_min_delay; hedge_initial_delay until there is enough history)
+        self._hedge_percentile = hedge_percentile
+        self._hedge_min_delay = hedge_min_delay
+        self._hedge_initial_delay = hedge_initial_delay
+        self._guard = _provider_guard(
+            self._api_url,
+            failure_threshold=breaker_failures,
+            slow_threshold_s=breaker_slow_s,
+            reset_timeout_s=breaker_reset_s,
+        )
+        logger.info(
+            "[DeepInfraTTS] Initialized with voice=%s, model=%s, sample_rate=%d, format=%s",
+            voice, model, sample_rate, response_format,
+        )
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._http_session is not None and not self._http_session.closed:
+            return self._http_session
+        return shared_http_session(
+            limit=self._pool_limit,
+            limit_per_host=self._pool_limit_per_host,
+            keepalive_timeout=self._keepalive_timeout,
+        )
+
+    def prewarm(self) -> None:
+        """Open pooled connections in the background so the first utterance skips DNS/TCP/TLS."""
+        if self._warmup_task is None or self._warmup_task.done():
+            self._warmup_task = asyncio.create_task(self.warmup())
+
+    async def warmup(self) -> None:
+        """
+        Establish `warm_connections` keep-alive connections to the DeepInfra host.
+        Failures are logged and ignored - the real request will simply connect cold.
+        """
+        session = self._ensure_session()
+        parts = urlsplit(self._api_url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+
+        async def _one():
+            # the body is discarded on exit and the connection goes back to the pool
+            async with session.head(origin, timeout=aiohttp.ClientTimeout(total=5)):
+                pass
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(
+            *(_one() for _ in range(max(1, self._warm_connections))),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            logger.warning("[DeepInfraTTS] HTTP warm-up failed: %r", errors[0])
+        else:
+            logger.info(
+                "[DeepInfraTTS] Warmed %d connection(s) to %s in %.0fms",
+                len(results), parts.netloc, (loop.time() - started) * 1000,
+            )
+
+    async def aclose(self) -> None:
+        if self._warmup_task is not None:
+            await utils.aio.cancel_and_wait(self._warmup_task)
+        await super().aclose()
 
     def synthesize(
         self,
         text: str,
         *,
-        conn_options: Optional[Any] = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
     ) -> "DeepInfraStream":
-        print(f"[DeepInfraTTS] synthesize() called with text: {text[:100]}...")
-        logger.info(f"[DeepInfraTTS] synthesize() called with text: {text[:100]}...")
         return DeepInfraStream(
-            input_text=text,  # Changed from text= to input_text=
+            input_text=text,
             tts=self,
             conn_options=conn_options,
         )
 
+    def stream(
+        self,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "DeepInfraSynthesizeStream":
+        return DeepInfraSynthesizeStream(tts=self, conn_options=conn_options)
+
+    async def prefetch(self, text: str) -> bool:
+        """
+        Synthesize `text` into the cache without playing it, so that the next
+        request for the same text is a cache hit (speculative replies, see
+        speculation.py). Not marked on the turn's timeline. False if there is
+        no cache or the text is too long for it.
+        """
+        if self._cache is None or not self._cache.cacheable(text):
+            return False
+        await self._stream_speech(text, _Discard(), DEFAULT_API_CONNECT_OPTIONS, traced=False)
+        return True
+
+    async def _stream_speech(
+        self,
+        text: str,
+        output_emitter: "tts.AudioEmitter | _SegmentAudio | _Discard",
+        conn_options: APIConnectOptions,
+        *,
+        traced: bool = True,
+    ) -> int:
+        """
+        Synthesize one utterance and push the audio to the emitter (or a
+        pipelined segment buffer) chunk by chunk, as it arrives. In WAV mode
+        the header is stripped and only the PCM payload is pushed.
+
+        Short utterances are served from / stored into the TTS cache when one
+        is configured. Requests go through the provider's circuit breaker and
+        are hedged when the first byte is late (see _hedged_request).
+
+        Returns:
+            Number of audio bytes pushed
+        """
+        tracer = self._tracer if traced else None
+        if tracer is not None:
+            tracer.mark("tts_request")
+
+        cache_key = None
+        if self._cache is not None and self._cache.cacheable(text):
+            cache_key = TTSCache.key(self._model, self._voice, self._speed, self._response_format, text)
+            hit = await self._cache.get(cache_key)
+            metrics.count_cache_lookup(hit is not None)
+            if hit is not None:
+                _, audio = hit
+                if tracer is not None:
+                    tracer.mark("tts_first_byte")
+                output_emitter.push(audio)
+                logger.debug("[DeepInfraTTS] Cache hit (%d bytes): %.50s", len(audio), text)
+                return len(audio)
+
+        breaker = self._guard.breaker
+        if not breaker.allow():
+            metrics.count_tts_request("rejected")
+            raise CircuitOpenError("DeepInfra circuit open, failing fast", retryable=False)
+
+        chunks = [] if cache_key is not None else None
+
+        def _push(part: bytes) -> None:
+            output_emitter.push(part)
+            if chunks is not None:
+                chunks.append(part)
+
+        started = time.perf_counter()
+        try:
+            total, ttfb = await self._hedged_request(text, _push, conn_options, started, tracer)
+        except asyncio.CancelledError:
+            metrics.count_tts_request("aborted")
+            breaker.release_probe()
+            raise
+        except APITimeoutError:
+            metrics.count_tts_request("timeout")
+            breaker.record_failure()
+            raise
+        except APIStatusError as e:
+            metrics.count_tts_request("error")
+            # a rejected input is our problem, not an unhealthy provider
+            if e.status_code >= 500 or e.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.release_probe()
+            raise
+        except Exception:
+            metrics.count_tts_request("error")
+            breaker.record_failure()
+            raise
+
+        metrics.count_tts_request("slow" if ttfb > breaker.slow_threshold_s else "ok")
+        breaker.record_success(ttfb)
+        self._observe("total", started)
+        if cache_key is not None:
+            self._cache.put(cache_key, self._mime_type, b"".join(chunks))
+        return total
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds without a first byte after which a duplicate request is sent (None = off)."""
+        if self._hedge_percentile <= 0:
+            return None
+        p = self._guard.ttfb.percentile(self._hedge_percentile / 100)
+        if p is None:
+            return self._hedge_initial_delay
+        return max(self._hedge_min_delay, p)
+
+    async def _hedged_request(
+        self,
+        text: str,
+        push: Callable[[bytes], None],
+        conn_options: APIConnectOptions,
+        started: float,
+        tracer: Optional[TurnTracer] = None,
+    ) -> Tuple[int, float]:
+        """
+        Send the request and, if no audio has arrived after the hedging delay,
+        a duplicate. Whichever attempt delivers audio first wins and streams to
+        `push`; the other is cancelled. Failures before any audio only surface
+        once every attempt has failed.
+
+        Returns:
+            (bytes pushed, seconds to first audio)
+        """
+        attempts: List[asyncio.Task] = []
+        winner: Optional[asyncio.Task] = None
+        ttfb = 0.0
+
+        def _sink(part: bytes) -> None:
+            nonlocal winner, ttfb
+            me = asyncio.current_task()
+            if winner is None:
+                winner = me
+                ttfb = time.perf_counter() - started
+                self._guard.ttfb.add(ttfb)
+                self._observe("ttfb", started)
+                if tracer is not None:
+                    tracer.mark("tts_first_byte")
+                if me is not attempts[0]:
+                    metrics.count_tts_request("hedge_won")
+                for other in attempts:
+                    if other is not me:
+                        other.cancel()
+            if me is winner:
+                push(part)
+
+        attempts.append(asyncio.create_task(self._post(text, _sink, conn_options)))
+        delay = self._hedge_delay()
+        error: Optional[BaseException] = None
+        try:
+            while True:
+                pending = [t for t in attempts if not t.done()]
+                if not pending:
+                    raise error or APIConnectionError("DeepInfra request failed")
+                hedge_due = delay is not None and len(attempts) == 1 and winner is None
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=delay if hedge_due else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    if winner is None:
+                        metrics.count_tts_request("hedged")
+                        logger.info("[DeepInfraTTS] No audio after %.0fms, hedging: %.50s", delay * 1000, text)
+                        attempts.append(asyncio.create_task(self._post(text, _sink, conn_options)))
+                    delay = None
+                    continue
+                for task in done:
+                    if task is winner:
+                        return task.result(), ttfb
+                    if not task.cancelled() and task.exception() is not None:
+                        error = task.exception()
+        finally:
+            await utils.aio.cancel_and_wait(*attempts)
+
+    async def _post(self, text: str, push: Callable[[bytes], None], conn_options: APIConnectOptions) -> int:
+        """One HTTP attempt: POST the utterance and push audio parts as they arrive."""
+        headers = {
+            "Authorization": f"Bearer {self._api_key}",
+            "Content-Type": "application/json",
+        }
+
+        payload = {
+            "model": self._model,
+            "input": text,
+            "voice": self._voice,
+            "speed": self._speed,
+            "response_format": self._response_format,
+        }
+
+        total = 0
+        wav = WavStreamParser() if self._response_format == "wav" else None
+        try:
+            session = self._ensure_session()
+            async with session.post(
+                self._api_url,
+                json=payload,
+                headers=headers,
+                # sock_read bounds each wait for data, so a stalled body times out too
+                timeout=aiohttp.ClientTimeout(
+                    total=None, sock_connect=conn_options.timeout, sock_read=conn_options.timeout
+                ),
+            ) as response:
+                if not response.ok:
+                    error_text = await response.text()
+                    logger.error("[DeepInfraTTS] API error: %d - %s", response.status, error_text)
+                    raise APIStatusError(
+                        f"DeepInfra TTS error: {response.status}",
+                        status_code=response.status,
+                        request_id=None,
+                        body=error_text,
+                    )
+
+                # Push every chunk as soon as it is on the wire, so playback
+                # starts with the first frames
+                try:
+                    async for chunk in response.content.iter_any():
+                        if not chunk:
+                            continue
+                        if wav is None:
+                            parts = (chunk,)
+                        else:
+                            parsed_before = wav.header_parsed
+                            parts = wav.feed(chunk)
+                            if wav.header_parsed and not parsed_before:
+                                self._check_wav_format(wav)
+                        for part in parts:
+                            push(part)
+                            total += len(part)
+                except asyncio.CancelledError:
+                    # interrupted or lost a hedge: drop the connection now rather
+                    # than draining the rest of the body back into the pool
+                    response.close()
+                    raise
+
+        except WavFormatError as e:
+            raise APIConnectionError(f"DeepInfra returned invalid WAV: {e}", retryable=False) from None
+        except asyncio.TimeoutError:
+            raise APITimeoutError() from None
+        except aiohttp.ClientError as e:
+            raise APIConnectionError() from e
+
+        if total == 0:
+            logger.error("[DeepInfraTTS] Received empty audio data")
+            raise APIConnectionError("DeepInfra returned an empty audio body")
+        return total
+
+    def _observe(self, phase: str, started: float) -> None:
+        metrics.observe_tts_request(
+            phase, time.perf_counter() - started, model=self._model, voice=self._voice
+        )
+
+    def _check_wav_format(self, wav: WavStreamParser) -> None:
+        fmt = wav.format
+        expected = (1, self.num_channels, self.sample_rate, 16)
+        if (fmt.audio_format, fmt.num_channels, fmt.sample_rate, fmt.bits_per_sample) != expected:
+            raise WavFormatError(
+                f"expected 16-bit PCM {self.sample_rate}Hz x{self.num_channels}, got "
+                f"format={fmt.audio_format} {fmt.sample_rate}Hz x{fmt.num_channels} {fmt.bits_per_sample}-bit"
+            )
+
 
-class DeepInfraStream(tts.ChunkedStream):  # Changed from SynthesizeStream to ChunkedStream
-    def __init__(self, *, input_text: str, tts: DeepInfraTTS, conn_options: Optional[Any] = None):
+class DeepInfraStream(tts.ChunkedStream):
+    def __init__(self, *, input_text: str, tts: DeepInfraTTS, conn_options: APIConnectOptions):
         super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
         self._tts = tts
 
     async def _run(self, output_emitter: tts.AudioEmitter):
-        request_id = str(uuid.uuid4())
+        request_id = utils.shortuuid()
 
-        print(f"[DeepInfraTTS] _run() called! Starting TTS synthesis for text: {self._input_text[:100]}...")
-        logger.info(f"[DeepInfraTTS] Starting TTS synthesis for text: {self._input_text[:100]}...")
+        logger.debug("[DeepInfraTTS] Starting TTS synthesis for text: %.100s", self._input_text)
 
         # 1. Initialize the emitter before making the API call
-        print(f"[DeepInfraTTS] About to initialize emitter with MP3 format...")
         output_emitter.initialize(
             request_id=request_id,
             sample_rate=self._tts.sample_rate,
             num_channels=self._tts.num_channels,
-            mime_type="audio/mpeg",  # MP3 format - let LiveKit decode it
+            mime_type=self._tts._mime_type,  # MP3 is decoded by LiveKit, PCM is framed as-is
         )
-        print(f"[DeepInfraTTS] Emitter initialized successfully!")
-        logger.info(f"[DeepInfraTTS] Output emitter initialized with MP3 format")
-        
-        headers = {
-            "Authorization": f"Bearer {self._tts._api_key}",
-            "Content-Type": "application/json",
-        }
-        
-        payload = {
-            "model": self._tts._model,
-            "input": self._input_text,
-            "voice": self._tts._voice,
-            "response_format": "mp3",  # Try MP3 instead of WAV
-        }
 
         try:
-            print(f"[DeepInfraTTS] About to make API request to DeepInfra...")
-            logger.info(f"Requesting TTS from DeepInfra for text: {self._input_text[:50]}...")
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self._tts._api_url,
-                    json=payload,
-                    headers=headers,
-                ) as response:
-                    print(f"[DeepInfraTTS] Got response with status: {response.status}")
-                    if not response.ok:
-                        error_text = await response.text()
-                        print(f"[DeepInfraTTS] ERROR: {response.status} - {error_text}")
-                        logger.error(f"DeepInfra API Error: {response.status} - {error_text}")
-                        response.raise_for_status()
-
-                    print(f"[DeepInfraTTS] Reading response bytes...")
-                    audio_bytes = await response.read()
-                    print(f"[DeepInfraTTS] Received {len(audio_bytes)} bytes of MP3 data from DeepInfra")
-                    logger.info(f"Received {len(audio_bytes)} bytes from DeepInfra")
-
-                    if len(audio_bytes) == 0:
-                        print(f"[DeepInfraTTS] ERROR: No audio data received!")
-                        logger.error("Received empty audio data")
-                        return
-
-                    # Push entire MP3 data - LiveKit will decode it
-                    print(f"[DeepInfraTTS] About to push {len(audio_bytes)} bytes of MP3 data...")
-                    output_emitter.push(audio_bytes)
-                    print(f"[DeepInfraTTS] Successfully pushed {len(audio_bytes)} bytes of MP3 data")
-
-                    # Flush the emitter to signal completion
-                    print(f"[DeepInfraTTS] About to flush emitter...")
+            total = await self._tts._stream_speech(self._input_text, output_emitter, self._conn_options)
+
+            # Flush the emitter to signal completion
+            output_emitter.flush()
+            logger.debug("[DeepInfraTTS] Audio synthesis complete: %d bytes pushed", total)
+
+        except asyncio.CancelledError:
+            metrics.count_tts_abandoned("in_flight")
+            logger.info("[DeepInfraTTS] Interrupted, aborted request: %.50s", self._input_text)
+            raise
+        except CircuitOpenError as e:
+            # one per sentence while the provider is down: no traceback
+            logger.warning("[DeepInfraTTS] %s: %.50s", e, self._input_text)
+            raise
+        except Exception as e:
+            logger.error("[DeepInfraTTS] Synthesis error: %s", e, exc_info=True)
+            raise
+
+
+class _Discard:
+    """Emitter stand-in for prefetch(): the audio only goes to the cache."""
+
+    def push(self, data: bytes) -> None:
+        pass
+
+
+class _SegmentAudio:
+    """Audio of one sentence in the synthesis pipeline, buffered until it is its turn to play."""
+
+    _END = object()
+
+    def __init__(self, text: str, segment: Optional[str] = None):
+        self.text = text
+        # the flushed input segment it belongs to (tokenizer segment id; None for the opening clause)
+        self.segment = segment
+        self.received = 0
+        self.played = 0
+        self.complete = False
+        self._chunks: asyncio.Queue = asyncio.Queue()
+
+    def push(self, data: bytes) -> None:
+        self.received += len(data)
+        self._chunks.put_nowait(data)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        self.complete = True
+        self._chunks.put_nowait(error if error is not None else self._END)
+
+    async def drain(self, output_emitter: tts.AudioEmitter) -> int:
+        """Push the buffered audio, then the rest as it arrives; re-raises a failed request."""
+        total = 0
+        while True:
+            item = await self._chunks.get()
+            if item is self._END:
+                return total
+            if isinstance(item, BaseException):
+                raise item
+            output_emitter.push(item)
+            total += len(item)
+            self.played = total
+
+
+class DeepInfraSynthesizeStream(tts.SynthesizeStream):
+    """
+    Incremental synthesis: LLM text is split into sentences as it streams in,
+    and each sentence is synthesized (and played) while the rest of the answer
+    is still being generated.
+
+    Up to `pipeline_depth` sentences are requested at once. Their audio is
+    buffered and played strictly in order: the sentence at the head of the
+    queue streams straight through, the ones behind it are usually complete
+    by the time their turn comes. The opening clause of the reply ("Sure,")
+    is sent on its own so speech starts before the first sentence is done.
+    """
+
+    def __init__(self, *, tts: DeepInfraTTS, conn_options: APIConnectOptions):
+        super().__init__(tts=tts, conn_options=conn_options)
+        self._tts = tts
+
+    async def _run(self, output_emitter: tts.AudioEmitter):
+        request_id = utils.shortuuid()
+        output_emitter.initialize(
+            request_id=request_id,
+            sample_rate=self._tts.sample_rate,
+            num_channels=self._tts.num_channels,
+            mime_type=self._tts._mime_type,
+            stream=True,
+        )
+
+        sent_stream = self._tts._sentence_tokenizer.stream()
+        texts: utils.aio.Chan[Tuple[Optional[str], str]] = utils.aio.Chan()
+        segments: utils.aio.Chan[_SegmentAudio] = utils.aio.Chan()
+        window = asyncio.Semaphore(self._tts._pipeline_depth)
+        fetches: set = set()
+        # for the interruption report: requested but not fully played, and not yet requested
+        live: List[_SegmentAudio] = []
+        queued = 0
+
+        def _queue(text: str, segment: Optional[str] = None) -> None:
+            nonlocal queued
+            queued += 1
+            texts.send_nowait((segment, text))
+        min_clause = self._tts._first_clause_chars
+
+        async def _input_task():
+            # text of the reply until its first clause is complete; None once sent
+            head: Optional[str] = "" if min_clause > 0 else None
+            async for data in self._input_ch:
+                if isinstance(data, self._FlushSentinel):
+                    if head:
+                        sent_stream.push_text(head)
+                    head = None
+                    sent_stream.flush()
+                    continue
+                if head is not None:
+                    head += data
+                    cut = first_clause_end(head, min_clause)
+                    if cut is not None:
+                        # queued before the rest reaches the tokenizer, so it plays first
+                        _queue(head[:cut])
+                        data = head[cut:]
+                    elif len(head) < _FIRST_CLAUSE_MAX_CHARS:
+                        continue
+                    else:
+                        data = head
+                    head = None
+                sent_stream.push_text(data)
+            if head:
+                sent_stream.push_text(head)
+            sent_stream.end_input()
+
+        async def _sentence_task():
+            async for ev in sent_stream:
+                _queue(ev.token, ev.segment_id)
+            texts.close()
+
+        async def _fetch(seg: _SegmentAudio):
+            try:
+                await self._tts._stream_speech(seg.text, seg, self._conn_options)
+            except Exception as e:
+                seg.end(e)
+            else:
+                seg.end()
+
+        async def _dispatch_task():
+            nonlocal queued
+            async for segment, text in texts:
+                queued -= 1
+                text = text.strip()
+                if not text:
+                    continue
+                # the window bounds both concurrent requests and buffered audio
+                await window.acquire()
+                seg = _SegmentAudio(text, segment)
+                task = asyncio.create_task(_fetch(seg))
+                fetches.add(task)
+                task.add_done_callback(fetches.discard)
+                live.append(seg)
+                segments.send_nowait(seg)
+            segments.close()
+
+        async def _playback_task():
+            # one emitter segment per flushed input segment, as SynthesizeStream
+            # counts them; the opening clause belongs to the first one
+            closed = object()
+            current = closed
+            async for seg in segments:
+                if current is closed:
+                    output_emitter.start_segment(segment_id=utils.shortuuid())
+                    self._mark_started()
+                elif seg.segment is not None and current is not None and seg.segment != current:
+                    output_emitter.end_segment()
+                    output_emitter.start_segment(segment_id=utils.shortuuid())
+                else:
+                    # each sentence is its own MP3/WAV file: restart the decoder
                     output_emitter.flush()
-                    print(f"[DeepInfraTTS] Emitter flushed successfully!")
-                    logger.info(f"Audio synthesis complete: {len(audio_bytes)} bytes pushed")
+                if seg.segment is not None or current is closed:
+                    current = seg.segment
+                try:
+                    total = await seg.drain(output_emitter)
+                finally:
+                    window.release()
+                live.remove(seg)
+                logger.debug("[DeepInfraTTS] Streamed sentence (%d bytes): %.50s", total, seg.text)
+            if current is not closed:
+                output_emitter.end_segment()
 
+        tasks = [
+            asyncio.create_task(_input_task()),
+            asyncio.create_task(_sentence_task()),
+            asyncio.create_task(_dispatch_task()),
+            asyncio.create_task(_playback_task()),
+        ]
+        interrupted = False
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # the agent stops the stream on barge-in: abort the requests still
+            # downloading (closing their connections) and drop every later sentence
+            interrupted = True
+            raise
+        except CircuitOpenError as e:
+            logger.warning("[DeepInfraTTS] %s", e)
+            raise
         except Exception as e:
-            print(f"[DeepInfraTTS] EXCEPTION CAUGHT: {type(e).__name__}: {e}")
-            logger.error(f"DeepInfra TTS Synthesis Error: {e}", exc_info=True)
-            raise
\ No newline at end of file
+            logger.error("[DeepInfraTTS] Streaming error: %s", e, exc_info=True)
+            raise
+        finally:
+            await utils.aio.cancel_and_wait(*tasks, *fetches)
+            await sent_stream.aclose()
+            if interrupted:
+                self._report_abandoned(live, queued)
+
+    def _report_abandoned(self, live: List[_SegmentAudio], queued: int) -> None:
+        in_flight = sum(1 for seg in live if not seg.complete)
+        buffered = len(live) - in_flight
+        unplayed = sum(seg.received - seg.played for seg in live)
+        metrics.count_tts_abandoned("in_flight", in_flight)
+        metrics.count_tts_abandoned("buffered", buffered)
+        metrics.count_tts_abandoned("queued", queued)
+        metrics.count_tts_abandoned_bytes(unplayed)
+        if live or queued:
+            logger.info(
+                "[DeepInfraTTS] Interrupted: aborted %d request(s) in flight, dropped "
+                "%d buffered and %d queued sentence(s), %d bytes unplayed",
+                in_flight, buffered, queued, unplayed,
+            )
@@ -0,0 +1,181 @@
+"""
+Worker load for admission control.
+
+The livekit worker reports `load_fnc()` to the server and stops taking jobs
+while it is above `load_threshold`. The default only looks at CPU; a voice
+session degrades earlier than that (VAD and audio pipelines fall behind, the
+event loop lags), so load here is the worst of:
+
+- cpu:      node CPU utilisation
+- sessions: active sessions / capacity, where capacity is derived from the
+            measured CPU cost of a session (job processes' CPU time per
+            active job, smoothed) unless MAX_SESSIONS pins it
+- lag:      event-loop lag / LOOP_LAG_BUDGET_MS
+
+All three are sampled by a background task in the main process; load_fnc
+only returns the latest value, so it is cheap wherever the worker calls it.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import psutil
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagProbe:
+    """Measures how late a periodic sleep wakes up, i.e. how long callbacks wait for the loop."""
+
+    def __init__(self, interval: float = 0.25, role: str = "job"):
+        self.interval = interval
+        self.role = role
+        self.lag = 0.0  # seconds, max over the last report period
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def take(self) -> float:
+        """Max lag since the previous take()."""
+        lag, self.lag = self.lag, 0.0
+        return lag
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag = max(self.lag, lag)
+            metrics.observe_loop_lag(lag, role=self.role)
+
+
+class LoadMonitor:
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.75,
+        max_sessions: int = 0,
+        session_cpu_cost: float = 0.25,
+        lag_budget_s: float = 0.1,
+        interval: float = 1.0,
+    ):
+        self.threshold = threshold
+        self.max_sessions = max_sessions  # 0 = derive from measured session cost
+        self.session_cpu_cost = session_cpu_cost  # cores per session; initial estimate until measured
+        self.lag_budget_s = lag_budget_s
+        self.interval = interval
+        self.cores = os.cpu_count() or 1
+        self.load = 0.0
+        self.sessions = 0
+        self._worker = None
+        self._lag = LoopLagProbe(role="main")
+        self._task: Optional[asyncio.Task] = None
+        self._proc = psutil.Process()
+        self._child_cpu: Dict[int, float] = {}
+        self._last_sample = 0.0
+        self._last_report = 0.0
+
+    # ---- livekit hooks ----
+    def load_fnc(self, worker=None) -> float:
+        """WorkerOptions.load_fnc: latest sampled load in [0, 1]."""
+        if worker is not None:
+            self._worker = worker
+        return self.load
+
+    def start(self, worker=None) -> None:
+        self._worker = worker or self._worker
+        psutil.cpu_percent(interval=None)  # prime the counter
+        self._lag.start()
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._lag.aclose()
+
+    # ---- sampling ----
+    @property
+    def capacity(self) -> int:
+        """Sessions this node can hold below the threshold."""
+        if self.max_sessions > 0:
+            return self.max_sessions
+        return max(1, int(self.cores * self.threshold / max(self.session_cpu_cost, 0.01)))
+
+    def _active_sessions(self) -> int:
+        if self._worker is None:
+            return 0
+        try:
+            return len(self._worker.active_jobs)
+        except Exception:
+            return 0
+
+    def _children_cpu_delta(self) -> float:
+        """CPU seconds used by job processes since the last sample (processes present in both)."""
+        current: Dict[int, float] = {}
+        for child in self._proc.children(recursive=True):
+            try:
+                times = child.cpu_times()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            current[child.pid] = times.user + times.system
+        delta = sum(cpu - self._child_cpu[pid] for pid, cpu in current.items() if pid in self._child_cpu)
+        self._child_cpu = current
+        return max(0.0, delta)
+
+    def sample(self) -> float:
+        now = time.monotonic()
+        elapsed = now - self._last_sample if self._last_sample else 0.0
+        self._last_sample = now
+
+        cpu = psutil.cpu_percent(interval=None) / 100
+        self.sessions = self._active_sessions()
+        jobs_cpu = self._children_cpu_delta()
+        if elapsed > 0 and self.sessions > 0:
+            # cores per session, smoothed over ~10 samples
+            cost = jobs_cpu / elapsed / self.sessions
+            self.session_cpu_cost += 0.1 * (cost - self.session_cpu_cost)
+
+        lag = self._lag.take()
+        load = max(cpu, self.sessions / self.capacity, lag / self.lag_budget_s)
+        self.load = min(1.0, load)
+        metrics.set_worker_load(
+            load=self.load, sessions=self.sessions, session_cpu=self.session_cpu_cost, capacity=self.capacity
+        )
+
+        if now - self._last_report >= 60 or (self.load >= self.threshold and now - self._last_report >= 10):
+            self._last_report = now
+            logger.info(
+                "[load] load=%.2f (threshold %.2f): cpu=%.0f%%, sessions=%d/%d, lag=%.0fms, "
+                "session cost=%.2f cores",
+                self.load, self.threshold, cpu * 100, self.sessions, self.capacity, lag * 1000,
+                self.session_cpu_cost,
+            )
+        return self.load
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("[load] Sampling failed")
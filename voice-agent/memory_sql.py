@@ -1,28 +1,649 @@
 # /opt/agent/voice-agent/memory_sql.py
+import asyncio
+import json
+import logging
+import os
+import queue
+import re
 import sqlite3
-from typing import List, Dict, Any
+import threading
+import time
+import zlib
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Every client used to join room "default" as "web_client", so that is who the
+# rows written before partitioning belong to.
+LEGACY_ROOM = "default"
+LEGACY_PARTICIPANT = "web_client"
+
+
+def _columns(c: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(c: sqlite3.Connection, table: str, name: str, decl: str):
+    """ALTER TABLE ADD COLUMN that is a no-op when the column already exists."""
+    if name in _columns(c, table):
+        return
+    try:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e):
+            raise
+
+
+def _migrate_v1_partitioning(c: sqlite3.Connection):
+    """Partition messages by room / participant / session, with indexes for per-user loads."""
+    for name in ("room", "participant", "session_id"):
+        _add_column(c, "messages", name, "TEXT")
+    c.execute(
+        "UPDATE messages SET room = ?, participant = ? WHERE participant IS NULL",
+        (LEGACY_ROOM, LEGACY_PARTICIPANT),
+    )
+    # context loads are "last N for this participant (in this room)": both are
+    # index range scans ending at the newest id
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_participant ON messages(participant, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_room_participant ON messages(room, participant, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id)")
+
+
+def _migrate_v2_summaries(c: sqlite3.Connection):
+    """Rolling per-user summaries of turns that no longer fit the prompt budget."""
+    c.execute("""CREATE TABLE IF NOT EXISTS summaries (
+        participant TEXT NOT NULL,
+        room TEXT NOT NULL,
+        upto_id INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        folded_tokens INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (participant, room)
+    )""")
+
+
+def _migrate_v3_fts(c: sqlite3.Connection):
+    """
+    Full-text index over message content (external content: no second copy of
+    the text). Triggers keep it in sync on every insert/delete, so it is
+    always incremental; 'rebuild' indexes the existing rows once.
+    """
+    try:
+        c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content, participant,
+            content='messages', content_rowid='id',
+            tokenize='porter unicode61'
+        )""")
+    except sqlite3.OperationalError as e:
+        logger.warning("[SQLiteMemory] FTS5 unavailable, relevant-memory recall disabled: %s", e)
+        return
+    c.execute("""CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content, participant) VALUES (new.id, new.content, new.participant);
+    END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content, participant)
+        VALUES ('delete', old.id, old.content, old.participant);
+    END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content, participant)
+        VALUES ('delete', old.id, old.content, old.participant);
+        INSERT INTO messages_fts(rowid, content, participant) VALUES (new.id, new.content, new.participant);
+    END""")
+    c.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def _migrate_v4_incremental_vacuum(c: sqlite3.Connection):
+    """
+    Let compaction hand freed pages back to the filesystem a few at a time
+    (PRAGMA incremental_vacuum) instead of the file only ever growing. New
+    files are created that way (_ensure); an existing file needs one full
+    VACUUM, which rewrites the whole database and is too slow for worker
+    startup, so it is left to `python memory_sql.py vacuum <db>`.
+    """
+    if c.execute("PRAGMA auto_vacuum").fetchone()[0] != _AUTO_VACUUM_INCREMENTAL:
+        logger.warning(
+            "[SQLiteMemory] Freed pages are not returned until `python memory_sql.py vacuum` is run once"
+        )
+
+
+_AUTO_VACUUM_INCREMENTAL = 2
+
+# index i migrates the schema to user_version i + 1
+_MIGRATIONS = [
+    _migrate_v1_partitioning,
+    _migrate_v2_summaries,
+    _migrate_v3_fts,
+    _migrate_v4_incremental_vacuum,
+]
+
+_ARCHIVE_SCHEMA = """CREATE TABLE IF NOT EXISTS archive.message_chunks (
+    id INTEGER PRIMARY KEY,
+    participant TEXT,
+    room TEXT,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    first_at TIMESTAMP,
+    last_at TIMESTAMP,
+    n INTEGER NOT NULL,
+    data BLOB NOT NULL  -- zlib(JSON [[id, role, content, created_at, session_id], ...])
+)"""
+
+# words that carry no retrieval signal in conversational English
+_STOPWORDS = frozenset("""
+a about above after again all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from
+further had has have having he her here hers him his how i if in into is it its just
+me more most my no nor not now of off on once only or other our out over own same she
+should so some such than that the their them then there these they this those through
+to too under until up very was we were what when where which while who whom why will
+with would you your yours yeah yes okay ok hi hello hey please thanks thank really well
+like know think want get got going go tell say said let lets dont im ive youre thats
+""".split())
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text: str, max_terms: int = 12) -> str:
+    """Turn an utterance into an OR query of its distinctive words ("" if none)."""
+    terms = []
+    for w in _WORD.findall(text.lower()):
+        if len(w) < 3 or w in _STOPWORDS or w.isdigit() or w in terms:
+            continue
+        terms.append(w)
+        if len(terms) >= max_terms:
+            break
+    return " OR ".join(f'"{t}"' for t in terms)
+
 
 class SQLiteMemory:
-    def __init__(self, db_path="/opt/Livekit/conversations.db"):
+    """
+    Conversation memory backed by SQLite.
+
+    Writes never touch the event loop: add_message() only enqueues, and a
+    background thread owns a single long-lived WAL connection that commits
+    whatever has queued up in one transaction. Reads use per-thread
+    connections; the a*-variants run them in the default executor.
+
+    Compaction (retention_days / hot_max_rows) keeps the hot `messages` table
+    bounded: every `compact_interval_s` the writer thread moves turns older
+    than the horizon, or beyond the row cap, into zlib-compressed per-user
+    chunks in a separate archive file, then returns the freed pages with
+    incremental vacuum. Work is done in small steps queued between regular
+    writes, so inserts never wait behind it. Archived turns leave the FTS
+    index too (delete trigger); read them back with read_archive().
+    """
+
+    def __init__(
+        self,
+        db_path="/opt/Livekit/conversations.db",
+        batch_size: int = 64,
+        *,
+        retention_days: float = 0,
+        hot_max_rows: int = 0,
+        compact_interval_s: float = 0,
+        archive_path: Optional[str] = None,
+        compact_batch: int = 500,
+    ):
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self.hot_max_rows = hot_max_rows
+        self.compact_batch = compact_batch
+        self.archive_path = archive_path or f"{os.path.splitext(db_path)[0]}.archive.db"
+        self._archiving = retention_days > 0 or hot_max_rows > 0
         self._ensure()
+        with sqlite3.connect(self.db_path) as c:
+            self.fts_enabled = c.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+            ).fetchone() is not None
+            self._incremental_vacuum = c.execute("PRAGMA auto_vacuum").fetchone()[0] == _AUTO_VACUUM_INCREMENTAL
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        # every thread's reader connection, so close() can release them
+        self._readers: set = set()
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+        self._stop_compaction = threading.Event()
+        if self._archiving and compact_interval_s > 0:
+            threading.Thread(
+                target=self._compaction_timer, args=(compact_interval_s,), name="sqlite-compaction", daemon=True
+            ).start()
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        c = sqlite3.connect(self.db_path, **kwargs)
+        c.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, fsyncs only at checkpoints
+        c.execute("PRAGMA busy_timeout=5000")
+        return c
 
     def _ensure(self):
-        with sqlite3.connect(self.db_path) as c:
-            c.execute("""CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )""")
-
-    def add_message(self, role: str, content: str):
-        with sqlite3.connect(self.db_path) as c:
-            c.execute("INSERT INTO messages(role, content) VALUES(?, ?)", (role, content))
+        # autocommit: the transaction below is managed explicitly
+        c = sqlite3.connect(self.db_path, isolation_level=None, timeout=60)
+        try:
+            # only takes effect on a new, empty file (see _migrate_v4_incremental_vacuum)
+            c.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL is persistent in the file: readers never block the writer
+            c.execute("PRAGMA journal_mode=WAL")
+            # every worker process opens the file at startup: one migrates while
+            # the others wait here, then find user_version already current
+            c.execute("BEGIN EXCLUSIVE")
+            try:
+                c.execute("""CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )""")
+                version = c.execute("PRAGMA user_version").fetchone()[0]
+                for target, migrate in enumerate(_MIGRATIONS, start=1):
+                    if version < target:
+                        logger.info("[SQLiteMemory] Migrating %s to schema v%d", self.db_path, target)
+                        migrate(c)
+                        c.execute(f"PRAGMA user_version={target}")
+                c.execute("COMMIT")
+            except BaseException:
+                if c.in_transaction:
+                    c.execute("ROLLBACK")
+                raise
+        finally:
+            c.close()
 
-    def get_context_messages(self, limit: int = 50) -> List[Dict[str, Any]]:
-        with sqlite3.connect(self.db_path) as c:
-            rows = c.execute(
-                "SELECT role, content FROM messages ORDER BY id DESC LIMIT ?", (limit,)
+    # ---------------- writes ----------------
+    def add_message(
+        self,
+        role: str,
+        content: str,
+        *,
+        room: Optional[str] = None,
+        participant: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ):
+        """Queue a message for the background writer (never blocks)."""
+        if self._closed:
+            raise RuntimeError("SQLiteMemory is closed")
+        self._queue.put((
+            "INSERT INTO messages(role, content, room, participant, session_id) VALUES(?, ?, ?, ?, ?)",
+            (role, content, room, participant, session_id),
+        ))
+
+    def set_summary(
+        self,
+        content: str,
+        upto_id: int,
+        folded_tokens: int,
+        *,
+        participant: Optional[str] = None,
+        room: Optional[str] = None,
+    ):
+        """Queue an upsert of the rolling summary covering messages with id <= upto_id."""
+        if self._closed:
+            raise RuntimeError("SQLiteMemory is closed")
+        self._queue.put((
+            """INSERT INTO summaries(participant, room, upto_id, content, folded_tokens)
+               VALUES(?, ?, ?, ?, ?)
+               ON CONFLICT(participant, room) DO UPDATE SET
+                   upto_id = excluded.upto_id,
+                   content = excluded.content,
+                   folded_tokens = excluded.folded_tokens,
+                   updated_at = CURRENT_TIMESTAMP""",
+            (participant or "", room or "", upto_id, content, folded_tokens),
+        ))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far is committed. Returns False on timeout."""
+        if not self._writer.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    async def aflush(self, timeout: float = None) -> bool:
+        return await asyncio.to_thread(self.flush, timeout)
+
+    def close(self):
+        """Flush pending writes, stop the writer thread and close the readers' connections."""
+        if not self._closed:
+            self._closed = True
+            self._stop_compaction.set()
+            self._queue.put(_STOP)
+            self._writer.join()
+        with self._readers_lock:
+            readers, self._readers = self._readers, set()
+        for c in readers:
+            c.close()
+
+    async def aclose(self):
+        await asyncio.to_thread(self.close)
+
+    def _write_loop(self):
+        conn = self._connect()
+        if self._archiving:
+            conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+            conn.execute("PRAGMA archive.journal_mode=WAL")
+            conn.execute(_ARCHIVE_SCHEMA)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS archive.idx_chunks_participant "
+                "ON message_chunks(participant, room, first_id)"
+            )
+            conn.commit()
+        try:
+            while True:
+                item = self._queue.get()
+                batch, waiters, stop, job = [], [], False, None
+                # drain whatever else is already queued into the same transaction;
+                # a job (compaction step) runs on its own after the batch
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif callable(item):
+                        job = item
+                    else:
+                        batch.append(item)
+                    if stop or job is not None or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                # any failure is logged and rolled back: the thread must outlive a bad
+                # row or a bug in a step, or writes would queue up with nobody to run them
+                if batch:
+                    try:
+                        with conn:
+                            for sql, params in batch:
+                                conn.execute(sql, params)
+                    except Exception:
+                        logger.exception("[SQLiteMemory] Failed to commit %d queued writes", len(batch))
+                if job is not None and not stop:
+                    try:
+                        job(conn)
+                    except Exception:
+                        if conn.in_transaction:
+                            conn.rollback()
+                        logger.exception("[SQLiteMemory] Compaction step failed")
+                for w in waiters:
+                    w.set()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    # ---------------- compaction ----------------
+    def compact(self) -> None:
+        """Queue a compaction pass (archive + incremental vacuum) on the writer thread."""
+        if self._archiving and not self._closed:
+            self._queue.put(self._archive_step)
+
+    def _compaction_timer(self, interval: float):
+        # several worker processes share the file; they serialise on the write
+        # lock and each pass only moves rows still in the hot table
+        while not self._stop_compaction.wait(interval):
+            self.compact()
+
+    def _requeue(self, step: Callable[[sqlite3.Connection], None]) -> None:
+        # behind whatever writes queued up meanwhile
+        if not self._closed:
+            self._queue.put(step)
+
+    def _archive_step(self, conn: sqlite3.Connection) -> None:
+        """Move up to compact_batch of the oldest turns that are past the horizon or the cap."""
+        conn.execute("BEGIN IMMEDIATE")
+        bounds = conn.execute("SELECT min(id), max(id) FROM messages").fetchone()
+        if bounds[0] is None:
+            conn.rollback()
+            return
+        # ids only ever grow and compaction deletes from the low end, so the
+        # id span is the hot row count without a COUNT(*) scan
+        excess = max(0, (bounds[1] - bounds[0] + 1) - self.hot_max_rows) if self.hot_max_rows > 0 else 0
+        cutoff = None
+        if self.retention_days > 0:
+            cutoff = conn.execute(
+                "SELECT datetime('now', ?)", (f"-{self.retention_days * 86400:.0f} seconds",)
+            ).fetchone()[0]
+
+        rows = conn.execute(
+            "SELECT id, role, content, created_at, session_id, participant, room "
+            "FROM messages ORDER BY id LIMIT ?",
+            (self.compact_batch,),
+        ).fetchall()
+        take = []
+        for row in rows:
+            # created_at grows with id: stop at the first row that is young and within the cap
+            if len(take) < excess or (cutoff is not None and row[3] is not None and row[3] < cutoff):
+                take.append(row)
+            else:
+                break
+        if not take:
+            conn.rollback()
+            self._requeue(self._vacuum_step)
+            return
+
+        chunks: Dict[Tuple[Any, Any], List[tuple]] = {}
+        for row in take:
+            chunks.setdefault((row[5], row[6]), []).append(row)
+        compressed = 0
+        for (participant, room), part in chunks.items():
+            data = zlib.compress(json.dumps([list(r[:5]) for r in part]).encode(), 6)
+            compressed += len(data)
+            conn.execute(
+                "INSERT INTO archive.message_chunks(participant, room, first_id, last_id, first_at, last_at, n, data) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                (participant, room, part[0][0], part[-1][0], part[0][3], part[-1][3], len(part), data),
+            )
+        conn.execute("DELETE FROM messages WHERE id BETWEEN ? AND ?", (take[0][0], take[-1][0]))
+        conn.commit()
+        logger.info(
+            "[SQLiteMemory] Archived %d turns (%d users, %d KB compressed) to %s",
+            len(take), len(chunks), compressed // 1024, self.archive_path,
+        )
+        self._requeue(self._archive_step if len(take) == len(rows) else self._vacuum_step)
+
+    def _vacuum_step(self, conn: sqlite3.Connection, pages: int = 256) -> None:
+        """Return up to `pages` free pages to the filesystem; repeats until the freelist is empty."""
+        if not self._incremental_vacuum:
+            return  # freed pages are reused by later inserts instead
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free == 0:
+            return
+        conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()  # each step frees a page
+        if free > pages:
+            self._requeue(self._vacuum_step)
+        else:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def read_archive(self, *, participant: Optional[str] = None, room: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Archived turns of one user (oldest first), decompressed."""
+        if not os.path.exists(self.archive_path):
+            return []
+        clauses, params = _partition_filter(participant, room)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with sqlite3.connect(self.archive_path) as c:
+            chunks = c.execute(f"SELECT data FROM message_chunks {where} ORDER BY first_id", params).fetchall()
+        out = []
+        for (data,) in chunks:
+            for id_, role, content, created_at, session_id in json.loads(zlib.decompress(data)):
+                out.append({
+                    "id": id_, "role": role, "content": content,
+                    "created_at": created_at, "session_id": session_id,
+                })
+        return out
+
+    # ---------------- reads ----------------
+    def _reader(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None or c not in self._readers:
+            # closed from the closing thread, hence check_same_thread=False
+            c = self._local.conn = self._connect(check_same_thread=False)
+            with self._readers_lock:
+                self._readers.add(c)
+        return c
+
+    def get_context_messages(
+        self,
+        limit: int = 50,
+        *,
+        participant: Optional[str] = None,
+        room: Optional[str] = None,
+        after_id: int = 0,
+        before_id: Optional[int] = None,
+        oldest_first: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Last `limit` messages with id > after_id (and < before_id), oldest
+        first; with oldest_first the first `limit` instead, to page forward
+        from after_id. With `participant` (and optionally `room`) only that
+        user's history is read, via the composite indexes.
+        """
+        clauses, params = _partition_filter(participant, room)
+        clauses.append("id > ?")
+        params = (*params, after_id)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params = (*params, before_id)
+        rows = self._reader().execute(
+            f"SELECT id, role, content FROM messages WHERE {' AND '.join(clauses)} "
+            f"ORDER BY id {'ASC' if oldest_first else 'DESC'} LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        if not oldest_first:
+            rows.reverse()
+        return [{"id": r[0], "role": r[1], "content": r[2]} for r in rows]
+
+    async def aget_context_messages(
+        self,
+        limit: int = 50,
+        *,
+        participant: Optional[str] = None,
+        room: Optional[str] = None,
+        after_id: int = 0,
+        before_id: Optional[int] = None,
+        oldest_first: bool = False,
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self.get_context_messages, limit, participant=participant, room=room,
+            after_id=after_id, before_id=before_id, oldest_first=oldest_first,
+        )
+
+    def get_summary(
+        self,
+        *,
+        participant: Optional[str] = None,
+        room: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        row = self._reader().execute(
+            "SELECT upto_id, content, folded_tokens FROM summaries WHERE participant = ? AND room = ?",
+            (participant or "", room or ""),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"upto_id": row[0], "content": row[1], "folded_tokens": row[2]}
+
+    async def aget_summary(
+        self,
+        *,
+        participant: Optional[str] = None,
+        room: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get_summary, participant=participant, room=room)
+
+    def search_relevant(
+        self,
+        query: str,
+        k: int = 3,
+        *,
+        participant: Optional[str] = None,
+        room: Optional[str] = None,
+        before_id: Optional[int] = None,
+        budget_ms: float = 5.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-k past messages most relevant to `query` (BM25), restricted to one
+        participant/room and to ids below `before_id` (i.e. older than what is
+        already in the prompt). Gives up and returns [] after `budget_ms`.
+        """
+        match = fts_query(query)
+        if not self.fts_enabled or not match or k <= 0:
+            return []
+        if participant is not None:
+            # narrow the match inside the index instead of filtering afterwards
+            match = f'participant : "{participant.replace(chr(34), " ")}" AND content : ({match})'
+
+        clauses, params = _partition_filter(participant, room, column_prefix="m.")
+        if before_id is not None:
+            clauses.append("m.id < ?")
+            params = (*params, before_id)
+        where = "".join(f" AND {c}" for c in clauses)
+
+        conn = self._reader()
+        deadline = time.perf_counter() + budget_ms / 1000
+        conn.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
+        try:
+            rows = conn.execute(
+                f"""SELECT m.id, m.role, m.content
+                    FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                    WHERE messages_fts MATCH ?{where}
+                    ORDER BY bm25(messages_fts) LIMIT ?""",
+                (match, *params, k),
             ).fetchall()
-        return [{"role": r[0], "content": r[1]} for r in reversed(rows)]
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                logger.warning("[SQLiteMemory] Relevant-memory search exceeded %sms budget", budget_ms)
+            else:
+                logger.warning("[SQLiteMemory] Relevant-memory search failed: %s", e)
+            return []
+        finally:
+            conn.set_progress_handler(None, 0)
+        return [{"id": r[0], "role": r[1], "content": r[2]} for r in rows]
+
+    async def asearch_relevant(self, query: str, k: int = 3, **kwargs) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.search_relevant, query, k, **kwargs)
+
+
+def _partition_filter(
+    participant: Optional[str], room: Optional[str], column_prefix: str = ""
+) -> Tuple[List[str], tuple]:
+    clauses, params = [], []
+    if room is not None:
+        clauses.append(f"{column_prefix}room = ?")
+        params.append(room)
+    if participant is not None:
+        clauses.append(f"{column_prefix}participant = ?")
+        params.append(participant)
+    return clauses, tuple(params)
+
+
+def vacuum(db_path: str) -> None:
+    """
+    Rewrite the database once with incremental auto-vacuum, so compaction can
+    return freed pages to the filesystem. Takes an exclusive lock for as long
+    as the rewrite runs: do it in a maintenance window.
+    """
+    c = sqlite3.connect(db_path, isolation_level=None, timeout=60)
+    try:
+        before = os.path.getsize(db_path)
+        c.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        c.execute("VACUUM")
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info("[SQLiteMemory] Vacuumed %s: %d KB -> %d KB", db_path, before // 1024, os.path.getsize(db_path) // 1024)
+    finally:
+        c.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Conversation memory maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("vacuum", help="enable incremental vacuum on an existing database (full rewrite)")
+    cmd.add_argument("db_path", nargs="?", default=os.getenv("MEMORY_DB_PATH", "/opt/Livekit/conversations.db"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    vacuum(args.db_path)
@@ -0,0 +1,277 @@
+"""
+Prometheus metrics for the voice agent.
+
+Worker mode runs every job in its own process, so prometheus_client runs in
+multiprocess mode: each process writes its samples to PROMETHEUS_MULTIPROC_DIR
+and the main process serves the aggregate on METRICS_PORT. The directory must
+be set before prometheus_client is imported, which is why it happens here at
+import time.
+
+Per-turn latency is a timeline measured from the user's end of speech (VAD):
+
+    stt_final -> llm_first_token -> llm_complete -> tts_request -> tts_first_byte -> first_audio
+
+so histogram_quantile() over voice_agent_turn_stage_seconds{stage="first_audio"}
+is the voice-to-voice latency.
+"""
+import glob
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+
+import agent_logging
+
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "voice-agent-metrics")
+)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+MODE = "direct" if os.environ.get("AGENT_MODE", "worker") == "direct" else "worker"
+
+# voice latencies live between ~50ms and a few seconds
+_LATENCY_BUCKETS = (0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+TURN_STAGES = ("stt_final", "llm_first_token", "llm_complete", "tts_request", "tts_first_byte", "first_audio")
+
+TURN_STAGE_SECONDS = Histogram(
+    "voice_agent_turn_stage_seconds",
+    "Seconds from the user's end of speech until each stage of the reply",
+    ["stage", "mode", "model", "voice"],
+    buckets=_LATENCY_BUCKETS,
+)
+TTS_REQUEST_SECONDS = Histogram(
+    "voice_agent_tts_request_seconds",
+    "DeepInfra TTS request latency (ttfb = first audio byte, total = body complete)",
+    ["phase", "mode", "model", "voice"],
+    buckets=_LATENCY_BUCKETS,
+)
+TTS_CACHE_LOOKUPS = Counter(
+    "voice_agent_tts_cache_lookups_total",
+    "TTS audio cache lookups",
+    ["result", "mode"],
+)
+TTS_REQUESTS = Counter(
+    "voice_agent_tts_requests_total",
+    "DeepInfra TTS request outcomes: ok, slow, error, timeout, rejected (circuit open), "
+    "aborted (interrupted), hedged (duplicate sent), hedge_won (duplicate answered first)",
+    ["state", "mode"],
+)
+TTS_CIRCUIT_STATE = Gauge(
+    "voice_agent_tts_circuit_state",
+    "DeepInfra circuit breaker state (0 closed, 1 half open, 2 open); max over processes",
+    ["mode"],
+    multiprocess_mode="livemax",
+)
+TTS_ABANDONED = Counter(
+    "voice_agent_tts_abandoned_segments_total",
+    "Sentences dropped when the user interrupted: in_flight (request aborted), "
+    "buffered (downloaded, never played), queued (never requested)",
+    ["kind", "mode"],
+)
+TTS_ABANDONED_BYTES = Counter(
+    "voice_agent_tts_abandoned_bytes_total",
+    "Audio bytes downloaded but never played because the user interrupted",
+    ["mode"],
+)
+EVENT_LOOP_LAG = Histogram(
+    "voice_agent_event_loop_lag_seconds",
+    "How late a periodic wake-up ran on the event loop (role=main for the worker, job per session)",
+    ["role", "mode"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+WORKER_LOAD = Gauge(
+    "voice_agent_worker_load",
+    "Load reported to LiveKit for admission control (0-1)",
+    multiprocess_mode="liveall",
+)
+ACTIVE_SESSIONS = Gauge(
+    "voice_agent_active_sessions",
+    "Sessions running on this worker",
+    multiprocess_mode="liveall",
+)
+SESSION_CPU_CORES = Gauge(
+    "voice_agent_session_cpu_cores",
+    "Measured CPU cost of one session, in cores (smoothed)",
+    multiprocess_mode="liveall",
+)
+CAPACITY_SESSIONS = Gauge(
+    "voice_agent_capacity_sessions",
+    "Sessions this worker accepts before reaching the load threshold",
+    multiprocess_mode="liveall",
+)
+CLIPS_PLAYED = Counter(
+    "voice_agent_clips_played_total",
+    "Pre-rendered clips played: greeting (session start), ack (start of a turn), filler (late reply)",
+    ["kind", "mode"],
+)
+SPECULATIONS = Counter(
+    "voice_agent_speculation_total",
+    "Speculative replies from interim transcripts: started, then hit (used), miss (final "
+    "transcript differed) or discarded (transcript changed first); none = turn without one",
+    ["outcome", "mode"],
+)
+SPECULATION_SAVED_SECONDS = Histogram(
+    "voice_agent_speculation_saved_seconds",
+    "How much earlier a reply's first LLM token was available thanks to a speculative hit",
+    ["mode"],
+    buckets=_LATENCY_BUCKETS,
+)
+TURNS = Counter(
+    "voice_agent_turns_total",
+    "Conversational turns with a measured end of speech",
+    ["mode"],
+)
+
+
+def reset_multiprocess_dir() -> None:
+    """
+    Drop samples left by previous runs; call once in the main process at startup.
+    This process's own files stay: the gauges without labels above were
+    written to them at import time.
+    """
+    own = f"_{os.getpid()}.db"
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        if path.endswith(own):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def mark_process_dead() -> None:
+    """
+    Drop this process's live gauges (e.g. the circuit state) from the
+    aggregate; call when a job process is done, or its last values are
+    reported until the main process restarts.
+    """
+    multiprocess.mark_process_dead(os.getpid())
+
+
+def start_metrics_server(port: int, addr: str = "127.0.0.1") -> None:
+    """Serve /metrics for this process and all job processes."""
+    reset_multiprocess_dir()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, addr=addr, registry=registry)
+    logger.info("[metrics] Prometheus endpoint on %s:%d/metrics", addr, port)
+
+
+class TurnTracer:
+    """
+    Follows one AgentSession and records, per turn, how long after the user's
+    end of speech each stage happened. Stages are recorded once per turn; a
+    new end of speech starts a new turn.
+    """
+
+    def __init__(self, *, model: str, voice: str, mode: str = MODE):
+        self._labels = {"mode": mode, "model": model, "voice": voice}
+        self._mode = mode
+        self._eos: Optional[float] = None
+        self._seen: Dict[str, float] = {}
+
+    # ---- stage marks (time.time() seconds, like livekit's metric timestamps) ----
+    def end_of_speech(self, t: Optional[float] = None) -> None:
+        self._eos = t if t is not None else time.time()
+        self._seen = {}
+        agent_logging.next_turn()
+        TURNS.labels(mode=self._mode).inc()
+
+    def mark(self, stage: str, t: Optional[float] = None) -> None:
+        if self._eos is None or stage in self._seen:
+            return
+        t = t if t is not None else time.time()
+        if t < self._eos:
+            return  # belongs to the previous turn
+        self._seen[stage] = t
+        TURN_STAGE_SECONDS.labels(stage=stage, **self._labels).observe(t - self._eos)
+        if stage == "first_audio" and logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "[metrics] turn timeline (ms since end of speech): %s",
+                ", ".join(f"{s}={(self._seen[s] - self._eos) * 1000:.0f}" for s in TURN_STAGES if s in self._seen),
+            )
+
+    # ---- wiring ----
+    def attach(self, session) -> None:
+        """Subscribe to the AgentSession events that delimit the stages."""
+        from livekit.agents.metrics import LLMMetrics
+
+        @session.on("user_state_changed")
+        def _on_user_state(ev):
+            if ev.old_state == "speaking" and ev.new_state == "listening":
+                self.end_of_speech()
+
+        @session.on("user_input_transcribed")
+        def _on_transcript(ev):
+            if ev.is_final:
+                self.mark("stt_final")
+
+        @session.on("metrics_collected")
+        def _on_metrics(ev):
+            m = ev.metrics
+            if isinstance(m, LLMMetrics) and m.ttft >= 0:
+                # LLM metrics arrive when generation ends; rebuild the timeline
+                started = m.timestamp - m.duration
+                self.mark("llm_first_token", started + m.ttft)
+                self.mark("llm_complete", m.timestamp)
+
+        @session.on("agent_state_changed")
+        def _on_agent_state(ev):
+            if ev.new_state == "speaking":
+                self.mark("first_audio")
+
+
+def observe_tts_request(phase: str, seconds: float, *, model: str, voice: str) -> None:
+    TTS_REQUEST_SECONDS.labels(phase=phase, mode=MODE, model=model, voice=voice).observe(seconds)
+
+
+def count_cache_lookup(hit: bool) -> None:
+    TTS_CACHE_LOOKUPS.labels(result="hit" if hit else "miss", mode=MODE).inc()
+
+
+def count_tts_request(state: str) -> None:
+    TTS_REQUESTS.labels(state=state, mode=MODE).inc()
+
+
+def count_clip_played(kind: str) -> None:
+    CLIPS_PLAYED.labels(kind=kind, mode=MODE).inc()
+
+
+def count_speculation(outcome: str, *, saved: Optional[float] = None) -> None:
+    SPECULATIONS.labels(outcome=outcome, mode=MODE).inc()
+    if saved is not None:
+        SPECULATION_SAVED_SECONDS.labels(mode=MODE).observe(saved)
+
+
+def count_tts_abandoned(kind: str, n: int = 1) -> None:
+    if n:
+        TTS_ABANDONED.labels(kind=kind, mode=MODE).inc(n)
+
+
+def count_tts_abandoned_bytes(n: int) -> None:
+    if n:
+        TTS_ABANDONED_BYTES.labels(mode=MODE).inc(n)
+
+
+_CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def set_tts_circuit_state(state: str) -> None:
+    TTS_CIRCUIT_STATE.labels(mode=MODE).set(_CIRCUIT_STATES[state])
+
+
+def observe_loop_lag(seconds: float, *, role: str) -> None:
+    EVENT_LOOP_LAG.labels(role=role, mode=MODE).observe(seconds)
+
+
+def set_worker_load(*, load: float, sessions: int, session_cpu: float, capacity: int) -> None:
+    WORKER_LOAD.set(load)
+    ACTIVE_SESSIONS.set(sessions)
+    SESSION_CPU_CORES.set(session_cpu)
+    CAPACITY_SESSIONS.set(capacity)
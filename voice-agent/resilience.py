@@ -0,0 +1,104 @@
+"""
+Tail-latency guards for provider requests.
+
+- LatencyWindow: rolling sample of recent latencies; its p95 is the delay
+  after which a hedged duplicate request is sent.
+- CircuitBreaker: opens after repeated errors or slow responses so requests
+  fail fast (and the session's FallbackAdapter switches provider) instead of
+  leaving the user in silence. After `reset_timeout_s` a single probe request
+  is let through; its outcome closes or re-opens the circuit.
+"""
+import logging
+import time
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples: deque = deque(maxlen=size)
+        self._min_samples = min_samples
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q in (0, 1]; None until there are enough samples to trust."""
+        if len(self._samples) < self._min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        slow_threshold_s: float = 2.0,
+        reset_timeout_s: float = 30.0,
+        on_state_change: Optional[Callable[[str], None]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_threshold_s = slow_threshold_s
+        self.reset_timeout_s = reset_timeout_s
+        self._on_state_change = on_state_change
+        self._state = self.CLOSED
+        self._failures = 0  # consecutive errors / slow responses
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a request may go to the provider now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self, latency_s: Optional[float] = None) -> None:
+        """A completed request; one slower than `slow_threshold_s` counts as a failure."""
+        if latency_s is not None and latency_s > self.slow_threshold_s:
+            self.record_failure()
+            return
+        self._failures = 0
+        self._probe_in_flight = False
+        if self._state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self._failures >= self.failure_threshold
+        ):
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def release_probe(self) -> None:
+        """The probe ended without an outcome (e.g. cancelled); let another one through."""
+        self._probe_in_flight = False
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.warning("[CircuitBreaker] %s: %s -> %s", self.name, self._state, state)
+        self._state = state
+        if self._on_state_change is not None:
+            self._on_state_change(state)
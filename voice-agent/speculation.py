@@ -0,0 +1,237 @@
+"""
+Speculative replies from interim transcripts (SPECULATIVE=1).
+
+Normally the LLM starts only once the user's turn is committed: Deepgram's
+final transcript plus the endpointing delay after VAD end of speech. The
+Speculator starts generating earlier, from what the user has said so far:
+
+- on each final transcript segment (the user may still continue), and
+- on an interim transcript that has not changed for SPECULATIVE_STABLE_MS.
+
+A new transcript that changes the text cancels the running speculation
+("discarded"). When the turn is committed, the agent's llm_node asks take()
+for a speculation on the same text and history: on a "hit" the chunks
+generated so far are replayed and the rest streams on, otherwise ("miss")
+the speculation is cancelled and the LLM is called as usual. Turns without
+any speculation count as "none".
+
+With SPECULATIVE_TTS=1 the opening clause of a speculative reply is also
+synthesized into the TTS cache (DeepInfraTTS.prefetch), so on a hit the
+first segment of the real reply is a cache hit.
+
+Hit rate, outcomes and the latency saved per hit are exported as
+voice_agent_speculation_total{outcome} and voice_agent_speculation_saved_seconds;
+discarded and missed speculations are the extra LLM cost.
+
+Why not AgentSession(preemptive_generation=True)? In livekit-agents 1.2 it
+only starts on a final transcript (or a preflight transcript, which the
+Deepgram nova models used here don't send). It never starts on a stable
+interim, and most of the head start comes from there. It also runs the
+whole reply through TTS for every attempt; here only the opening clause is
+synthesized, into the cache, so a discarded speculation costs LLM tokens and
+at most one short TTS request. The two are not combined: with both on, each
+final transcript would start two generations.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple
+
+import metrics
+from deepinfra_tts import first_clause_end
+
+logger = logging.getLogger(__name__)
+
+# same limit as DeepInfraSynthesizeStream: no opening clause in the first 100 chars, no prefetch
+_CLAUSE_SEARCH_CHARS = 100
+
+_NON_WORD = re.compile(r"[^\w\s']+")
+
+
+def normalize_transcript(text: str) -> str:
+    """Case, punctuation and spacing don't change what the user said."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def _chunk_text(chunk: Any) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    delta = getattr(chunk, "delta", None)
+    return (getattr(delta, "content", None) or "") if delta is not None else ""
+
+
+class _Speculation:
+    def __init__(self, text: str, history: Optional[str]):
+        self.text = text
+        self.key: Tuple[Optional[str], str] = (history, normalize_transcript(text))
+        self.started = time.monotonic()
+        self.first_chunk_at: Optional[float] = None
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.prefetch: Optional[asyncio.Task] = None
+
+    def cancel(self) -> List[asyncio.Task]:
+        """Cancel generation and prefetch; returns the tasks still winding down."""
+        pending = [t for t in (self.task, self.prefetch) if t is not None and not t.done()]
+        for task in pending:
+            task.cancel()
+        return pending
+
+    def saved(self, now: float) -> float:
+        """How much earlier the reply's first chunk is available than if the LLM started now."""
+        head_start = now - self.started
+        if self.first_chunk_at is None:
+            return head_start
+        return min(head_start, self.first_chunk_at - self.started)
+
+
+class Speculator:
+    def __init__(
+        self,
+        generate: Callable[[str], AsyncIterator[Any]],
+        *,
+        stable_s: float = 0.3,
+        prefetch: Optional[Callable[[str], Awaitable[bool]]] = None,
+        first_clause_chars: int = 8,
+    ):
+        # generate(user_text) -> the LLM stream the agent would produce for that turn
+        self._generate = generate
+        self.stable_s = stable_s
+        self._prefetch = prefetch if first_clause_chars > 0 else None
+        self._first_clause_chars = first_clause_chars
+        self._finals: List[str] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._current: Optional[_Speculation] = None
+        # cancelled speculations and hit prefetches still winding down
+        self._background: Set[asyncio.Task] = set()
+
+    # ---- transcripts ----
+    def on_transcript(self, transcript: str, *, is_final: bool, history: Optional[str]) -> None:
+        """
+        Feed every user_input_transcribed event. `history` identifies the chat
+        the reply would continue (the last message before this turn).
+        """
+        text = " ".join([*self._finals, transcript.strip()]).strip()
+        if is_final and transcript.strip():
+            self._finals.append(transcript.strip())
+        key = (history, normalize_transcript(text))
+        if not key[1]:
+            return
+        self._cancel_timer()
+        if self._current is not None:
+            if self._current.key == key:
+                return
+            self._drop("discarded")
+        if is_final:
+            self._start(text, history)
+        else:
+            self._timer = asyncio.get_running_loop().call_later(self.stable_s, self._start, text, history)
+
+    def take(self, text: str, history: Optional[str]) -> Optional[AsyncIterator[Any]]:
+        """
+        The committed turn is `text`: the speculative LLM stream for it, or
+        None (any other speculation is cancelled). Resets for the next turn.
+        """
+        self._cancel_timer()
+        self._finals = []
+        spec, self._current = self._current, None
+        if spec is None:
+            metrics.count_speculation("none")
+            return None
+        if spec.key != (history, normalize_transcript(text)) or spec.error is not None:
+            self._current = spec
+            self._drop("miss")
+            return None
+        saved = spec.saved(time.monotonic())
+        metrics.count_speculation("hit", saved=saved)
+        logger.debug("[speculation] Hit, %.0fms saved: %.60s", saved * 1000, text)
+        if spec.prefetch is not None and not spec.prefetch.done():
+            self._keep(spec.prefetch)
+        return self._replay(spec)
+
+    async def aclose(self) -> None:
+        self._cancel_timer()
+        if self._current is not None:
+            for task in self._current.cancel():
+                self._keep(task)
+            self._current = None
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+    # ---- internals ----
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _keep(self, task: asyncio.Task) -> None:
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _drop(self, outcome: str) -> None:
+        spec, self._current = self._current, None
+        metrics.count_speculation(outcome)
+        logger.debug("[speculation] %s after %.0fms: %.60s", outcome, (time.monotonic() - spec.started) * 1000, spec.text)
+        for task in spec.cancel():
+            self._keep(task)
+
+    def _start(self, text: str, history: Optional[str]) -> None:
+        self._timer = None
+        spec = _Speculation(text, history)
+        spec.task = asyncio.create_task(self._run(spec), name="speculative-reply")
+        self._current = spec
+        metrics.count_speculation("started")
+
+    async def _run(self, spec: _Speculation) -> None:
+        head: Optional[str] = "" if self._prefetch is not None else None
+        try:
+            async for chunk in self._generate(spec.text):
+                if spec.first_chunk_at is None:
+                    spec.first_chunk_at = time.monotonic()
+                spec.chunks.append(chunk)
+                spec.changed.set()
+                if head is None:
+                    continue
+                head += _chunk_text(chunk)
+                cut = first_clause_end(head, self._first_clause_chars)
+                if cut is not None:
+                    spec.prefetch = asyncio.create_task(self._prefetch_clause(head[:cut]))
+                    head = None
+                elif len(head) >= _CLAUSE_SEARCH_CHARS:
+                    head = None
+        except Exception as e:
+            spec.error = e
+            logger.debug("[speculation] Generation failed: %r", e)
+        finally:
+            spec.done = True
+            spec.changed.set()
+
+    async def _prefetch_clause(self, clause: str) -> None:
+        try:
+            await self._prefetch(clause)
+        except Exception as e:
+            # the real reply just synthesizes the clause itself
+            logger.debug("[speculation] Prefetch failed: %r", e)
+
+    async def _replay(self, spec: _Speculation) -> AsyncIterator[Any]:
+        """What was generated so far, then the rest as it arrives; cancels the generation if abandoned."""
+        i = 0
+        try:
+            while True:
+                while i < len(spec.chunks):
+                    yield spec.chunks[i]
+                    i += 1
+                if spec.done:
+                    if spec.error is not None:
+                        raise spec.error
+                    return
+                spec.changed.clear()
+                await spec.changed.wait()
+        finally:
+            if spec.task is not None and not spec.task.done():
+                spec.task.cancel()
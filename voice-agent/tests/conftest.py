@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(HERE)
+
+# the agent's modules are flat files next to app.py; the bench fakes live in bench/
+sys.path[:0] = [AGENT_DIR, os.path.join(AGENT_DIR, "bench")]
+
+# metrics.py reads this at import time; keep test samples out of the shared directory
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="voice-agent-test-metrics-"))
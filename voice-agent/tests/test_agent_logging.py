@@ -0,0 +1,27 @@
+import atexit
+import dataclasses
+import logging
+
+import agent_logging
+from config import AgentConfig
+
+
+def test_log_level_gates_third_party_loggers(monkeypatch):
+    root = logging.getLogger()
+    handlers, level, factory = list(root.handlers), root.level, logging.getLogRecordFactory()
+    monkeypatch.setattr(agent_logging, "_configured", False)
+    cfg = dataclasses.replace(AgentConfig.from_env(), log_level="WARNING")
+    try:
+        agent_logging.setup_logging(cfg, install_handler=True)
+        assert root.level == logging.WARNING
+        assert not logging.getLogger("httpx").isEnabledFor(logging.INFO)
+        assert not logging.getLogger("aiohttp.access").isEnabledFor(logging.INFO)
+        assert logging.getLogger("httpx").isEnabledFor(logging.WARNING)
+    finally:
+        atexit.unregister(agent_logging._listener.stop)
+        agent_logging._listener.stop()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+        logging.setLogRecordFactory(factory)
+        for name in agent_logging.AGENT_LOGGERS:
+            logging.getLogger(name).setLevel(logging.NOTSET)
@@ -0,0 +1,35 @@
+import asyncio
+
+from context_builder import ContextBuilder
+from memory_sql import SQLiteMemory
+
+
+def test_refresh_summary_folds_a_backlog_longer_than_max_rows(tmp_path):
+    folded = []
+
+    async def summarizer(previous, rows):
+        folded.extend(r["id"] for r in rows)
+        return f"{len(folded)} turns"
+
+    async def run():
+        db = SQLiteMemory(str(tmp_path / "conversations.db"))
+        try:
+            for i in range(250):
+                db.add_message("user", f"turn number {i} " + "word " * 20, room="r", participant="p")
+            await db.aflush(5)
+            builder = ContextBuilder(db, token_budget=400, summary_tokens=100, max_rows=40, summarizer=summarizer)
+            assert await builder.refresh_summary(participant="p", room="r")
+            await db.aflush(5)
+            built = await builder.build(participant="p", room="r")
+            # a second refresh has nothing left to fold
+            assert not await builder.refresh_summary(participant="p", room="r")
+            return built, [m["id"] for m in db.get_context_messages(1000, participant="p")]
+        finally:
+            await db.aclose()
+
+    built, ids = asyncio.run(run())
+    recent = [m["id"] for m in built.messages]
+    # every turn is either folded into the summary (once, in order) or still in the prompt
+    assert folded == ids[: len(folded)]
+    assert folded + recent == ids
+    assert built.summary == f"{len(folded)} turns"
@@ -0,0 +1,124 @@
+"""Multi-sentence streaming synthesis through livekit's AudioEmitter, against the fake TTS."""
+import asyncio
+import io
+import logging
+
+import pytest
+from livekit.agents import APIConnectionError, APIConnectOptions
+
+from deepinfra_tts import DeepInfraTTS, close_shared_http_session
+from fakes import SAMPLE_RATE, FakeConfig, FakeProviders
+from tts_cache import TTSCache
+
+REPLY = "Sure, here is the first sentence. Here is the second one. And a third one to finish."
+
+
+def _mp3_sample() -> bytes:
+    av = pytest.importorskip("av")
+    np = pytest.importorskip("numpy")
+    buf = io.BytesIO()
+    container = av.open(buf, "w", format="mp3")
+    stream = container.add_stream("mp3", rate=SAMPLE_RATE)
+    stream.layout = "mono"
+    pcm = (np.sin(np.arange(SAMPLE_RATE // 2) * 2 * np.pi * 440 / SAMPLE_RATE) * 8000).astype("int16")
+    frame = av.AudioFrame.from_ndarray(pcm.reshape(1, -1), format="s16", layout="mono")
+    frame.sample_rate = SAMPLE_RATE
+    for packet in [*stream.encode(frame), *stream.encode(None)]:
+        container.mux(packet)
+    container.close()
+    return buf.getvalue()
+
+
+async def _stream_reply(config: FakeConfig, response_format: str):
+    async with FakeProviders(config) as fakes:
+        tts = DeepInfraTTS(
+            api_key="test", base_url=fakes.tts_base_url, response_format=response_format, hedge_percentile=0
+        )
+        try:
+            stream = tts.stream()
+            errors = []
+            tts.on("error", errors.append)
+            for word in REPLY.split(" "):
+                stream.push_text(word + " ")
+            stream.end_input()
+            events = [ev async for ev in stream]
+            await stream.aclose()
+        finally:
+            await tts.aclose()
+            await close_shared_http_session()
+        return events, errors, fakes.stats
+
+
+@pytest.mark.parametrize("response_format", ["wav", "mp3"])
+def test_multi_sentence_stream_is_one_segment(response_format):
+    config = FakeConfig(tts_ttfb_ms=10, tts_chunk_interval_ms=0)
+    if response_format == "mp3":
+        config.tts_mp3_sample = _mp3_sample()
+    events, errors, stats = asyncio.run(_stream_reply(config, response_format))
+
+    assert not errors
+    # the reply is split into several sentences, each its own request
+    assert stats.tts_requests >= 3
+    assert len({ev.segment_id for ev in events}) == 1
+    assert events[-1].is_final
+    # every sentence's file was decoded and played, not just the first
+    played_s = sum(ev.frame.duration for ev in events)
+    if response_format == "mp3":
+        served_s = stats.tts_requests * 0.5
+    else:
+        served_s = (stats.tts_bytes - 44 * stats.tts_requests) / 2 / SAMPLE_RATE
+    assert played_s == pytest.approx(served_s, rel=0.1)
+
+
+def test_prefetch_fills_the_cache_without_marking_the_turn():
+    class Tracer:
+        def __init__(self):
+            self.marks = []
+
+        def mark(self, stage, t=None):
+            self.marks.append(stage)
+
+    async def run():
+        tracer = Tracer()
+        cache = TTSCache(directory=None)
+        async with FakeProviders(FakeConfig(tts_ttfb_ms=10, tts_chunk_interval_ms=0)) as fakes:
+            tts = DeepInfraTTS(
+                api_key="test", base_url=fakes.tts_base_url, response_format="wav", cache=cache, tracer=tracer
+            )
+            try:
+                assert await tts.prefetch("Sure,")
+            finally:
+                await tts.aclose()
+                await close_shared_http_session()
+        key = TTSCache.key(tts._model, tts._voice, tts._speed, tts._response_format, "Sure,")
+        return tracer.marks, await cache.get(key)
+
+    marks, hit = asyncio.run(run())
+    assert marks == []
+    assert hit is not None
+
+
+def test_open_circuit_is_a_warning_without_traceback(caplog):
+    async def run():
+        async with FakeProviders(FakeConfig(tts_ttfb_ms=0)) as fakes:
+            tts = DeepInfraTTS(api_key="test", base_url=fakes.tts_base_url, response_format="wav", breaker_failures=1)
+            tts._guard.breaker.record_failure()
+            try:
+                for _ in range(2):
+                    with pytest.raises(APIConnectionError):
+                        # no retries: livekit's own retry warnings are not what is tested here
+                        async with tts.synthesize("Hello there.", conn_options=APIConnectOptions(max_retry=0)) as stream:
+                            async for _ in stream:
+                                pass
+            finally:
+                await tts.aclose()
+                await close_shared_http_session()
+            return fakes.stats
+
+    with caplog.at_level(logging.WARNING, logger="deepinfra_tts"):
+        stats = asyncio.run(run())
+
+    ours = [r for r in caplog.records if r.name == "deepinfra_tts"]
+    assert stats.tts_requests == 0
+    assert [r.levelno for r in ours] == [logging.WARNING, logging.WARNING]
+    assert all(r.exc_info is None and "circuit open" in r.getMessage() for r in ours)
@@ -0,0 +1,73 @@
+"""Worker entrypoint against a stub JobContext that registers callbacks like livekit's."""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("TTS_CACHE_DIR", "")
+
+import app  # noqa: E402
+from config import AgentConfig  # noqa: E402
+from fakes import FakeConfig, FakeProviders  # noqa: E402
+from livekit.agents import JobContext  # noqa: E402
+from memory_sql import SQLiteMemory  # noqa: E402
+
+
+class _SessionStarted(Exception):
+    pass
+
+
+class StubJobContext:
+    # the real implementation: it reads callback.__code__, which a functools.partial lacks
+    add_shutdown_callback = JobContext.add_shutdown_callback
+
+    def __init__(self, userdata: dict):
+        self._shutdown_callbacks = []
+        self.proc = SimpleNamespace(userdata=userdata)
+        self.job = SimpleNamespace(id="job-test")
+        self.room = SimpleNamespace(name="room-test")
+        self.connected = False
+
+    async def connect(self, **_):
+        self.connected = True
+
+    async def wait_for_participant(self, **_):
+        return SimpleNamespace(identity="caller")
+
+
+async def _run_entrypoint(tmp_path, monkeypatch):
+    async with FakeProviders(FakeConfig(tts_ttfb_ms=0)) as fakes:
+        monkeypatch.setenv("TTS_BASE_URL", fakes.tts_base_url)
+        monkeypatch.setenv("DEEPGRAM_API_KEY", "test")
+        monkeypatch.setenv("GROQ_API_KEY", "test")
+        cfg = AgentConfig.from_env()
+        db = SQLiteMemory(db_path=str(tmp_path / "conversations.db"))
+        ctx = StubJobContext({"config": cfg, "db": db, "vad": None, "clips": None})
+
+        async def start(self, **_):
+            raise _SessionStarted()
+
+        # everything up to session.start runs for real; the session needs a room
+        monkeypatch.setattr(app.AgentSession, "start", start)
+        # the real one would drop this test process's live gauges for the other tests
+        dead = []
+        monkeypatch.setattr(app.metrics, "mark_process_dead", lambda: dead.append(os.getpid()))
+        try:
+            with pytest.raises(_SessionStarted):
+                await app.entrypoint(ctx)
+            # shut down like livekit's job runner: every callback with the reason
+            await asyncio.gather(*(cb("test") for cb in ctx._shutdown_callbacks))
+        finally:
+            await app.close_shared_http_session()
+            await db.aclose()
+        return ctx, dead
+
+
+def test_entrypoint_registers_shutdown_callbacks(tmp_path, monkeypatch):
+    ctx, dead = asyncio.run(_run_entrypoint(tmp_path, monkeypatch))
+
+    assert ctx.connected
+    # lag probe, metrics, TTS cache report, memory
+    assert len(ctx._shutdown_callbacks) == 4
+    assert dead == [os.getpid()]
@@ -0,0 +1,16 @@
+import os
+
+import metrics
+
+
+def test_reset_keeps_this_process_samples():
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    stale = os.path.join(directory, "gauge_liveall_999999999.db")
+    open(stale, "wb").close()
+    metrics.set_worker_load(load=0.5, sessions=3, session_cpu=0.2, capacity=10)
+
+    metrics.reset_multiprocess_dir()
+
+    remaining = os.listdir(directory)
+    assert os.path.basename(stale) not in remaining
+    assert f"gauge_liveall_{os.getpid()}.db" in remaining
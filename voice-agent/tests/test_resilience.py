@@ -0,0 +1,76 @@
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, LatencyWindow
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    states = []
+    breaker = CircuitBreaker("test", failure_threshold=3, on_state_change=states.append)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert states == ["open"]
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_responses_count_as_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, slow_threshold_s=1.0)
+    breaker.record_success(1.5)
+    breaker.record_success(2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_s=30)
+    breaker.record_failure()
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def test_probe_outcome_closes_or_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record_success(0.2)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_latency_window_percentile():
+    window = LatencyWindow(size=100, min_samples=10)
+    for i in range(9):
+        window.add(i / 10)
+    assert window.percentile(0.95) is None
+    for i in range(9, 100):
+        window.add(i / 10)
+    assert window.percentile(0.95) == pytest.approx(9.5)
+    assert window.percentile(1.0) == pytest.approx(9.9)
@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+from tts_cache import TTSCache, normalize_text
+
+
+def _key(cache: TTSCache, text: str) -> str:
+    return cache.key("kokoro", "af_heart", 1.0, "wav", text)
+
+
+def test_key_ignores_spacing_but_not_voice():
+    cache = TTSCache(directory=None)
+    assert normalize_text("  Hello \n world ") == "Hello world"
+    assert _key(cache, "Hello  world") == _key(cache, "Hello world")
+    assert cache.key("kokoro", "af_bella", 1.0, "wav", "Hello") != _key(cache, "Hello")
+
+
+def test_memory_lru_evicts_least_recently_used():
+    async def run():
+        cache = TTSCache(directory=None, memory_bytes=300)
+        for name in ("a", "b", "c"):
+            cache.put(name, "audio/wav", b"x" * 100)
+        await cache.get("a")  # refresh a: b is now the oldest
+        cache.put("d", "audio/wav", b"x" * 100)
+        return cache, [await cache.get(k) is not None for k in "abcd"]
+
+    cache, present = asyncio.run(run())
+    assert present == [True, False, True, True]
+    assert cache.stats.memory_hits == 4 and cache.stats.misses == 1
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    async def run():
+        writer = TTSCache(directory=str(tmp_path))
+        writer.put(_key(writer, "Hello."), "audio/wav", b"RIFF....")
+        await writer.aclose()
+        reader = TTSCache(directory=str(tmp_path))
+        return await reader.get(_key(reader, "Hello."))
+
+    assert asyncio.run(run()) == ("audio/wav", b"RIFF....")
+
+
+def test_disk_cap_holds_across_processes(tmp_path):
+    # separate instances stand in for worker processes: none of them sees the others' writes
+    async def run():
+        caches = [TTSCache(directory=str(tmp_path), disk_bytes=160_000) for _ in range(4)]
+        for i in range(100):
+            cache = caches[i % 4]
+            cache.put(_key(cache, f"phrase {i}"), "audio/wav", os.urandom(4000))
+            await cache.aclose()
+        return caches
+
+    caches = asyncio.run(run())
+    _, total = caches[0]._scan_disk()
+    assert total <= 160_000
+    assert sum(c.stats.evictions for c in caches) > 0
+
+
+def test_eviction_keeps_recently_read_entries(tmp_path):
+    async def run():
+        cache = TTSCache(directory=str(tmp_path), memory_bytes=0, disk_bytes=50_000)
+        keys = [_key(cache, f"phrase {i}") for i in range(10)]
+        for i, key in enumerate(keys):
+            cache.put(key, "audio/wav", b"x" * 4000)
+            await cache.aclose()
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+        await cache.get(keys[0])  # a disk hit refreshes its mtime
+        for i in range(10, 14):
+            cache.put(_key(cache, f"phrase {i}"), "audio/wav", b"x" * 4000)
+            await cache.aclose()
+        return cache, keys
+
+    cache, keys = asyncio.run(run())
+    assert os.path.exists(cache._path(keys[0]))
+    assert not os.path.exists(cache._path(keys[1]))
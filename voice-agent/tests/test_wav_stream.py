@@ -0,0 +1,78 @@
+import struct
+
+import pytest
+
+from wav_stream import WavFormatError, WavStreamParser
+
+
+def _chunk(chunk_id: bytes, payload: bytes) -> bytes:
+    return chunk_id + struct.pack("<I", len(payload)) + payload + (b"\0" if len(payload) & 1 else b"")
+
+
+def _fmt(sample_rate=24000, channels=1, bits=16) -> bytes:
+    block_align = channels * bits // 8
+    return _chunk(b"fmt ", struct.pack("<HHIIHH", 1, channels, sample_rate, sample_rate * block_align, block_align, bits))
+
+
+def _wav(pcm: bytes, *, extra: bytes = b"", data_size=None) -> bytes:
+    data = b"data" + struct.pack("<I", len(pcm) if data_size is None else data_size) + pcm
+    body = b"WAVE" + _fmt() + extra + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _feed_all(parser: WavStreamParser, body: bytes, step: int) -> bytes:
+    out = []
+    for i in range(0, len(body), step):
+        out.extend(parser.feed(body[i:i + step]))
+    return b"".join(out)
+
+
+def test_canonical_header():
+    pcm = bytes(range(200))
+    parser = WavStreamParser()
+    assert b"".join(parser.feed(_wav(pcm))) == pcm
+    assert parser.header_parsed
+    assert parser.header_size == 44
+    assert parser.format.sample_rate == 24000
+    assert parser.format.bytes_per_second == 48000
+
+
+@pytest.mark.parametrize("step", [1, 3, 7, 45, 1000])
+def test_header_split_across_chunks(step):
+    pcm = bytes(range(256)) * 4
+    # an odd-sized LIST chunk before data, as some encoders write
+    body = _wav(pcm, extra=_chunk(b"LIST", b"INFOabc"))
+    parser = WavStreamParser()
+    assert _feed_all(parser, body, step) == pcm
+    assert parser.header_size == len(body) - len(pcm)
+
+
+def test_unknown_data_size_streams_until_end():
+    pcm = b"\x01\x02" * 500
+    parser = WavStreamParser()
+    assert _feed_all(parser, _wav(pcm, data_size=0xFFFFFFFF), 100) == pcm
+
+
+def test_trailing_chunks_after_data_are_dropped():
+    pcm = b"\x01\x02" * 50
+    parser = WavStreamParser()
+    body = _wav(pcm) + _chunk(b"LIST", b"INFO")
+    assert _feed_all(parser, body, 16) == pcm
+
+
+def test_pcm_chunks_pass_through_without_copy():
+    parser = WavStreamParser()
+    parser.feed(_wav(b""))
+    chunk = b"\x00\x01" * 100
+    assert parser.feed(chunk)[0] is chunk
+
+
+def test_rejects_non_wav():
+    with pytest.raises(WavFormatError):
+        WavStreamParser().feed(b"ID3\x04" + b"\0" * 20)
+
+
+def test_rejects_data_before_fmt():
+    body = b"WAVE" + _chunk(b"data", b"\0\0")
+    with pytest.raises(WavFormatError):
+        WavStreamParser().feed(b"RIFF" + struct.pack("<I", len(body)) + body)
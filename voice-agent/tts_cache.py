@@ -0,0 +1,252 @@
+"""
+Content-addressed cache for synthesized TTS audio.
+
+Two tiers:
+- a bounded in-memory LRU (per process)
+- a size-capped directory of files, shared by every worker process
+
+Disk entries are written to a temp file and renamed into place, so readers in
+other processes only ever see complete files. Eviction runs under an flock'd
+lock file and removes the least recently used entries (by mtime, which hits
+refresh). Other processes' writes are invisible to this one's running size
+estimate, so the decision to evict is always made from a fresh scan of the
+directory taken under that lock, and each process rescans at least every
+1/16 of the cap it has written itself: N processes overshoot the cap by at
+most N/16 of it between checks.
+"""
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of an utterance for cache keys: NFC, single spaces, trimmed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TTSCache:
+    def __init__(
+        self,
+        directory: Optional[str] = "/persist/tts_cache",
+        memory_bytes: int = 32 * 1024 * 1024,
+        disk_bytes: int = 512 * 1024 * 1024,
+        max_text_chars: int = 200,
+    ):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        # only short utterances repeat often enough to be worth caching
+        self.max_text_chars = max_text_chars
+        self.stats = CacheStats()
+
+        self._lru: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lru_size = 0
+        self._disk_estimate = 0
+        # bytes this process wrote since its last scan of the directory
+        self._disk_unscanned = 0
+        self._pending: Set[asyncio.Task] = set()
+
+        self.directory = None
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self.directory = directory
+                self._disk_estimate = self._scan_disk()[1]
+            except OSError as e:
+                logger.warning("[TTSCache] Disk tier disabled (%s): %s", directory, e)
+
+    @classmethod
+    def from_env(cls) -> "TTSCache":
+        return cls(
+            directory=os.getenv("TTS_CACHE_DIR", "/persist/tts_cache") or None,
+            memory_bytes=int(float(os.getenv("TTS_CACHE_MEMORY_MB", "32")) * 1024 * 1024),
+            disk_bytes=int(float(os.getenv("TTS_CACHE_DISK_MB", "512")) * 1024 * 1024),
+            max_text_chars=int(os.getenv("TTS_CACHE_MAX_CHARS", "200")),
+        )
+
+    @staticmethod
+    def key(model: str, voice: str, speed: float, response_format: str, text: str) -> str:
+        raw = "\x1f".join([model, voice, f"{speed:g}", response_format, normalize_text(text)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def cacheable(self, text: str) -> bool:
+        return 0 < len(text) <= self.max_text_chars
+
+    # ---------------- lookups ----------------
+    async def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """Return (mime_type, audio) or None. Memory hits never leave the loop thread."""
+        entry = self._lru.get(key)
+        if entry is not None:
+            self._lru.move_to_end(key)
+            self.stats.memory_hits += 1
+            return entry
+
+        if self.directory:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self.stats.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: str, mime_type: str, audio: bytes) -> None:
+        """Store in memory now; the disk write happens in the background."""
+        if not audio:
+            return
+        self._remember(key, (mime_type, audio))
+        self.stats.stores += 1
+        if self.directory:
+            task = asyncio.create_task(self._persist(key, mime_type, audio))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _persist(self, key: str, mime_type: str, audio: bytes) -> None:
+        await asyncio.to_thread(self._write_disk, key, mime_type, audio)
+        self._disk_estimate += len(audio)
+        self._disk_unscanned += len(audio)
+        if self._disk_estimate > self.disk_bytes or self._disk_unscanned >= self.disk_bytes // 16:
+            await asyncio.to_thread(self._evict_disk)
+
+    async def aclose(self) -> None:
+        """Wait for pending disk writes."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def describe(self) -> Dict[str, float]:
+        s = self.stats
+        return {
+            "memory_hits": s.memory_hits,
+            "disk_hits": s.disk_hits,
+            "misses": s.misses,
+            "stores": s.stores,
+            "evictions": s.evictions,
+            "hit_rate": round(s.hit_rate, 3),
+            "memory_entries": len(self._lru),
+            "memory_bytes": self._lru_size,
+        }
+
+    # ---------------- memory tier ----------------
+    def _remember(self, key: str, entry: Tuple[str, bytes]) -> None:
+        size = len(entry[1])
+        if size > self.memory_bytes:
+            return
+        old = self._lru.pop(key, None)
+        if old is not None:
+            self._lru_size -= len(old[1])
+        self._lru[key] = entry
+        self._lru_size += size
+        while self._lru_size > self.memory_bytes:
+            _, (_, evicted) = self._lru.popitem(last=False)
+            self._lru_size -= len(evicted)
+
+    # ---------------- disk tier (runs in worker threads) ----------------
+    def _path(self, key: str) -> str:
+        # two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, bytes]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # refresh recency for LRU eviction
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("[TTSCache] Read failed for %.12s: %s", key, e)
+            return None
+        mime_type, sep, audio = data.partition(b"\n")
+        if not sep or not audio:
+            return None
+        return mime_type.decode("ascii"), audio
+
+    def _write_disk(self, key: str, mime_type: str, audio: bytes) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(mime_type.encode("ascii") + b"\n")
+                    f.write(audio)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logger.warning("[TTSCache] Write failed for %.12s: %s", key, e)
+
+    def _scan_disk(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return entries, total
+
+    def _evict_disk(self) -> None:
+        """Re-measure the directory under the lock and trim it if it is over the cap."""
+        lock_path = os.path.join(self.directory, ".lock")
+        with open(lock_path, "a") as lock:
+            # one process evicts at a time; others skip instead of waiting
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                entries, total = self._scan_disk()
+                self._disk_unscanned = 0
+                if total <= self.disk_bytes:
+                    self._disk_estimate = total
+                    return
+                # trim to 90% so we don't evict again on the very next store
+                target = int(self.disk_bytes * 0.9)
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        continue
+                    total -= size
+                    self.stats.evictions += 1
+                self._disk_estimate = total
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
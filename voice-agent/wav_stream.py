@@ -0,0 +1,111 @@
+"""
+Incremental WAV parser for streamed TTS responses.
+
+DeepInfra's WAV header is not always the canonical 44 bytes (see
+test_deepinfra_wav.py), and on a streamed body it can be split across network
+chunks. WavStreamParser buffers only until the `data` chunk starts; after that
+every network chunk is passed through untouched (no copy), so the emitter can
+slice raw PCM into frames without any decoding.
+"""
+import struct
+from dataclasses import dataclass
+from typing import List, Optional
+
+# streaming encoders write 0 or 0xFFFFFFFF when the length is not known up front
+_UNKNOWN_SIZES = (0, 0xFFFFFFFF)
+
+
+class WavFormatError(ValueError):
+    pass
+
+
+@dataclass
+class WavFormat:
+    audio_format: int
+    num_channels: int
+    sample_rate: int
+    bits_per_sample: int
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.sample_rate * self.num_channels * self.bits_per_sample // 8
+
+
+class WavStreamParser:
+    def __init__(self):
+        self.format: Optional[WavFormat] = None
+        self.header_size = 0
+        self._buf = bytearray()
+        self._in_data = False
+        self._data_remaining: Optional[int] = None  # None = until end of stream
+        self._skip = 0  # bytes of a non-audio chunk still to drop
+
+    @property
+    def header_parsed(self) -> bool:
+        return self._in_data
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Feed the next network chunk; returns the PCM payload contained in it
+        (possibly empty while the header is still incomplete). Chunks that are
+        entirely PCM are returned as the same object, without copying.
+        """
+        if self._in_data:
+            return self._payload(chunk)
+
+        self._buf += chunk
+        return self._parse_header()
+
+    def _payload(self, data: bytes) -> List[bytes]:
+        if self._data_remaining is None:
+            return [data] if data else []
+        if self._data_remaining <= 0:
+            return []  # trailing chunks after the samples (e.g. LIST) are ignored
+        if len(data) > self._data_remaining:
+            data = data[: self._data_remaining]
+        self._data_remaining -= len(data)
+        return [data] if data else []
+
+    def _parse_header(self) -> List[bytes]:
+        buf = self._buf
+        if self.header_size == 0:
+            if len(buf) < 12:
+                return []
+            if buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+                raise WavFormatError("not a RIFF/WAVE stream")
+            self.header_size = 12
+
+        while True:
+            if self._skip:
+                n = min(self._skip, len(buf) - self.header_size)
+                self.header_size += n
+                self._skip -= n
+                if self._skip:
+                    return []
+
+            if len(buf) - self.header_size < 8:
+                return []
+            offset = self.header_size
+            chunk_id = bytes(buf[offset : offset + 4])
+            (chunk_size,) = struct.unpack_from("<I", buf, offset + 4)
+
+            if chunk_id == b"data":
+                if self.format is None:
+                    raise WavFormatError("data chunk before fmt chunk")
+                self.header_size = offset + 8
+                self._in_data = True
+                if chunk_size not in _UNKNOWN_SIZES:
+                    self._data_remaining = chunk_size
+                rest = bytes(buf[self.header_size :])
+                self._buf = bytearray()
+                return self._payload(rest)
+
+            if chunk_id == b"fmt ":
+                if len(buf) - offset < 8 + 16:
+                    return []
+                audio_format, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", buf, offset + 8)
+                self.format = WavFormat(audio_format, channels, rate, bits)
+
+            # skip this chunk (fmt included, its fields are read); RIFF pads to even sizes
+            self.header_size = offset + 8
+            self._skip = chunk_size + (chunk_size & 1)